@@ -1,41 +1,61 @@
-import pandas as pd
-import json
+"""
+Raw catalog -> cleaned, validated catalog for build_index.py.
+
+Streams the scraper output (a JSON array or JSONL) record by record. Chunks
+of CLEAN_CHUNK_SIZE records are cleaned, validated against
+src/Schema/Schema_index.py::SHLAssessment and serialized, inline or (for
+large inputs with CLEAN_WORKERS > 1) in a process pool. The main process
+writes JSONL in input order, dropping duplicate ids. At most 2 x workers
+chunks are in flight, so memory stays flat whatever the catalog size.
+
+    python Data_cleaning/clean_data.py                                  # Raw_data.json -> final_assessments.jsonl
+    python Data_cleaning/clean_data.py --input vendor.jsonl --output out.jsonl --workers 4
+    python Data_cleaning/clean_data.py --output src/Indexing/final_assessments.json   # legacy JSON array
+
+Invalid records are skipped and counted. The first few errors are printed.
+"""
+import argparse
 import os
+import sys
+import time
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 # --------------------------------------------------
 # Paths
 # --------------------------------------------------
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from pydantic import ValidationError
+from pydantic_core import to_json
+
+from src.Indexing.records_io import CATALOG_JSONL_PATH, iter_records, write_lines
+from src.Schema.Schema_index import SHLAssessment
+
 INPUT_PATH = os.path.join(SCRIPT_DIR, "Raw_data.json")
-OUTPUT_PATH = os.path.join(SCRIPT_DIR, "..", "src", "Indexing", "final_assessments.json")
+OUTPUT_PATH = CATALOG_JSONL_PATH
 
-# --------------------------------------------------
-# Load
-# --------------------------------------------------
-with open(INPUT_PATH, "r", encoding="utf-8") as f:
-    raw = json.load(f)
+# The pool only pays for itself on big inputs: starting it costs ~1 s and
+# every chunk is pickled both ways, while inline cleaning runs at ~18k rows/s
+# (clean_benchmark: 5k rows take 0.53 s inline vs 1.62 s with 2 workers).
+# So it defaults off, and with CLEAN_WORKERS > 1 the first
+# CLEAN_POOL_MIN_ROWS rows are still cleaned inline — the pool starts only
+# once the input has proven that large, and only helps with idle cores.
+CLEAN_WORKERS = int(os.getenv("CLEAN_WORKERS", "1"))
+CLEAN_POOL_MIN_ROWS = int(os.getenv("CLEAN_POOL_MIN_ROWS", "50000"))
+CLEAN_CHUNK_SIZE = int(os.getenv("CLEAN_CHUNK_SIZE", "2000"))
+MAX_REPORTED_ERRORS = 5
 
-df = pd.DataFrame(raw)
-print(f"Loaded {len(df)} rows")
-print(df.columns.tolist())
-df.head()
+REQUIRED_COLUMNS = {"entity_id", "name", "link", "description", "job_levels", "keys", "languages", "duration"}
 
-# --------------------------------------------------
-# Sanity check: confirm this is the NEW schema
-# --------------------------------------------------
-required_cols = {"entity_id", "name", "link", "description", "job_levels", "keys", "languages", "duration"}
-missing_cols = required_cols - set(df.columns)
-if missing_cols:
-    raise ValueError(
-        f"Raw_data.json is missing columns {missing_cols}. "
-        "This looks like the OLD scraped schema, not the new catalog dataset. "
-        "Replace Data_cleaning/Raw_data.json with the new JSON before rerunning."
-    )
 
 # --------------------------------------------------
 # Build text_for_embedding
 # --------------------------------------------------
-def build_text_for_embedding(row):
+def build_text_for_embedding(row: Dict) -> str:
     name = row.get("name", "") or ""
     description = (row.get("description") or "").strip()
     job_levels = ", ".join(row.get("job_levels") or []) or "Not specified"
@@ -46,7 +66,7 @@ def build_text_for_embedding(row):
     parts = [f"{name}."]
     if description:
         parts.append(description)
-        
+
     parts.append(f"Categories: {keys}.")
     parts.append(f"Suitable for job levels: {job_levels}.")
     parts.append(f"Languages available: {languages}.")
@@ -54,40 +74,164 @@ def build_text_for_embedding(row):
 
     return " ".join(parts).strip()
 
-df["text_for_embedding"] = df.apply(build_text_for_embedding, axis=1)
-df["text_for_embedding"].head(3)
 
 # --------------------------------------------------
-# Build final clean schema
+# Final clean schema
 # --------------------------------------------------
-final_df = pd.DataFrame({
-    "id": df["entity_id"],
-    "name": df["name"],
-    "url": df["link"],
-    "description": df["description"].fillna(""),
-    "job_levels": df["job_levels"],
-    "languages": df["languages"],
-    "duration": df["duration"],
-    "remote_testing": df["remote"].fillna("no").eq("yes"),
-    "adaptive_irt": df["adaptive"].fillna("no").eq("yes"),
-    "test_type": df["keys"],  # full category labels, not letter codes
-    "text_for_embedding": df["text_for_embedding"],
-})
+def clean_record(row: Dict) -> Dict:
+    """One raw scraper row -> one cleaned catalog record (unvalidated)."""
+    return {
+        "id": row.get("entity_id"),
+        "name": row.get("name"),
+        "url": row.get("link"),
+        "description": row.get("description") or "",
+        "job_levels": row.get("job_levels"),
+        "languages": row.get("languages"),
+        "duration": row.get("duration"),
+        "remote_testing": (row.get("remote") or "no") == "yes",
+        "adaptive_irt": (row.get("adaptive") or "no") == "yes",
+        "test_type": row.get("keys"),  # full category labels, not letter codes
+        "text_for_embedding": build_text_for_embedding(row),
+    }
 
-# --------------------------------------------------
-# Sanity checks
-# --------------------------------------------------
-print(f"Total assessments: {len(final_df)}")
-print(f"Missing description: {(final_df['description'] == '').sum()}")
-print(f"Missing url: {final_df['url'].isna().sum()}")
-print(f"Duplicate ids: {final_df['id'].duplicated().sum()}")
 
-# Peek at a few varied rows
-final_df.sample(3)[["id", "name", "text_for_embedding"]]
+def clean_chunk(rows: List[Dict]) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """
+    Clean, validate and serialize a chunk (runs in a pool worker).
+    -> ([(id, json line)], [error messages])
+    """
+    lines, errors = [], []
+    for row in rows:
+        record = clean_record(row)
+        try:
+            SHLAssessment.model_validate(record)
+        except ValidationError as e:
+            first = e.errors()[0]
+            field = ".".join(str(part) for part in first["loc"])
+            errors.append(f"id={record['id']!r}: {field}: {first['msg']}")
+            continue
+        # pydantic-core's serializer: ~5x json.dumps, and the dominant cost here
+        lines.append((record["id"], to_json(record).decode("utf-8")))
+    return lines, errors
 
-# --------------------------------------------------
-# Save
-# --------------------------------------------------
-os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
-final_df.to_json(OUTPUT_PATH, orient="records", indent=2, force_ascii=False)
-print(f"Saved -> {OUTPUT_PATH}")
\ No newline at end of file
+
+def _chunks(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _cleaned_chunks(
+    chunks: Iterator[List[Dict]], workers: int, pool_min_rows: int = CLEAN_POOL_MIN_ROWS,
+) -> Iterator[Tuple[List, List[str]]]:
+    """
+    clean_chunk over chunks in order. Inline until pool_min_rows rows have
+    been cleaned, then (workers > 1) in a pool with a bounded number of
+    chunks in flight.
+    """
+    chunks = iter(chunks)
+    cleaned = 0
+    while workers <= 1 or cleaned < pool_min_rows:
+        chunk = next(chunks, None)
+        if chunk is None:
+            return
+        yield clean_chunk(chunk)
+        cleaned += len(chunk)
+    import multiprocessing as mp
+
+    # Pool.imap would drain the whole input iterator up front
+    with mp.Pool(workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(clean_chunk, (chunk,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def _check_columns(first: Dict) -> None:
+    missing_cols = REQUIRED_COLUMNS - set(first)
+    if missing_cols:
+        raise ValueError(
+            f"Raw data is missing columns {missing_cols}. "
+            "This looks like the OLD scraped schema, not the new catalog dataset. "
+            "Replace Data_cleaning/Raw_data.json with the new JSON before rerunning."
+        )
+
+
+def clean_catalog(
+    input_path: str = INPUT_PATH,
+    output_path: str = OUTPUT_PATH,
+    workers: int = CLEAN_WORKERS,
+    chunk_size: int = CLEAN_CHUNK_SIZE,
+    pool_min_rows: int = CLEAN_POOL_MIN_ROWS,
+) -> Dict:
+    """Stream input_path through the pipeline into output_path. -> report"""
+    started = time.perf_counter()
+    report = {"read": 0, "written": 0, "invalid": 0, "duplicates": 0, "errors": []}
+    seen_ids = set()
+
+    def counted(rows):
+        for row in rows:
+            if not report["read"]:
+                _check_columns(row)
+            report["read"] += 1
+            yield row
+
+    def accepted_lines():
+        for lines, errors in _cleaned_chunks(
+            _chunks(counted(iter_records(input_path)), chunk_size), workers, pool_min_rows,
+        ):
+            report["invalid"] += len(errors)
+            room = MAX_REPORTED_ERRORS - len(report["errors"])
+            report["errors"].extend(errors[:max(room, 0)])
+            for record_id, line in lines:
+                if record_id in seen_ids:
+                    report["duplicates"] += 1
+                    continue
+                seen_ids.add(record_id)
+                yield line
+
+    report["written"] = write_lines(output_path, accepted_lines())
+    seconds = time.perf_counter() - started
+    report.update({
+        "input": input_path,
+        "output": output_path,
+        "workers": workers,
+        "seconds": round(seconds, 3),
+        "rows_per_s": round(report["read"] / seconds, 1) if seconds else 0.0,
+    })
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Clean and validate the raw catalog into JSONL for build_index.py")
+    parser.add_argument("--input", default=INPUT_PATH, help="raw catalog, JSON array or JSONL")
+    parser.add_argument("--output", default=OUTPUT_PATH, help=".jsonl (default) or .json for a JSON array")
+    parser.add_argument("--workers", type=int, default=CLEAN_WORKERS, help="1 = no process pool")
+    parser.add_argument("--chunk-size", type=int, default=CLEAN_CHUNK_SIZE)
+    parser.add_argument(
+        "--pool-min-rows", type=int, default=CLEAN_POOL_MIN_ROWS,
+        help="rows cleaned inline before a pool (--workers > 1) is started",
+    )
+    args = parser.parse_args(argv)
+
+    report = clean_catalog(args.input, args.output, args.workers, args.chunk_size, args.pool_min_rows)
+    print(f"Loaded {report['read']} rows")
+    print(f"Total assessments: {report['written']}")
+    print(f"Invalid: {report['invalid']}")
+    print(f"Duplicate ids: {report['duplicates']}")
+    for error in report["errors"]:
+        print(f"⚠️ {error}")
+    print(f"Saved -> {report['output']} ({report['rows_per_s']:.0f} rows/s, {report['workers']} workers)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
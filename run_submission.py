@@ -1,6 +1,6 @@
-import pandas as pd
+import sys
 
-from src.Tool.tool import retrieve_documents
+from src.Batch.batch_job import run_job
 
 
 # ======================
@@ -9,67 +9,26 @@ from src.Tool.tool import retrieve_documents
 TEST_DATA_PATH = "data/Test_data.xlsx"
 OUTPUT_CSV_PATH = "submission.csv"
 TOP_K = 10
-
-
-# ======================
-# HELPERS
-# ======================
-def normalize_url(url: str) -> str:
-    """
-    Normalize SHL URLs to avoid recall mismatch.
-    """
-    if not url:
-        return url
-    return url.rstrip("/").replace("/solutions", "")
-
-
-def load_test_queries(path: str):
-    """
-    Load unlabeled test queries from Excel.
-    Expects a column named 'query'.
-    """
-    df = pd.read_excel(path)
-
-    if "query" not in df.columns:
-        raise ValueError(
-            f"'query' column not found in {path}. "
-            f"Found columns: {list(df.columns)}"
-        )
-
-    return df["query"].dropna().tolist()
+BATCH_SIZE = 64   # queries per retrieve_documents_batch call
 
 
 # ======================
 # MAIN
 # ======================
 def main():
-    print("📄 Loading test queries...")
-    test_queries = load_test_queries(TEST_DATA_PATH)
-    print(f"Total test queries: {len(test_queries)}")
-
-    rows = []
-
-    for idx, query in enumerate(test_queries, start=1):
-        print(f"\n[{idx}/{len(test_queries)}] Processing query:")
-        print(query[:80], "...")
-
-        docs = retrieve_documents(query, top_k=TOP_K)
-
-        for doc in docs:
-            rows.append({
-                "Query": query,
-                "Assessment_url": normalize_url(
-                    doc.metadata.get("url")
-                )
-            })
-
-    submission_df = pd.DataFrame(rows)
-    submission_df.to_csv(OUTPUT_CSV_PATH, index=False)
+    """
+    Retrieval-only submission through the resumable batch job
+    (src/Batch/batch_job.py). A rerun continues from
+    submission.csv.checkpoint; pass --restart to start a fresh file.
+    """
+    restart = "--restart" in sys.argv[1:]
+    print(f"📄 Scoring {TEST_DATA_PATH}{' from scratch' if restart else ''}...")
+    report = run_job(TEST_DATA_PATH, OUTPUT_CSV_PATH, top_k=TOP_K, batch_size=BATCH_SIZE, restart=restart)
 
     print("\n✅ Submission file created successfully!")
     print(f"📄 File: {OUTPUT_CSV_PATH}")
-    print(f"📊 Total rows: {len(submission_df)} "
-          f"(expected {len(test_queries) * TOP_K})")
+    print(f"📊 Queries: {report['written']} written this run, {report['skipped']} from earlier runs, "
+          f"{report['failed']} failed")
 
 
 if __name__ == "__main__":
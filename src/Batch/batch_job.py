@@ -0,0 +1,402 @@
+"""
+Offline batch recommendations: a file of job descriptions in, recommendations out.
+
+The input (.xlsx, .csv or .jsonl/.json) is read one row at a time and results
+are written as they arrive, so memory stays flat whatever the file size.
+
+- retrieve (default): queries go in batches of --batch-size through
+  retrieve_documents_batch (chunked parallel embeds + one matrix search).
+- chat: every query runs the full run_chat turn (router, retrieval, LLM
+  selection) in a pool of --workers processes, in input order.
+
+--rate caps queries per second across the whole job (0 = no cap).
+
+Every --checkpoint-every rows the output is flushed. The finished ids and
+the output size are then appended to <output>.checkpoint. A rerun skips
+those ids and cuts the output back to the last checkpoint, so a crash
+mid-batch neither loses finished rows nor duplicates them. Failed rows,
+and chat turns that came back degraded, are not checkpointed; the next run
+retries them.
+
+    python -m src.Batch.batch_job data/Test_data.xlsx --output submission.csv
+    python -m src.Batch.batch_job jobs.jsonl --output recs.jsonl --mode chat --workers 4 --rate 5
+    python -m src.Batch.batch_job jobs.csv --output recs.jsonl --offline    # stub embeddings + fake LLM
+
+A .csv output is the submission format, one (Query, Assessment_url) row
+per recommendation. A .jsonl output has one object per input row.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src.Indexing.records_io import iter_records
+
+BATCH_TOP_K = int(os.getenv("BATCH_TOP_K", "10"))
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "64"))                   # queries per retrieve_documents_batch call
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))              # run_chat processes in --mode chat
+BATCH_RATE = float(os.getenv("BATCH_RATE", "0"))                  # queries/s across the job; 0 = no cap
+BATCH_CHECKPOINT_EVERY = int(os.getenv("BATCH_CHECKPOINT_EVERY", "50"))
+MAX_REPORTED_ERRORS = 5
+
+# --offline: the deterministic stand-ins, so a run needs no API key or network
+OFFLINE_ENV = {"EMBEDDINGS_BACKEND": "local", "LLM_BACKEND": "fake", "MISTRAL_API_KEY": "offline"}
+
+Item = Tuple[str, str]   # (row id, query)
+
+
+# --------------------------------------------------
+# Input: .xlsx / .csv / .jsonl, one row at a time
+# --------------------------------------------------
+def iter_rows(path: str) -> Iterator[Dict]:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".xlsx", ".xlsm"):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(h).strip() if h is not None else "" for h in next(rows, ())]
+            for values in rows:
+                yield dict(zip(header, values))
+        finally:
+            workbook.close()
+    elif ext == ".csv":
+        with open(path, "r", newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+    else:
+        yield from iter_records(path)
+
+
+def _column(row: Dict, name: str) -> Optional[str]:
+    """The row's key matching `name`, ignoring case and surrounding spaces."""
+    wanted = name.strip().lower()
+    return next((key for key in row if str(key).strip().lower() == wanted), None)
+
+
+def iter_queries(path: str, query_column: str = "query", id_column: str = "id") -> Iterator[Item]:
+    """
+    (row id, query) per non-empty row. The id comes from `id_column` when the
+    input has one, else the 1-based data row number (stable while the file
+    is only appended to).
+    """
+    query_key = id_key = None
+    for number, row in enumerate(iter_rows(path), start=1):
+        if number == 1:
+            query_key = _column(row, query_column)
+            if query_key is None:
+                raise ValueError(f"'{query_column}' column not found in {path}. Found columns: {list(row)}")
+            id_key = _column(row, id_column)
+        query = row.get(query_key)
+        if query is None or not str(query).strip():
+            continue
+        row_id = row.get(id_key) if id_key else None
+        yield (str(row_id) if row_id not in (None, "") else str(number)), str(query).strip()
+
+
+# --------------------------------------------------
+# Checkpoint + incremental output
+# --------------------------------------------------
+class Checkpoint:
+    """
+    <output>.checkpoint: one JSON line per committed batch,
+    {"ids": [...], "offset": output size in bytes after the batch}.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        self.offset = 0
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        good_end = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break   # torn last line from a crash
+                self.done.update(entry["ids"])
+                self.offset = entry["offset"]
+                good_end += len(line)
+        if good_end != os.path.getsize(self.path):
+            os.truncate(self.path, good_end)
+
+    def commit(self, ids: List[str], offset: int) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"ids": ids, "offset": offset}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(ids)
+        self.offset = offset
+
+
+class ResultWriter:
+    """Appends results to the output; `.csv` gets submission rows, anything else JSONL."""
+
+    def __init__(self, path: str, resume_offset: int):
+        self.csv = path.lower().endswith(".csv")
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size < resume_offset:
+            raise RuntimeError(f"{path} is shorter than its checkpoint says; rerun with --restart")
+        if size > resume_offset:
+            os.truncate(path, resume_offset)   # rows written after the last checkpoint
+        self._f = open(path, "a", newline="", encoding="utf-8")
+        if self.csv and resume_offset == 0:
+            self._f.write("Query,Assessment_url\r\n")
+
+    def write(self, result: Dict) -> None:
+        if not self.csv:
+            self._f.write(json.dumps(result, ensure_ascii=False) + "\n")
+            return
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for rec in result["recommendations"]:
+            writer.writerow([result["query"], normalize_url(rec.get("url"))])
+        self._f.write(buffer.getvalue())
+
+    def flush(self) -> int:
+        """Flush to disk. -> output size in bytes"""
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        return os.fstat(self._f.fileno()).st_size
+
+    def close(self) -> None:
+        self._f.close()
+
+
+def normalize_url(url: str) -> str:
+    """Normalize SHL URLs to avoid recall mismatch."""
+    if not url:
+        return url
+    return url.rstrip("/").replace("/solutions", "")
+
+
+# --------------------------------------------------
+# Rate limit
+# --------------------------------------------------
+class RateLimiter:
+    """Spaces acquisitions to `rate` per second (0 = unlimited)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+
+    def acquire(self, n: int = 1) -> None:
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+        self._next = max(self._next, now) + n * self.interval
+
+
+# --------------------------------------------------
+# Retrieval fan-out
+# --------------------------------------------------
+def _batches(items: Iterable[Item], size: int) -> Iterator[List[Item]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def retrieve_results(items: Iterable[Item], top_k: int, batch_size: int, limiter: RateLimiter) -> Iterator[Dict]:
+    from src.Indexing.catalog_store import recommendation
+    from src.Tool.tool import _format_result, retrieve_documents_batch
+
+    for batch in _batches(items, batch_size):
+        limiter.acquire(len(batch))
+        try:
+            results = retrieve_documents_batch([query for _, query in batch], top_k=top_k)
+        except Exception as e:
+            for row_id, query in batch:
+                yield {"id": row_id, "query": query, "error": f"{type(e).__name__}: {e}"}
+            continue
+        for (row_id, query), docs in zip(batch, results):
+            yield {"id": row_id, "query": query, "recommendations": [recommendation(_format_result(d)) for d in docs]}
+
+
+# --------------------------------------------------
+# Full run_chat turns in a process pool
+# --------------------------------------------------
+def _init_chat_worker() -> None:
+    from src.main import warmup
+
+    warmup()
+
+
+def chat_one(item: Item) -> Dict:
+    """One single-turn run_chat (runs in a pool worker)."""
+    from src.main import UNCACHEABLE, ChatMessage, run_chat
+
+    row_id, query = item
+    try:
+        result = run_chat([ChatMessage(role="user", content=query)])
+    except Exception as e:
+        return {"id": row_id, "query": query, "error": f"{type(e).__name__}: {e}"}
+    if result.get(UNCACHEABLE):
+        # upstream failure or unparseable LLM output: retry on the next run
+        return {"id": row_id, "query": query, "error": "degraded answer"}
+    return {
+        "id": row_id,
+        "query": query,
+        "reply": result.get("reply"),
+        "recommendations": result.get("recommendations") or [],
+        "end_of_conversation": result.get("end_of_conversation", False),
+    }
+
+
+def chat_results(items: Iterable[Item], workers: int, limiter: RateLimiter) -> Iterator[Dict]:
+    """chat_one over items in input order, with at most 2 x workers turns in flight."""
+    if workers <= 1:
+        _init_chat_worker()
+        for item in items:
+            limiter.acquire()
+            yield chat_one(item)
+        return
+    import multiprocessing as mp
+    from concurrent.futures import ProcessPoolExecutor
+
+    # spawn: workers load their own index / clients instead of inheriting threads mid-flight
+    with ProcessPoolExecutor(workers, mp_context=mp.get_context("spawn"), initializer=_init_chat_worker) as pool:
+        pending = deque()
+        for item in items:
+            limiter.acquire()
+            pending.append(pool.submit(chat_one, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# --------------------------------------------------
+# Job
+# --------------------------------------------------
+def run_job(
+    input_path: str,
+    output_path: str,
+    mode: str = "retrieve",
+    workers: int = BATCH_WORKERS,
+    rate: float = BATCH_RATE,
+    top_k: int = BATCH_TOP_K,
+    batch_size: int = BATCH_SIZE,
+    checkpoint_every: int = BATCH_CHECKPOINT_EVERY,
+    restart: bool = False,
+    query_column: str = "query",
+    id_column: str = "id",
+) -> Dict:
+    """Run (or resume) the job. -> report"""
+    if mode not in ("retrieve", "chat"):
+        raise ValueError(f"Unknown mode '{mode}' (expected retrieve or chat)")
+    started = time.perf_counter()
+    checkpoint = Checkpoint(output_path + ".checkpoint")
+    if restart:
+        for path in (output_path, checkpoint.path):
+            if os.path.exists(path):
+                os.remove(path)
+    checkpoint.load()
+    report = {"read": 0, "skipped": 0, "duplicates": 0, "written": 0, "failed": 0, "errors": []}
+    seen: Set[str] = set()
+
+    def todo() -> Iterator[Item]:
+        for row_id, query in iter_queries(input_path, query_column, id_column):
+            report["read"] += 1
+            if row_id in checkpoint.done:
+                report["skipped"] += 1
+            elif row_id in seen:
+                report["duplicates"] += 1
+            else:
+                seen.add(row_id)
+                yield row_id, query
+
+    limiter = RateLimiter(rate)
+    if mode == "chat":
+        results = chat_results(todo(), workers, limiter)
+    else:
+        results = retrieve_results(todo(), top_k, batch_size, limiter)
+
+    writer = ResultWriter(output_path, checkpoint.offset)
+    finished: List[str] = []
+    try:
+        for result in results:
+            if "error" in result:
+                report["failed"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append(f"id={result['id']!r}: {result['error']}")
+                continue
+            writer.write(result)
+            finished.append(result["id"])
+            if len(finished) >= checkpoint_every:
+                checkpoint.commit(finished, writer.flush())
+                report["written"] += len(finished)
+                finished = []
+                elapsed = time.perf_counter() - started
+                print(f"💾 {report['written']} rows written ({report['written'] / elapsed:.1f} rows/s)")
+        if finished:
+            checkpoint.commit(finished, writer.flush())
+            report["written"] += len(finished)
+    finally:
+        writer.close()
+
+    seconds = time.perf_counter() - started
+    report.update({
+        "input": input_path,
+        "output": output_path,
+        "mode": mode,
+        "seconds": round(seconds, 3),
+        "rows_per_s": round(report["written"] / seconds, 1) if seconds else 0.0,
+    })
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Resumable batch recommendations for a file of job descriptions")
+    parser.add_argument("input", help=".xlsx, .csv or .jsonl with a query column")
+    parser.add_argument("--output", required=True, help=".csv (Query, Assessment_url rows) or .jsonl (one object per row)")
+    parser.add_argument("--mode", choices=["retrieve", "chat"], default="retrieve")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="run_chat processes (chat mode); 1 = in process")
+    parser.add_argument("--rate", type=float, default=BATCH_RATE, help="max queries/s; 0 = no cap")
+    parser.add_argument("--top-k", type=int, default=BATCH_TOP_K)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--checkpoint-every", type=int, default=BATCH_CHECKPOINT_EVERY)
+    parser.add_argument("--query-column", default="query")
+    parser.add_argument("--id-column", default="id", help="stable row id; row numbers when the input has none")
+    parser.add_argument("--restart", action="store_true", help="discard the output and checkpoint and start over")
+    parser.add_argument("--offline", action="store_true", help="hashing embeddings + fake LLM, no API key")
+    args = parser.parse_args(argv)
+
+    if args.offline:
+        for key, value in OFFLINE_ENV.items():
+            os.environ.setdefault(key, value)
+
+    report = run_job(
+        args.input, args.output, args.mode, args.workers, args.rate, args.top_k,
+        args.batch_size, args.checkpoint_every, args.restart, args.query_column, args.id_column,
+    )
+    print(f"Read {report['read']} rows ({report['skipped']} already done, {report['duplicates']} duplicate ids)")
+    print(f"Written: {report['written']}")
+    print(f"Failed: {report['failed']} (retried on the next run)")
+    for error in report["errors"]:
+        print(f"⚠️ {error}")
+    print(f"Saved -> {report['output']} ({report['rows_per_s']:.1f} rows/s, mode={report['mode']})")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from src.Cache.lru import LRUCache
+
+
+def normalize_query(text: str) -> str:
+    """Collapse whitespace + casefold so near-identical turns share a key."""
+    return " ".join((text or "").split()).casefold()
+
+
+class _DiskTier:
+    """
+    Persistent second tier (SQLite) so warm embeddings survive a restart.
+    Vectors are stored as packed float32 — the index is float32 anyway.
+    With a TTL, expired rows are deleted when read, and swept on open and at
+    most once per TTL from set_many, so the file doesn't grow without bound.
+    """
+
+    def __init__(self, path: str, ttl: float = 0):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._next_purge = 0.0
+        self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Delete rows older than the TTL; returns how many went."""
+        if not self.ttl:
+            return 0
+        now = time.time()
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM embeddings WHERE created_at < ?", (now - self.ttl,)
+            ).rowcount
+            self._conn.commit()
+        self._next_purge = now + self.ttl
+        return deleted
+
+    def get(self, key: str) -> Optional[array]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector, created_at FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        blob, created_at = row
+        if self.ttl and created_at + self.ttl < time.time():
+            with self._lock:
+                self._conn.execute("DELETE FROM embeddings WHERE key = ? AND created_at = ?", (key, created_at))
+                self._conn.commit()
+            return None
+        vec = array("f")
+        vec.frombytes(blob)
+        return vec
+
+    def set_many(self, items) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                [(key, vec.tobytes(), now) for key, vec in items],
+            )
+            self._conn.commit()
+        if self.ttl and now >= self._next_purge:
+            self.purge_expired()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Drop-in Embeddings wrapper: memory LRU/TTL -> optional SQLite tier -> the
+    real provider. Plugged in as the vector store's embedding function, so
+    every similarity_search goes through it without call sites changing.
+
+    `embedder` is any LangChain Embeddings (MistralAIEmbeddings in prod,
+    HashingEmbeddings for offline runs).
+    """
+
+    def __init__(
+        self,
+        embedder: Embeddings,
+        maxsize: int = 2048,
+        ttl: float = 0,
+        disk_path: Optional[str] = None,
+        namespace: str = "",
+    ):
+        self.embedder = embedder
+        self.namespace = namespace or type(embedder).__name__
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.disk = _DiskTier(disk_path, ttl=ttl) if disk_path else None
+        self.disk_hits = 0
+        self.provider_calls = 0
+
+    def _key(self, text: str) -> str:
+        raw = f"{self.namespace}\x00{normalize_query(text)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[array]:
+        vec = self.memory.get(key)
+        if vec is None and self.disk is not None:
+            vec = self.disk.get(key)
+            if vec is not None:
+                self.disk_hits += 1
+                self.memory.set(key, vec)
+        return vec
+
+    def _store(self, pairs) -> None:
+        for key, vec in pairs:
+            self.memory.set(key, vec)
+        if self.disk is not None and pairs:
+            self.disk.set_many(pairs)
+
+    def _split(self, texts: List[str]):
+        keys = [self._key(t) for t in texts]
+        found = {}
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in found or key in missing:
+                continue
+            vec = self._lookup(key)
+            if vec is None:
+                missing[key] = text
+            else:
+                found[key] = vec
+        return keys, found, missing
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._split(texts)
+        if missing:
+            self.provider_calls += 1
+            vectors = self.embedder.embed_documents(list(missing.values()))
+            pairs = [(k, array("f", v)) for k, v in zip(missing.keys(), vectors)]
+            self._store(pairs)
+            found.update(pairs)
+        return [found[k].tolist() for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vec = self._lookup(key)
+        if vec is None:
+            self.provider_calls += 1
+            vec = array("f", self.embedder.embed_query(text))
+            self._store([(key, vec)])
+        return vec.tolist()
+
+    def peek_query(self, text: str) -> Optional[List[float]]:
+        """Cached vector for text if the memory tier has it — never calls the provider."""
+        vec = self.memory.peek(self._key(text))
+        return vec.tolist() if vec is not None else None
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._split(texts)
+        if missing:
+            self.provider_calls += 1
+            vectors = await self.embedder.aembed_documents(list(missing.values()))
+            pairs = [(k, array("f", v)) for k, v in zip(missing.keys(), vectors)]
+            self._store(pairs)
+            found.update(pairs)
+        return [found[k].tolist() for k in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vec = self._lookup(key)
+        if vec is None:
+            self.provider_calls += 1
+            vec = array("f", await self.embedder.aembed_query(text))
+            self._store([(key, vec)])
+        return vec.tolist()
+
+    def stats(self) -> dict:
+        stats = self.memory.stats()
+        # the memory tier counts a miss before the disk tier is asked; a disk
+        # hit still saved the provider call, so report it as a hit
+        hits = stats["hits"] + self.disk_hits
+        misses = stats["misses"] - self.disk_hits
+        stats.update({
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "memory_hits": stats["hits"],
+            "disk_enabled": self.disk is not None,
+            "disk_hits": self.disk_hits,
+            "provider_calls": self.provider_calls,
+        })
+        return stats
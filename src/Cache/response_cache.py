@@ -0,0 +1,94 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from src.Cache.embedding_cache import normalize_query
+from src.Cache.lru import LRUCache
+
+# Whole /chat responses. 0 disables the cache entirely.
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+
+
+def response_key(messages: Iterable[Tuple[str, str]], index_version: str) -> str:
+    """
+    Canonical hash of (role, normalized content) pairs plus the index
+    version, so a reload never serves answers built from the old catalog.
+    """
+    canonical = json.dumps(
+        [index_version, [[role, normalize_query(content)] for role, content in messages]],
+        ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    LRU/TTL cache of finished responses with single-flight: while one
+    request for a key is computing, identical requests await its result
+    instead of starting their own upstream calls. Failures are never
+    stored, and waiters on a failed computation see the same exception.
+    """
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL):
+        self.entries = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.coalesced = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool] = lambda result: True,
+        use_cached: bool = True,
+    ) -> Tuple[Any, str]:
+        """-> (result, "HIT" | "COALESCED" | "MISS")"""
+        if use_cached:
+            cached = self.entries.get(key)
+            if cached is not None:
+                return copy.deepcopy(cached), "HIT"
+            leader = self._inflight.get(key)
+            if leader is not None:
+                self.coalesced += 1
+                try:
+                    return copy.deepcopy(await asyncio.shield(leader)), "COALESCED"
+                except asyncio.CancelledError:
+                    if not leader.cancelled():
+                        raise
+                    # the leading request was cancelled (client went away) — compute it here
+
+        future = asyncio.get_running_loop().create_future()
+        if use_cached:
+            self._inflight.setdefault(key, future)
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()   # mark retrieved when nobody was waiting
+            raise
+        else:
+            future.set_result(result)
+            if cacheable(result):
+                self.entries.set(key, copy.deepcopy(result))
+            return result, "MISS"
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, float]:
+        stats = self.entries.stats()
+        stats.update({"coalesced": self.coalesced, "inflight": len(self._inflight)})
+        return stats
+
+
+_cache: Optional[ResponseCache] = ResponseCache() if RESPONSE_CACHE_SIZE > 0 else None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    return _cache
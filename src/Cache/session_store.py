@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from src.Cache.embedding_cache import normalize_query
+from src.Cache.lru import LRUCache
+
+# off    -> /chat stays fully stateless (every turn re-retrieves from scratch)
+# memory -> per-worker LRU
+# sqlite -> SESSION_STORE_PATH, shared by every worker on the host; a local
+#           stand-in for a networked store (anything with get/set works, see
+#           set_session_store)
+SESSION_STORE = os.getenv("SESSION_STORE", "off")
+SESSION_STORE_SIZE = int(os.getenv("SESSION_STORE_SIZE", "1024"))
+SESSION_STORE_TTL = float(os.getenv("SESSION_STORE_TTL", "1800"))
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", "data/cache/sessions.sqlite")
+
+
+def session_key(user_messages: Sequence[str]) -> str:
+    """
+    Hash of the conversation prefix. Only user turns are hashed: retrieval
+    depends on nothing else, and clients are free to re-render assistant
+    replies before sending them back.
+    """
+    raw = "\x00".join(normalize_query(m) for m in user_messages)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class SessionState:
+    """What one turn leaves behind for the next."""
+    version: str                          # IndexHandle.version the candidates came from
+    candidates: List[Dict]
+    shortlist_ids: List[str] = field(default_factory=list)
+    query_vector: Optional[array] = None  # context embedding; None = never computed
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "version": self.version,
+            "candidates": [dict(c) for c in self.candidates],   # records are Mappings
+            "shortlist_ids": self.shortlist_ids,
+        }, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, payload: str, vector: Optional[bytes]) -> "SessionState":
+        data = json.loads(payload)
+        query_vector = None
+        if vector is not None:
+            query_vector = array("f")
+            query_vector.frombytes(vector)
+        return cls(query_vector=query_vector, **data)
+
+
+class SessionBackend:
+    """get(key) -> SessionState | None, set(key, state)."""
+
+    def get(self, key: str) -> Optional[SessionState]:
+        raise NotImplementedError
+
+    def set(self, key: str, state: SessionState) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, float]:
+        return {}
+
+
+class MemorySessionBackend(SessionBackend):
+    def __init__(self, maxsize: int = SESSION_STORE_SIZE, ttl: float = SESSION_STORE_TTL):
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key: str) -> Optional[SessionState]:
+        return self.cache.get(key)
+
+    def set(self, key: str, state: SessionState) -> None:
+        self.cache.set(key, state)
+
+    def stats(self) -> Dict[str, float]:
+        return self.cache.stats()
+
+
+class SqliteSessionBackend(SessionBackend):
+    """
+    Same contract, persisted in SQLite so workers share sessions and a
+    restart does not drop them. Vectors are packed float32 as in the
+    embedding cache's disk tier.
+    """
+
+    def __init__(self, path: str = SESSION_STORE_PATH, ttl: float = SESSION_STORE_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "key TEXT PRIMARY KEY, payload TEXT NOT NULL, vector BLOB, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[SessionState]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, vector, updated_at FROM sessions WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (self.ttl and row[2] + self.ttl < time.time()):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return SessionState.from_json(row[0], row[1])
+
+    def set(self, key: str, state: SessionState) -> None:
+        vector = state.query_vector.tobytes() if state.query_vector is not None else None
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (key, payload, vector, updated_at) VALUES (?, ?, ?, ?)",
+                (key, state.to_json(), vector, now),
+            )
+            if self.ttl:
+                self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_store: Optional[SessionBackend] = None
+_store_lock = threading.Lock()
+_store_ready = False
+
+
+def get_session_store() -> Optional[SessionBackend]:
+    """The configured backend, or None when SESSION_STORE=off."""
+    global _store, _store_ready
+    if not _store_ready:
+        with _store_lock:
+            if not _store_ready:
+                if SESSION_STORE == "memory":
+                    _store = MemorySessionBackend()
+                elif SESSION_STORE == "sqlite":
+                    _store = SqliteSessionBackend()
+                elif SESSION_STORE != "off":
+                    raise ValueError(f"Unknown SESSION_STORE: {SESSION_STORE}")
+                _store_ready = True
+    return _store
+
+
+def set_session_store(backend: Optional[SessionBackend]) -> None:
+    """Plug in a different backend (e.g. a Redis-backed one), or None to disable."""
+    global _store, _store_ready
+    with _store_lock:
+        _store = backend
+        _store_ready = True
+
+
+def combine_vectors(context: Sequence[float], delta: Sequence[float]) -> List[float]:
+    """
+    Next context embedding: previous context + the new message, re-normalized.
+    The new message gets the same weight as everything before it, which keeps
+    retrieval leaning toward the latest turn like the joined-text query did.
+    """
+    combined = [a + b for a, b in zip(context, delta)]
+    norm = sum(x * x for x in combined) ** 0.5 or 1.0
+    return [x / norm for x in combined]
@@ -0,0 +1,504 @@
+"""
+Offline retrieval benchmark — quality (Recall@K, MAP@K) + latency per stage.
+
+Replays the scripted conversations in traces/C*.md through gather_candidates
+(turn by turn, with the trace's own agent replies as history) and, optionally,
+labeled queries (the Query / Assessment_url layout run_submission.py writes)
+through retrieve_documents.
+
+By default it runs fully offline: the catalog is embedded with the
+deterministic HashingEmbeddings stand-in into an in-memory NumPy index, so
+numbers are reproducible run to run and need no API key.
+
+    python -m src.Evaluation.benchmark --out bench.json
+    python -m src.Evaluation.benchmark --mode hybrid --baseline bench.json
+    python -m src.Evaluation.benchmark --queries data/Train_data.xlsx --min-recall 0.4
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import resource
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+from src.Indexing.records_io import ASSESSMENTS_PATH, load_records
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+TRACE_DIR = os.path.join(PROJECT_ROOT, "traces")
+
+
+# ======================
+# Trace parsing (same rules as evaulate.ipynb)
+# ======================
+def parse_trace(text: str):
+    """-> (list of (user_msg, agent_reply) turns, final expected URLs)"""
+    turn_blocks = re.split(r"### Turn \d+", text)[1:]
+    turns = []
+    final_urls = []
+
+    for block in turn_blocks:
+        user_match = re.search(r"\*\*User\*\*\s*\n+>\s*(.+?)(?:\n\n|\Z)", block, re.DOTALL)
+        if not user_match:
+            continue
+        user_text = re.sub(r"^\>\s*", "", user_match.group(1), flags=re.MULTILINE).strip()
+
+        agent_match = re.search(r"\*\*Agent\*\*\s*\n+(.+?)(?:\n\n_|\Z)", block, re.DOTALL)
+        agent_text = agent_match.group(1).strip() if agent_match else ""
+        turns.append((user_text, agent_text))
+
+        eoc_match = re.search(r"end_of_conversation.*?\*\*(true|false)\*\*", block, re.IGNORECASE)
+        table_rows = re.findall(r"\|\s*\d+\s*\|.+?<(https://[^\s|>]+)>\s*\|", block)
+        if eoc_match and eoc_match.group(1).lower() == "true" and table_rows:
+            final_urls = table_rows
+
+    return turns, final_urls
+
+
+def turn_flags(text: str) -> List[Dict]:
+    """Per turn: did the reference agent end the conversation / show a shortlist."""
+    flags = []
+    for block in re.split(r"### Turn \d+", text)[1:]:
+        eoc_match = re.search(r"end_of_conversation.*?\*\*(true|false)\*\*", block, re.IGNORECASE)
+        flags.append({
+            "end": bool(eoc_match and eoc_match.group(1).lower() == "true"),
+            "shortlist": "recommendations: null" not in block,
+        })
+    return flags
+
+
+def normalize_url(url: str) -> str:
+    return (url or "").rstrip("/").replace("/solutions", "").lower()
+
+
+def load_traces(pattern: str) -> List[Dict]:
+    traces = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        turns, urls = parse_trace(text)
+        if turns and urls:
+            traces.append({
+                "name": os.path.splitext(os.path.basename(path))[0],
+                "turns": turns,
+                "flags": turn_flags(text),
+                "expected_urls": [normalize_url(u) for u in urls],
+            })
+    return traces
+
+
+def load_labeled_queries(path: str) -> List[Dict]:
+    """CSV/XLSX with Query + Assessment_url columns, one row per relevant item."""
+    import pandas as pd
+
+    df = pd.read_excel(path) if path.endswith((".xlsx", ".xls")) else pd.read_csv(path)
+    grouped = defaultdict(list)
+    for query, url in zip(df["Query"], df["Assessment_url"]):
+        if isinstance(query, str) and isinstance(url, str):
+            grouped[query].append(normalize_url(url))
+    return [{"query": q, "expected_urls": urls} for q, urls in grouped.items()]
+
+
+# ======================
+# Metrics
+# ======================
+def recall_at_k(predicted: List[str], relevant: List[str], k: int) -> float:
+    relevant = set(relevant)
+    if not relevant:
+        return 0.0
+    return len(set(predicted[:k]) & relevant) / len(relevant)
+
+
+def average_precision_at_k(predicted: List[str], relevant: List[str], k: int) -> float:
+    relevant = set(relevant)
+    if not relevant:
+        return 0.0
+    hits, total = 0, 0.0
+    for rank, url in enumerate(predicted[:k], start=1):
+        if url in relevant:
+            hits += 1
+            total += hits / rank
+    return total / min(k, len(relevant))
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "n": 0}
+    ordered = sorted(samples)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+
+    return {
+        "p50": round(pick(50), 3),
+        "p95": round(pick(95), 3),
+        "p99": round(pick(99), 3),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "n": len(ordered),
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# ======================
+# Stage timing
+# ======================
+class StageClock:
+    """Accumulates ms per stage for the request currently being measured."""
+
+    def __init__(self):
+        self.current = defaultdict(float)
+
+    def add(self, stage: str, ms: float) -> None:
+        self.current[stage] += ms
+
+    def take(self) -> Dict[str, float]:
+        out, self.current = dict(self.current), defaultdict(float)
+        return out
+
+
+class TimedEmbeddings(Embeddings):
+    def __init__(self, inner, clock: StageClock):
+        self.inner = inner
+        self.clock = clock
+
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.clock.add("embed", (time.perf_counter() - start) * 1000)
+
+    def embed_query(self, text):
+        return self._timed(self.inner.embed_query, text)
+
+    def embed_documents(self, texts):
+        return self._timed(self.inner.embed_documents, texts)
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+
+class TimedStore:
+    """Proxy over the vector store that books search time (minus embed)."""
+
+    def __init__(self, inner, clock: StageClock):
+        self.inner = inner
+        self.clock = clock
+        self.embeddings = TimedEmbeddings(inner.embeddings, clock)
+        if hasattr(inner, "embedding_function"):      # LangChain FAISS
+            inner.embedding_function = self.embeddings
+        else:
+            inner.embeddings = self.embeddings
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def _timed(self, fn, *args, **kwargs):
+        embed_before = self.clock.current["embed"]
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.clock.add("search", elapsed - (self.clock.current["embed"] - embed_before))
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return self._timed(self.inner.similarity_search, query, k=k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return self._timed(self.inner.similarity_search_by_vector, embedding, k=k, **kwargs)
+
+
+class TimedReranker:
+    """Proxy over the reranker that books its time."""
+
+    def __init__(self, inner, clock: StageClock):
+        self.inner = inner
+        self.clock = clock
+        self.calls = 0
+
+    def rerank(self, query, docs):
+        self.calls += 1
+        start = time.perf_counter()
+        try:
+            return self.inner.rerank(query, docs)
+        finally:
+            self.clock.add("rerank", (time.perf_counter() - start) * 1000)
+
+    def stats(self) -> Dict[str, int]:
+        """Calls, and how many fell back to retrieval order."""
+        return {
+            "calls": self.calls,
+            "timeouts": getattr(self.inner, "timeouts", 0),
+            "errors": getattr(self.inner, "errors", 0),
+        }
+
+
+def install_reranker(clock: StageClock):
+    """Time the configured reranker (RERANKER_MODEL_PATH); None when there is none."""
+    from src.Tool import rerank
+
+    reranker = rerank.get_reranker()
+    if reranker is None:
+        return None
+    timed = TimedReranker(reranker, clock)
+    rerank.set_reranker(timed)
+    return timed
+
+
+def install_store(args, clock: StageClock):
+    """Build/load the store under test and install it as the process-wide one."""
+    from src.Indexing import Index
+
+    if args.embeddings == "local":
+        from src.Indexing.local_embeddings import HashingEmbeddings
+        from src.Indexing.numpy_index import NumpyVectorStore
+
+        records = load_records(ASSESSMENTS_PATH)
+        store = NumpyVectorStore.from_records(records, HashingEmbeddings())
+    else:
+        store = Index.get_vector_store()
+
+    timed = TimedStore(store, clock)
+    Index.set_vector_store(timed)
+    return timed
+
+
+def timed_call(clock: StageClock, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    total = (time.perf_counter() - start) * 1000
+    stages = clock.take()
+    stages["total"] = total
+    # everything that isn't embedding, index search or reranking: lexical
+    # scoring, name lookups, _format_result and candidate merging
+    stages["format"] = max(
+        0.0, total - stages.get("embed", 0.0) - stages.get("search", 0.0) - stages.get("rerank", 0.0)
+    )
+    return result, stages
+
+
+# ======================
+# Runs
+# ======================
+def prompt_sizes(history, candidates) -> Dict[str, int]:
+    """Estimated prompt tokens for this turn: original JSON prompt vs the budgeted one."""
+    from src.LLM.prompt import assemble_prompt
+    from src.Metrics.metrics import estimate_tokens
+    from src.main import SYSTEM_PROMPT, build_json_llm_messages
+
+    return {
+        "json": sum(estimate_tokens(m.content) for m in build_json_llm_messages(history, candidates)),
+        "compact": assemble_prompt(SYSTEM_PROMPT, history, candidates).tokens,
+    }
+
+
+def route_matches(intent: str, flags: Dict) -> bool:
+    """A templated turn agrees with the reference agent's turn."""
+    from src.LLM import router
+
+    if intent == router.END:
+        return flags["end"]
+    return not flags["end"] and not flags["shortlist"]
+
+
+def run_traces(traces, k: int, clock: StageClock, latencies, prompt_tokens=None, routes=None):
+    from src.LLM.router import LLM, route_turn
+    from src.main import ChatMessage, gather_candidates
+
+    per_trace = []
+    for trace in traces:
+        history = []
+        candidates = []
+        for turn, (user_text, agent_text) in enumerate(trace["turns"]):
+            history.append(ChatMessage(role="user", content=user_text))
+            if routes is not None:
+                route, stages = timed_call(clock, route_turn, list(history))
+                latencies["route"].append(stages["total"])
+                routes.append({
+                    "trace": trace["name"],
+                    "turn": turn + 1,
+                    "intent": route.intent,
+                    "source": route.source,
+                    "agrees": route.intent == LLM or route_matches(route.intent, trace["flags"][turn]),
+                })
+            candidates, stages = timed_call(clock, gather_candidates, list(history))
+            for stage, ms in stages.items():
+                latencies[stage].append(ms)
+            if prompt_tokens is not None:
+                for fmt, tokens in prompt_sizes(history, candidates).items():
+                    prompt_tokens[fmt].append(tokens)
+            history.append(ChatMessage(role="assistant", content=agent_text))
+
+        predicted = [normalize_url(c["url"]) for c in candidates]
+        per_trace.append({
+            "trace": trace["name"],
+            "turns": len(trace["turns"]),
+            "recall": round(recall_at_k(predicted, trace["expected_urls"], k), 4),
+            "map": round(average_precision_at_k(predicted, trace["expected_urls"], k), 4),
+            "candidates": len(candidates),
+            "expected": len(trace["expected_urls"]),
+        })
+    return per_trace
+
+
+def run_queries(queries, k: int, clock: StageClock, latencies):
+    from src.Tool.tool import retrieve_documents
+
+    per_query = []
+    for item in queries:
+        docs, stages = timed_call(clock, retrieve_documents, item["query"], top_k=k)
+        for stage, ms in stages.items():
+            latencies[stage].append(ms)
+        predicted = [normalize_url(d.metadata.get("url")) for d in docs]
+        per_query.append({
+            "query": item["query"][:80],
+            "recall": round(recall_at_k(predicted, item["expected_urls"], k), 4),
+            "map": round(average_precision_at_k(predicted, item["expected_urls"], k), 4),
+        })
+    return per_query
+
+
+def summarize(rows: List[Dict]) -> Dict[str, float]:
+    if not rows:
+        return {"recall": 0.0, "map": 0.0, "n": 0}
+    return {
+        "recall": round(sum(r["recall"] for r in rows) / len(rows), 4),
+        "map": round(sum(r["map"] for r in rows) / len(rows), 4),
+        "n": len(rows),
+    }
+
+
+def summarize_routes(routes: List[Dict]) -> Dict:
+    """How many trace turns the fast path would have answered without the LLM."""
+    fast = [r for r in routes if r["intent"] != "LLM"]
+    by_intent = defaultdict(int)
+    for r in fast:
+        by_intent[r["intent"]] += 1
+    return {
+        "turns": len(routes),
+        "fast_path": len(fast),
+        "fast_path_share": round(len(fast) / len(routes), 4) if routes else 0.0,
+        "by_intent": dict(sorted(by_intent.items())),
+        "disagreements": [r for r in fast if not r["agrees"]],
+    }
+
+
+def compare_to_baseline(report: Dict, baseline_path: str) -> Dict:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    delta = {}
+    for section in ("traces", "queries"):
+        for metric in ("recall", "map"):
+            old = baseline.get("quality", {}).get(section, {}).get(metric)
+            new = report["quality"].get(section, {}).get(metric)
+            if old is not None and new is not None:
+                delta[f"{section}.{metric}"] = round(new - old, 4)
+    for stage, stats in report["latency_ms"].items():
+        old = baseline.get("latency_ms", {}).get(stage, {}).get("p95")
+        if old is not None:
+            delta[f"latency.{stage}.p95"] = round(stats["p95"] - old, 3)
+    return delta
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline retrieval quality + latency benchmark")
+    parser.add_argument("--k", type=int, default=10, help="cutoff for Recall@K / MAP@K")
+    parser.add_argument("--mode", default=None, help="retrieval mode: vector | lexical | hybrid")
+    parser.add_argument("--embeddings", choices=["local", "mistral"], default="local",
+                        help="local = deterministic offline stand-in (default)")
+    parser.add_argument("--traces", default=os.path.join(TRACE_DIR, "C*.md"))
+    parser.add_argument("--queries", default=None, help="labeled CSV/XLSX (Query, Assessment_url)")
+    parser.add_argument("--repeat", type=int, default=1, help="replay everything N times for latency")
+    parser.add_argument("--out", default=None, help="write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", default=None, help="previous JSON report to diff against")
+    parser.add_argument("--min-recall", type=float, default=None,
+                        help="exit non-zero if mean trace Recall@K falls below this")
+    args = parser.parse_args(argv)
+
+    if args.embeddings == "local":
+        os.environ["EMBEDDINGS_BACKEND"] = "local"
+
+    from src.Tool import tool
+    if args.mode:
+        tool.RETRIEVAL_MODE = args.mode
+
+    clock = StageClock()
+    install_store(args, clock)
+    reranker = install_reranker(clock)
+
+    traces = load_traces(args.traces)
+    queries = load_labeled_queries(args.queries) if args.queries else []
+
+    # warm-up pass so lazily built derived indexes (BM25, name index) don't
+    # land in the latency percentiles
+    run_traces(traces[:1], args.k, clock, defaultdict(list))
+
+    latencies = defaultdict(list)
+    prompt_tokens = defaultdict(list)
+    routes = []
+    started = time.perf_counter()
+    trace_rows, query_rows = [], []
+    for _ in range(max(1, args.repeat)):
+        routes = []
+        trace_rows = run_traces(traces, args.k, clock, latencies, prompt_tokens, routes)
+        query_rows = run_queries(queries, args.k, clock, latencies)
+
+    report = {
+        "config": {
+            "k": args.k,
+            "mode": tool.RETRIEVAL_MODE,
+            "embeddings": args.embeddings,
+            "retrieve_k": tool.RETRIEVE_K,
+            "top_k": tool.TOP_K,
+            "repeat": args.repeat,
+            "reranker": os.getenv("RERANKER_MODEL_PATH") if reranker else None,
+        },
+        "quality": {
+            "traces": summarize(trace_rows),
+            "queries": summarize(query_rows),
+        },
+        "latency_ms": {stage: percentiles(samples) for stage, samples in sorted(latencies.items())},
+        "prompt_tokens": {fmt: percentiles(sizes) for fmt, sizes in sorted(prompt_tokens.items())},
+        "router": summarize_routes(routes),
+        "rerank": reranker.stats() if reranker else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "wall_time_s": round(time.perf_counter() - started, 3),
+        "per_trace": trace_rows,
+        "per_query": query_rows,
+    }
+    if args.baseline:
+        report["delta_vs_baseline"] = compare_to_baseline(report, args.baseline)
+
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(payload)
+        print(f"📝 Benchmark report written: {args.out}")
+        print(f"   traces Recall@{args.k}={report['quality']['traces']['recall']} "
+              f"MAP@{args.k}={report['quality']['traces']['map']} "
+              f"p95 total={report['latency_ms'].get('total', {}).get('p95')}ms")
+    else:
+        print(payload)
+
+    if args.min_recall is not None and report["quality"]["traces"]["recall"] < args.min_recall:
+        print(f"❌ Recall@{args.k} below gate {args.min_recall}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
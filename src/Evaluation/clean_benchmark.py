@@ -0,0 +1,181 @@
+"""
+Throughput and peak memory of the catalog cleaning pipeline.
+
+Writes a synthetic raw catalog (Raw_data.json rows with fresh ids, names
+and links, plus a share of invalid and duplicate rows) and cleans it with:
+
+- legacy: json.load + pandas DataFrame + row-wise df.apply + indented JSON,
+  the way Data_cleaning/clean_data.py used to work
+- stream: Data_cleaning/clean_data.py with --workers 1
+- stream xN: the same with an N-process pool from the first row
+  (--pool-min-rows 0), to show where the pool breaks even
+
+Each run happens in its own process. Peak memory is sampled across that
+process and its pool workers (PSS where the OS reports it, so pages shared
+between forked workers count once).
+
+    python -m src.Evaluation.clean_benchmark                       # 100k rows
+    python -m src.Evaluation.clean_benchmark --rows 500000 --workers 1,4 --out clean.json
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+import psutil
+
+from src.Indexing.records_io import PROJECT_ROOT, iter_records, write_lines
+
+RAW_PATH = os.path.join(PROJECT_ROOT, "Data_cleaning", "Raw_data.json")
+MB = 1024 * 1024
+
+
+def build_synthetic_catalog(rows: int, path: str, invalid_rate: float = 0.01,
+                            duplicate_rate: float = 0.01, seed: int = 0) -> None:
+    """Raw_data.json rows cycled up to `rows`, as a JSON array (or JSONL for .jsonl)."""
+    rng = random.Random(seed)
+    base = list(iter_records(RAW_PATH))
+
+    def lines():
+        for i in range(rows):
+            row = dict(base[i % len(base)])
+            row["entity_id"] = f"syn-{rng.randrange(i)}" if i and rng.random() < duplicate_rate else f"syn-{i}"
+            row["name"] = f"{row['name']} {i}"
+            row["link"] = f"{row['link']}{i}/"
+            if rng.random() < invalid_rate:
+                row["link"] = None
+            yield json.dumps(row, ensure_ascii=False)
+
+    write_lines(path, lines())
+
+
+def legacy_clean(input_path: str, output_path: str) -> Dict:
+    """The old pandas pipeline, kept here only as the comparison point."""
+    import pandas as pd
+
+    sys.path.insert(0, os.path.join(PROJECT_ROOT, "Data_cleaning"))
+    from clean_data import build_text_for_embedding
+
+    with open(input_path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    df = pd.DataFrame(raw)
+    df["text_for_embedding"] = df.apply(build_text_for_embedding, axis=1)
+    final_df = pd.DataFrame({
+        "id": df["entity_id"],
+        "name": df["name"],
+        "url": df["link"],
+        "description": df["description"].fillna(""),
+        "job_levels": df["job_levels"],
+        "languages": df["languages"],
+        "duration": df["duration"],
+        "remote_testing": df["remote"].fillna("no").eq("yes"),
+        "adaptive_irt": df["adaptive"].fillna("no").eq("yes"),
+        "test_type": df["keys"],
+        "text_for_embedding": df["text_for_embedding"],
+    })
+    final_df.to_json(output_path, orient="records", indent=2, force_ascii=False)
+    return {"read": len(df), "written": len(final_df), "invalid": 0, "duplicates": 0}
+
+
+def _run(variant: str, workers: int, input_path: str, output_path: str, results) -> None:
+    if variant == "legacy":
+        report = legacy_clean(input_path, output_path)
+    else:
+        sys.path.insert(0, os.path.join(PROJECT_ROOT, "Data_cleaning"))
+        from clean_data import clean_catalog
+
+        report = clean_catalog(input_path, output_path, workers=workers, pool_min_rows=0)
+    results.put({k: report[k] for k in ("read", "written", "invalid", "duplicates")})
+
+
+def _tree_memory(proc: psutil.Process) -> float:
+    total = 0.0
+    for p in [proc] + proc.children(recursive=True):
+        try:
+            info = p.memory_full_info()
+            total += getattr(info, "pss", info.rss)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    return total / MB
+
+
+def measure(variant: str, workers: int, input_path: str, output_path: str) -> Dict:
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    started = time.perf_counter()
+    proc = ctx.Process(target=_run, args=(variant, workers, input_path, output_path, results))
+    proc.start()
+
+    peak = [0.0]
+    done = threading.Event()
+
+    def sample():
+        ps = psutil.Process(proc.pid)
+        while not done.is_set():
+            try:
+                peak[0] = max(peak[0], _tree_memory(ps))
+            except psutil.NoSuchProcess:
+                return
+            time.sleep(0.02)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    counts = results.get()
+    seconds = time.perf_counter() - started
+    done.set()
+    proc.join()
+    sampler.join()
+    return {
+        "variant": variant if variant == "legacy" else f"stream x{workers}",
+        "seconds": round(seconds, 2),
+        "rows_per_s": round(counts["read"] / seconds, 1),
+        "peak_mb": round(peak[0], 1),
+        "output_mb": round(os.path.getsize(output_path) / MB, 1),
+        **counts,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Cleaning pipeline throughput and peak memory on a synthetic catalog")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="comma-separated pool sizes")
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--out", default=None, help="write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    tmp_dir = tempfile.mkdtemp(prefix="clean-bench-")
+    try:
+        raw = os.path.join(tmp_dir, "raw.json")
+        build_synthetic_catalog(args.rows, raw)
+        runs: List[Dict] = []
+        if not args.skip_legacy:
+            runs.append(measure("legacy", 1, raw, os.path.join(tmp_dir, "legacy.json")))
+        for workers in sorted({int(w) for w in args.workers.split(",")}):
+            runs.append(measure("stream", workers, raw, os.path.join(tmp_dir, f"stream-{workers}.jsonl")))
+        input_mb = round(os.path.getsize(raw) / MB, 1)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    columns = ["variant", "seconds", "rows_per_s", "peak_mb", "output_mb", "written", "invalid", "duplicates"]
+    print(" | ".join(columns))
+    for run in runs:
+        print(" | ".join(str(run[c]) for c in columns))
+
+    report = {"rows": args.rows, "input_mb": input_mb, "cpus": os.cpu_count(), "runs": runs}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
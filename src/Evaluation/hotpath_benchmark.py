@@ -0,0 +1,151 @@
+"""
+Allocation / latency micro-benchmark for the per-turn hot path:
+gather_candidates + prompt assembly (both prompt formats) + resolving the
+recommendations, i.e. everything a /chat turn does locally around the LLM
+call.
+
+Replays every user turn of traces/C*.md against the catalog embedded with
+HashingEmbeddings into an in-memory NumPy index (no network, reproducible),
+`--rounds` times. Reports per-turn latency percentiles per step, and from a
+separate tracemalloc pass the transient peak (how much the turn allocates
+before freeing it) and the bytes still held after each turn.
+
+    python -m src.Evaluation.hotpath_benchmark
+    python -m src.Evaluation.hotpath_benchmark --rounds 50 --out hotpath.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Dict, List
+
+os.environ.setdefault("EMBEDDINGS_BACKEND", "local")
+os.environ.setdefault("MISTRAL_API_KEY", "offline")
+
+from src.Evaluation.benchmark import TRACE_DIR, load_traces, percentiles
+from src.Indexing.records_io import load_records
+
+
+def install_catalog() -> None:
+    from src.Indexing import Index
+    from src.Indexing.local_embeddings import HashingEmbeddings
+    from src.Indexing.numpy_index import NumpyVectorStore
+
+    store = NumpyVectorStore.from_records(load_records(), HashingEmbeddings())
+    Index.set_vector_store(store)
+    Index.get_index_handle().warm()
+
+
+def turn_histories(traces) -> List[List]:
+    from src.main import ChatMessage
+
+    histories = []
+    for trace in traces:
+        history = []
+        for user_text, agent_text in trace["turns"]:
+            history.append(ChatMessage(role="user", content=user_text))
+            histories.append(list(history))
+            history.append(ChatMessage(role="assistant", content=agent_text))
+    return histories
+
+
+def one_turn(history, mark=lambda step: None):
+    """One turn's local work; mark(step) is called as each step finishes."""
+    from src.LLM.prompt import assemble_prompt
+    from src.main import SYSTEM_PROMPT, build_json_llm_messages, finalize_response, gather_candidates
+
+    candidates = gather_candidates(history)
+    mark("gather_candidates")
+    assemble_prompt(SYSTEM_PROMPT, history, candidates)
+    mark("prompt_compact")
+    build_json_llm_messages(history, candidates)
+    mark("prompt_json")
+    raw = json.dumps({"reply": "ok", "selected_ids": [c["id"] for c in candidates[:5]]})
+    finalize_response(raw, candidates)
+    mark("finalize")
+
+
+def measure_latency(histories, rounds: int) -> Dict:
+    timings = defaultdict(list)
+    last = [0.0]
+
+    def mark(step):
+        now = time.perf_counter()
+        timings[step].append((now - last[0]) * 1000)
+        last[0] = now
+
+    for _ in range(rounds):
+        for history in histories:
+            started = last[0] = time.perf_counter()
+            one_turn(history, mark)
+            timings["total"].append((last[0] - started) * 1000)
+    return {step: percentiles(samples) for step, samples in timings.items()}
+
+
+def measure_allocations(histories, rounds: int) -> Dict:
+    """Per step: transient peak KiB above what was live when the step started."""
+    peaks = defaultdict(list)
+    retained = []
+    base = [0]
+
+    def mark(step):
+        current, peak = tracemalloc.get_traced_memory()
+        peaks[step].append((peak - base[0]) / 1024)
+        base[0] = current
+        tracemalloc.reset_peak()
+
+    tracemalloc.start()
+    try:
+        for _ in range(rounds):
+            for history in histories:
+                before = base[0] = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                one_turn(history, mark)
+                retained.append((tracemalloc.get_traced_memory()[0] - before) / 1024)
+    finally:
+        tracemalloc.stop()
+    return {
+        "transient_peak_kib": {step: percentiles(samples) for step, samples in peaks.items()},
+        "retained_kib_mean": round(sum(retained) / len(retained), 2),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Latency and allocations of gather_candidates + prompt assembly")
+    parser.add_argument("--traces", default=os.path.join(TRACE_DIR, "C*.md"))
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--out", default=None, help="write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    install_catalog()
+    histories = turn_histories(load_traces(args.traces))
+    for history in histories:   # warm caches and lazy imports
+        one_turn(history)
+
+    report = {
+        "turns": len(histories),
+        "rounds": args.rounds,
+        "latency_ms": measure_latency(histories, args.rounds),
+        "allocations": measure_allocations(histories, max(1, args.rounds // 4)),
+    }
+    for step, stats in report["latency_ms"].items():
+        print(f"  {step:18s} p50={stats['p50']:.3f}ms p95={stats['p95']:.3f}ms")
+    alloc = report["allocations"]
+    for step, stats in alloc["transient_peak_kib"].items():
+        print(f"  {step:18s} peak p50={stats['p50']:.1f}KiB p95={stats['p95']:.1f}KiB")
+    print(f"  retained per turn {alloc['retained_kib_mean']:.2f}KiB")
+
+    payload = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
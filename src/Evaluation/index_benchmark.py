@@ -0,0 +1,156 @@
+"""
+Recall vs. speed vs. memory of the vector index options on a synthetic catalog.
+
+Builds clustered, L2-normalized vectors (the shape of real embeddings), with
+the exact top-k from brute force as ground truth. Then it builds and queries:
+
+- numpy float32 / int8: NumpyVectorStore, NUMPY_INDEX_DTYPE
+- faiss flat, sq8, pq, hnsw, ivf, ivfpq: index_types.py presets, INDEX_TYPE.
+  HNSW is swept over ef_search and IVF over nprobe, through the same
+  search_params that retrieve_documents passes down.
+
+Queries run one at a time (the serving pattern) on a single thread. Per
+option it reports recall@k against exact search, QPS, build seconds and
+index bytes (per vector too).
+
+    python -m src.Evaluation.index_benchmark                        # 100k x 1024
+    python -m src.Evaluation.index_benchmark --rows 20000 --types flat,hnsw --out index.json
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.Indexing.index_types import build_faiss_index, search
+from src.Indexing.numpy_index import NumpyVectorStore, quantize_int8
+
+ALL_TYPES = ["numpy-f32", "numpy-int8", "flat", "sq8", "pq", "hnsw", "ivf", "ivfpq"]
+EF_SWEEP = [16, 32, 64, 128, 256]
+NPROBE_SWEEP = [1, 4, 16, 64]
+
+
+def synthetic_vectors(rows: int, dim: int, queries: int, clusters: int = 200, seed: int = 0):
+    """(catalog, queries): Gaussian clusters around random centres, unit-normalized."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim), dtype=np.float32)
+
+    def sample(n):
+        out = centres[rng.integers(0, clusters, n)]
+        out += rng.standard_normal((n, dim), dtype=np.float32)
+        out /= np.linalg.norm(out, axis=1, keepdims=True)
+        return out
+
+    return sample(rows), sample(queries)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    half_norms = 0.5 * np.einsum("ij,ij->i", vectors, vectors)
+    scores = queries @ vectors.T - half_norms
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return top
+
+
+def recall(found: List[List[int]], truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(row[:k]) & set(t.tolist())) for row, t in zip(found, truth))
+    return hits / (k * len(truth))
+
+
+def _timed_queries(search, queries: np.ndarray) -> Tuple[List[List[int]], float]:
+    started = time.perf_counter()
+    found = [search(q) for q in queries]
+    return found, len(queries) / (time.perf_counter() - started)
+
+
+def run_numpy(dtype: str, vectors, queries, truth, k: int) -> List[Dict]:
+    started = time.perf_counter()
+    if dtype == "int8":
+        codes, scales = quantize_int8(vectors)
+        store = NumpyVectorStore(codes, range(len(codes)), scales=scales)
+        nbytes = codes.nbytes + scales.nbytes + store._half_sq_norms.nbytes
+    else:
+        store = NumpyVectorStore(vectors, range(len(vectors)))
+        nbytes = vectors.nbytes + store._half_sq_norms.nbytes
+    build_s = time.perf_counter() - started
+    found, qps = _timed_queries(lambda q: store.similarity_search_by_vector(q, k), queries)
+    return [_row(f"numpy-{'f32' if dtype == 'float32' else dtype}", None, found, truth, qps, build_s, nbytes, len(vectors))]
+
+
+def run_faiss(index_type: str, vectors, queries, truth, k: int) -> List[Dict]:
+    import faiss
+
+    started = time.perf_counter()
+    index, spec = build_faiss_index(vectors, index_type)
+    build_s = time.perf_counter() - started
+    nbytes = len(faiss.serialize_index(index))
+
+    if index_type == "hnsw":
+        sweep = [{"ef_search": ef} for ef in EF_SWEEP]
+    elif index_type.startswith("ivf"):
+        sweep = [{"nprobe": p} for p in NPROBE_SWEEP]
+    else:
+        sweep = [None]
+
+    rows = []
+    for params in sweep:
+        found, qps = _timed_queries(lambda q: search(index, q[None, :], k, params)[1][0].tolist(), queries)
+        rows.append(_row(f"faiss-{index_type} ({spec})", params, found, truth, qps, build_s, nbytes, len(vectors)))
+    return rows
+
+
+def _row(name: str, params: Optional[Dict], found, truth, qps: float, build_s: float, nbytes: int, n: int) -> Dict:
+    return {
+        "index": name,
+        "params": params or {},
+        "recall": round(recall(found, truth), 4),
+        "qps": round(qps, 1),
+        "build_s": round(build_s, 2),
+        "mb": round(nbytes / 1024 / 1024, 1),
+        "bytes_per_vector": round(nbytes / n, 1),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Recall / QPS / memory of the FAISS and NumPy index options")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", default=",".join(ALL_TYPES), help=f"comma-separated subset of {ALL_TYPES}")
+    parser.add_argument("--out", default=None, help="write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    import faiss
+
+    faiss.omp_set_num_threads(1)
+    vectors, queries = synthetic_vectors(args.rows, args.dim, args.queries)
+    truth = exact_top_k(vectors, queries, args.k)
+
+    results: List[Dict] = []
+    for index_type in args.types.split(","):
+        print(f"⚙️ {index_type}...", file=sys.stderr)
+        if index_type.startswith("numpy-"):
+            dtype = "int8" if index_type == "numpy-int8" else "float32"
+            results.extend(run_numpy(dtype, vectors, queries, truth, args.k))
+        else:
+            results.extend(run_faiss(index_type, vectors, queries, truth, args.k))
+
+    columns = ["index", "params", "recall", "qps", "build_s", "mb", "bytes_per_vector"]
+    print(" | ".join(columns))
+    for row in results:
+        print(" | ".join(str(row[c]) for c in columns))
+
+    report = {"rows": args.rows, "dim": args.dim, "queries": args.queries, "k": args.k, "results": results}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
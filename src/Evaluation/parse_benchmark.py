@@ -0,0 +1,129 @@
+"""
+Recovery rate and cost of parsing malformed LLM output.
+
+Builds outputs in the /chat contract for random candidate pools from the
+catalog, then applies one defect per variant: markdown fence, prose around
+the object, trailing commas, smart quotes, raw newlines, unescaped inner
+quotes, Python literals, truncation after / inside selected_ids, or no JSON
+at all. Per variant it reports how often the turn still yields the right
+shortlist with the old strip-fences-and-json.loads parse vs
+output_parser.parse_llm_output, and the parse time.
+
+    python -m src.Evaluation.parse_benchmark
+    python -m src.Evaluation.parse_benchmark --samples 500 --out parse.json
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+from src.Evaluation.benchmark import percentiles
+from src.Indexing.records_io import load_records
+from src.LLM.output_parser import parse_llm_output
+
+
+def legacy_parse(raw: str):
+    """finalize_response's parse before parse_llm_output, kept as the comparison point."""
+    cleaned = raw.strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
+    try:
+        return json.loads(cleaned).get("selected_ids")
+    except Exception:
+        return None
+
+
+def _reply(rng: random.Random, names: List[str]) -> str:
+    rows = "\n".join(f"| {name} | {rng.randint(10, 60)} min |" for name in names)
+    return f"Based on the role, these fit well:\n\n| Assessment | Duration |\n|---|---|\n{rows}"
+
+
+def _contract(reply: str, ids: List[str]) -> str:
+    return json.dumps({"reply": reply, "selected_ids": ids, "end_of_conversation": False}, ensure_ascii=False)
+
+
+DEFECTS: Dict[str, Callable[[str, List[str], str], str]] = {
+    "clean": lambda raw, ids, reply: raw,
+    "fenced": lambda raw, ids, reply: f"```json\n{raw}\n```",
+    "prose": lambda raw, ids, reply: f"Sure, here is my answer:\n{raw}\nLet me know if you need more.",
+    "trailing_commas": lambda raw, ids, reply: raw.replace('"]', '",]').replace("false}", "false,}"),
+    "smart_quotes": lambda raw, ids, reply: raw.replace('\\"', "'").replace('"', "“", 1).replace('"', "”", 1),
+    "raw_newlines": lambda raw, ids, reply: raw.replace("\\n", "\n"),
+    "inner_quotes": lambda raw, ids, reply: raw.replace("these fit", '"these" fit'),
+    "python_literals": lambda raw, ids, reply: raw.replace("false", "False"),
+    "truncated_after_ids": lambda raw, ids, reply: raw[:raw.index('"end_of_conversation"') + 22],
+    "truncated_in_ids": lambda raw, ids, reply: raw[:raw.index(ids[-1])],
+    "no_json": lambda raw, ids, reply: "I'd go with " + ", ".join(f'"{i}"' for i in ids) + ".",
+}
+
+
+def build_corpus(samples: int, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed)
+    records = load_records()
+    corpus = []
+    for _ in range(samples):
+        pool = rng.sample(records, 10)
+        picked = pool[:rng.randint(2, 5)]
+        ids = [r["id"] for r in picked]
+        reply = _reply(rng, [r["name"] for r in picked])
+        raw = _contract(reply, ids)
+        for defect, apply in DEFECTS.items():
+            corpus.append({
+                "defect": defect,
+                "raw": apply(raw, ids, reply),
+                "pool": [r["id"] for r in pool],
+                # a truncation inside the array loses the last id
+                "expected": ids[:-1] if defect == "truncated_in_ids" else ids,
+            })
+    return corpus
+
+
+def _recovered(ids, expected: List[str], pool: List[str]) -> bool:
+    return [i for i in (ids or []) if i in pool] == expected
+
+
+def run(corpus: List[Dict]) -> Dict:
+    report = {}
+    for defect in DEFECTS:
+        items = [c for c in corpus if c["defect"] == defect]
+        legacy_ok = new_ok = 0
+        timings = []
+        methods: Dict[str, int] = {}
+        for item in items:
+            legacy_ok += _recovered(legacy_parse(item["raw"]), item["expected"], item["pool"])
+            started = time.perf_counter()
+            output = parse_llm_output(item["raw"], item["pool"])
+            timings.append((time.perf_counter() - started) * 1e6)
+            new_ok += _recovered((output.data or {}).get("selected_ids"), item["expected"], item["pool"])
+            methods[output.method] = methods.get(output.method, 0) + 1
+        report[defect] = {
+            "legacy_recovered": round(legacy_ok / len(items), 3),
+            "recovered": round(new_ok / len(items), 3),
+            "methods": methods,
+            "parse_us": percentiles(timings),
+        }
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Shortlist recovery from malformed LLM output: legacy vs tolerant parser")
+    parser.add_argument("--samples", type=int, default=200, help="outputs per defect")
+    parser.add_argument("--out", default=None, help="write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = run(build_corpus(args.samples))
+    print(f"{'defect':22s} legacy  tolerant  p50 us")
+    for defect, row in report.items():
+        print(f"{defect:22s} {row['legacy_recovered']:6.3f}  {row['recovered']:8.3f}  {row['parse_us']['p50']:6.1f}")
+
+    payload = json.dumps({"samples": args.samples, "defects": report}, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Calibrate the router's centroid thresholds on the conversation traces.
+
+Replays every trace turn through route_turn's rule stage. Each turn no rule
+decides and that is short enough for the centroid check (ROUTER_MAX_WORDS)
+is embedded once, with the configured embeddings. The script then sweeps
+ROUTER_MIN_SIMILARITY x ROUTER_MIN_MARGIN. For every pair it counts the
+turns the centroid stage would answer from a template, and the
+disagreements: templated turns whose reference agent showed a shortlist or
+did not end the conversation as the template would. The recommended pair
+is the least strict one with no disagreements.
+
+The numbers only mean something for the embeddings production uses:
+
+    python -m src.Evaluation.router_calibration                      # EMBEDDINGS_BACKEND (mistral)
+    python -m src.Evaluation.router_calibration --embeddings local --out router.json
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List
+
+SIMILARITY_SWEEP = [0.70, 0.75, 0.80, 0.85, 0.90, 0.95]
+MARGIN_SWEEP = [0.02, 0.05, 0.08, 0.12, 0.16]
+
+
+def centroid_turns(traces, handle) -> List[Dict]:
+    """Trace turns that would reach the centroid stage, with their query vector."""
+    from src.LLM import router
+    from src.main import ChatMessage
+
+    turns = []
+    for trace in traces:
+        history = []
+        for turn, (user_text, agent_text) in enumerate(trace["turns"]):
+            history.append(ChatMessage(role="user", content=user_text))
+            # the word limit only: ROUTER_CENTROIDS is what this calibrates
+            if router.route_by_rules(history, handle) is None and len(router._words(user_text)) <= router.ROUTER_MAX_WORDS:
+                turns.append({
+                    "trace": trace["name"],
+                    "turn": turn + 1,
+                    "text": user_text,
+                    "history": list(history),
+                    "flags": trace["flags"][turn],
+                    "vector": handle.store.embeddings.embed_query(user_text),
+                })
+            history.append(ChatMessage(role="assistant", content=agent_text))
+    return turns
+
+
+def sweep(turns: List[Dict], handle) -> List[Dict]:
+    from src.Evaluation.benchmark import route_matches
+    from src.LLM import router
+
+    rows = []
+    for min_similarity in SIMILARITY_SWEEP:
+        for min_margin in MARGIN_SWEEP:
+            fast, disagreements = 0, []
+            for t in turns:
+                route = router.route_by_centroid(t["history"], handle, t["vector"], min_similarity, min_margin)
+                if route.intent == router.LLM:
+                    continue
+                fast += 1
+                if not route_matches(route.intent, t["flags"]):
+                    disagreements.append(f"{t['trace']}#{t['turn']} {route.intent}: {t['text'][:60]}")
+            rows.append({
+                "min_similarity": min_similarity,
+                "min_margin": min_margin,
+                "fast_path": fast,
+                "disagreements": disagreements,
+            })
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sweep the router's centroid thresholds over the traces")
+    parser.add_argument("--traces", default="traces/*.md")
+    parser.add_argument("--embeddings", choices=["mistral", "local"], default=None,
+                        help="override EMBEDDINGS_BACKEND")
+    parser.add_argument("--out", default=None, help="write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    if args.embeddings:
+        os.environ["EMBEDDINGS_BACKEND"] = args.embeddings
+
+    from src.Evaluation.benchmark import load_traces
+    from src.Indexing.Index import EMBEDDINGS_BACKEND, get_index_handle
+    from src.LLM import router
+
+    handle = get_index_handle()
+    if router.centroids_for(handle) is None:
+        print("❌ Intent centroids could not be built with these embeddings")
+        return 1
+    turns = centroid_turns(load_traces(args.traces), handle)
+    rows = sweep(turns, handle)
+
+    print(f"{len(turns)} trace turns reach the centroid stage ({EMBEDDINGS_BACKEND} embeddings)")
+    print("min_sim  min_margin  fast_path  disagreements")
+    for row in rows:
+        print(f"{row['min_similarity']:7.2f}  {row['min_margin']:10.2f}  {row['fast_path']:9d}  {len(row['disagreements'])}")
+    safe = [r for r in rows if not r["disagreements"] and r["fast_path"]]
+    best = max(safe, key=lambda r: (r["fast_path"], -r["min_similarity"], -r["min_margin"])) if safe else None
+    if best:
+        print(f"✅ least strict safe pair: ROUTER_MIN_SIMILARITY={best['min_similarity']} "
+              f"ROUTER_MIN_MARGIN={best['min_margin']} ({best['fast_path']} fast-path turns)")
+    else:
+        top = max((handle.derived("intent_centroids").nearest(t["vector"])[1] for t in turns), default=0.0)
+        print(f"⚠️ no pair in the sweep templates a turn without disagreeing (best similarity {top:.2f}); "
+              "leave ROUTER_CENTROIDS off for these embeddings")
+
+    for t in turns:
+        label, similarity, margin = handle.derived("intent_centroids").nearest(t["vector"])
+        t.update(label=label, similarity=round(similarity, 4), margin=round(margin, 4))
+        for key in ("history", "vector", "flags"):
+            t.pop(key)
+    report = {"embeddings": EMBEDDINGS_BACKEND, "turns": turns, "sweep": rows, "recommended": best}
+    payload = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
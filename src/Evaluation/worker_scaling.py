@@ -0,0 +1,156 @@
+"""
+Worker-scaling benchmark for the shared memory-mapped index.
+
+Starts 1, 2, 4, ... worker processes (spawned, like `uvicorn --workers`),
+each loading the NumPy index either memory-mapped (`mmap`, what
+`python -m src.serve` runs) or into private memory (`copy`, what every
+FAISS worker does), then hammering it with vector searches for a fixed
+time. Reports total and per-worker searches/s and per-worker memory:
+RSS counts shared pages in full, PSS splits them between the processes
+mapping them, USS is what the worker alone holds.
+
+    python -m src.Evaluation.worker_scaling                      # live catalog index
+    python -m src.Evaluation.worker_scaling --rows 200000        # synthetic 200k x 1024
+    python -m src.Evaluation.worker_scaling --workers 1,2,4,8 --out scaling.json
+
+Searches are pure NumPy (no embedding calls), with one BLAS thread per
+worker. Throughput can only scale up to the number of cores.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+
+import numpy as np
+import psutil
+
+from src.Indexing.Index import numpy_path
+from src.Indexing.numpy_index import NumpyVectorStore
+
+MB = 1024 * 1024
+
+
+def build_synthetic_index(rows: int, dim: int, path: str, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((rows, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    page_content = [f"synthetic assessment {i}" for i in range(rows)]
+    metadatas = [{"id": str(i), "name": f"Assessment {i}", "url": f"https://example.com/{i}"} for i in range(rows)]
+    NumpyVectorStore.save(path, vectors, page_content, metadatas)
+
+
+def _memory() -> Dict[str, float]:
+    info = psutil.Process().memory_full_info()
+    return {
+        "rss_mb": info.rss / MB,
+        "pss_mb": getattr(info, "pss", info.rss) / MB,
+        "uss_mb": info.uss / MB,
+    }
+
+
+def worker(path: str, mmap: bool, seconds: float, k: int, seed: int, start, results) -> None:
+    store = NumpyVectorStore.load(path, mmap=mmap)
+    for _ in store.documents:   # materialize documents, as warmup's derived structures do
+        pass
+    rng = np.random.default_rng(seed)
+    queries = rng.standard_normal((64, store.vectors.shape[1]), dtype=np.float32)
+
+    start.wait()
+    searches = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        store.similarity_search_with_score_by_vector(queries[searches % len(queries)], k)
+        searches += 1
+    # measured while every worker is still alive, so PSS sees all mappings
+    memory = _memory()
+    start.wait()
+    results.put({"searches": searches, **memory})
+
+
+def run(path: str, mode: str, workers: int, seconds: float, k: int) -> Dict:
+    ctx = mp.get_context("spawn")
+    start = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=worker, args=(path, mode == "mmap", seconds, k, i, start, results))
+        for i in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    per_worker: List[Dict] = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    def mean(key):
+        return round(sum(r[key] for r in per_worker) / workers, 1)
+
+    total = sum(r["searches"] for r in per_worker) / seconds
+    return {
+        "mode": mode,
+        "workers": workers,
+        "searches_per_s": round(total, 1),
+        "searches_per_s_per_worker": round(total / workers, 1),
+        "rss_mb": mean("rss_mb"),
+        "pss_mb": mean("pss_mb"),
+        "uss_mb": mean("uss_mb"),
+        "total_pss_mb": round(sum(r["pss_mb"] for r in per_worker), 1),
+    }
+
+
+def print_table(rows: List[Dict]) -> None:
+    columns = ["mode", "workers", "searches_per_s", "searches_per_s_per_worker", "rss_mb", "pss_mb", "uss_mb", "total_pss_mb"]
+    print(" | ".join(columns))
+    for row in rows:
+        print(" | ".join(str(row[c]) for c in columns))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Throughput and per-worker memory as worker count grows")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--modes", default="mmap,copy", help="mmap (shared) and/or copy (private per worker)")
+    parser.add_argument("--rows", type=int, default=0, help="synthetic index rows; 0 = the live catalog index")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--out", default=None, help="write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    tmp_dir = None
+    path = numpy_path()
+    if args.rows:
+        tmp_dir = tempfile.mkdtemp(prefix="worker-scaling-")
+        path = tmp_dir
+        build_synthetic_index(args.rows, args.dim, path)
+
+    try:
+        index_mb = os.path.getsize(os.path.join(path, "vectors.npy")) / MB
+        rows = [
+            run(path, mode, int(n), args.seconds, args.k)
+            for mode in args.modes.split(",")
+            for n in args.workers.split(",")
+        ]
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    report = {"index": path if not args.rows else f"synthetic {args.rows}x{args.dim}",
+              "vectors_mb": round(index_mb, 1), "cpus": os.cpu_count(), "runs": rows}
+    print_table(rows)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
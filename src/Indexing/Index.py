@@ -1,7 +1,13 @@
+import itertools
+import json
 import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
 from dotenv import load_dotenv
-from langchain_community.vectorstores import FAISS
-from langchain_mistralai import MistralAIEmbeddings
+
+from src.Cache.embedding_cache import CachedEmbeddings
 
 
 load_dotenv()
@@ -9,19 +15,345 @@ load_dotenv()
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 FAISS_PATH = os.path.join(PROJECT_ROOT, "data", "faiss_index")
 
-_vector_store = None
+# faiss  -> LangChain FAISS + pickled docstore (data/faiss_index)
+# numpy  -> memory-mapped float32 matrix + records (data/numpy_index),
+#           no pickle and no langchain_community import
+INDEX_BACKEND = os.getenv("INDEX_BACKEND", "faiss")
 
-def get_vector_store():
-    global _vector_store
-    if _vector_store is not None:
-        return _vector_store
-    if not os.path.exists(FAISS_PATH):
-        raise RuntimeError(f"FAISS index not found at '{FAISS_PATH}'. Build it first.")
+# Query-embedding cache — multi-turn chats resend near-identical queries, so
+# most turns can skip the remote embed round-trip. Size 0 disables the cache,
+# TTL 0 means entries only leave by LRU eviction, an empty path keeps it
+# memory-only.
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "mistral")   # mistral | local
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "0"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
 
-    print("✅ Loading FAISS index from disk...")
-    embeddings = MistralAIEmbeddings(
+# build_index.py writes every build to data/index_builds/<version>/{faiss,numpy}
+# and publishes it by replacing data/CURRENT_INDEX (one line: the version) in a
+# single os.replace, so both backends switch together and the live path never
+# disappears. Without that file (a checked-in or pre-versioning tree) the fixed
+# data/faiss_index and data/numpy_index directories are served.
+INDEX_BUILDS_PATH = os.path.join(PROJECT_ROOT, "data", "index_builds")
+CURRENT_INDEX_FILE = os.path.join(PROJECT_ROOT, "data", "CURRENT_INDEX")
+
+# Seconds between checks of the live index's _build_info.json; 0 = no watcher
+INDEX_WATCH_INTERVAL = float(os.getenv("INDEX_WATCH_INTERVAL", "0"))
+BUILD_INFO_FILE = "_build_info.json"
+
+_embeddings = None
+
+
+def _build_embedder(resilient: bool = True):
+    """
+    The embeddings client. resilient=False skips the serving guard (deadline,
+    breaker) — for offline builds, whose own backoff owns the retries.
+    """
+    if EMBEDDINGS_BACKEND == "local":
+        from src.Indexing.local_embeddings import HashingEmbeddings
+        return HashingEmbeddings()
+    from langchain_mistralai import MistralAIEmbeddings
+    from src.LLM.resilience import ResilientEmbeddings
+
+    base_url = os.getenv("MISTRAL_BASE_URL")
+    # no client-side retries (the default is 5 tries, 30s apart): the
+    # resilience guard and build_index's backoff own the retry policy
+    client = MistralAIEmbeddings(
         model="mistral-embed",
         mistral_api_key=os.getenv("MISTRAL_API_KEY"),
+        max_retries=None,
+        timeout=30,
+        **({"endpoint": base_url} if base_url else {}),
     )
-    _vector_store = FAISS.load_local(FAISS_PATH, embeddings, allow_dangerous_deserialization=True)
-    return _vector_store
\ No newline at end of file
+    return ResilientEmbeddings(client) if resilient else client
+
+
+def get_embeddings():
+    global _embeddings
+    if _embeddings is not None:
+        return _embeddings
+    embedder = _build_embedder()
+    if EMBEDDING_CACHE_SIZE > 0 or EMBEDDING_CACHE_PATH:
+        embedder = CachedEmbeddings(
+            embedder,
+            maxsize=EMBEDDING_CACHE_SIZE,
+            ttl=EMBEDDING_CACHE_TTL,
+            disk_path=EMBEDDING_CACHE_PATH or None,
+            namespace="mistral-embed" if EMBEDDINGS_BACKEND == "mistral" else EMBEDDINGS_BACKEND,
+        )
+    _embeddings = embedder
+    return _embeddings
+
+
+def get_embedding_cache():
+    """
+    The active CachedEmbeddings, or None when caching is disabled or the
+    embedder hasn't been built yet — a metrics scrape must not build it.
+    """
+    return _embeddings if isinstance(_embeddings, CachedEmbeddings) else None
+
+
+def current_build_dir() -> Optional[str]:
+    """Directory of the published build, or None when CURRENT_INDEX is absent."""
+    try:
+        with open(CURRENT_INDEX_FILE, "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    return os.path.join(INDEX_BUILDS_PATH, version) if version else None
+
+
+def faiss_path() -> str:
+    build_dir = current_build_dir()
+    return os.path.join(build_dir, "faiss") if build_dir else FAISS_PATH
+
+
+def numpy_path() -> str:
+    from src.Indexing.numpy_index import NUMPY_INDEX_PATH
+
+    build_dir = current_build_dir()
+    return os.path.join(build_dir, "numpy") if build_dir else NUMPY_INDEX_PATH
+
+
+def load_faiss_store(path: str = None):
+    from langchain_community.vectorstores import FAISS
+
+    path = path or faiss_path()
+
+    if not os.path.exists(path):
+        raise RuntimeError(f"FAISS index not found at '{path}'. Build it first.")
+    from src.Indexing.index_types import configure_search
+
+    print("✅ Loading FAISS index from disk...")
+    store = FAISS.load_local(path, get_embeddings(), allow_dangerous_deserialization=True)
+    configure_search(store.index)   # INDEX_NPROBE / INDEX_EF_SEARCH for IVF / HNSW builds
+    return store
+
+
+def load_numpy_store(path: str = None):
+    from src.Indexing.numpy_index import NumpyVectorStore
+
+    path = path or numpy_path()
+    if not os.path.exists(path):
+        raise RuntimeError(
+            f"NumPy index not found at '{path}'. Export it with `python -m src.Indexing.numpy_index`."
+        )
+    print("✅ Loading NumPy index from disk...")
+    return NumpyVectorStore.load(path, embeddings=get_embeddings())
+
+
+def index_path() -> str:
+    """The live index directory of INDEX_BACKEND. Resolve once and load everything from it."""
+    return numpy_path() if INDEX_BACKEND == "numpy" else faiss_path()
+
+
+def read_build_info(path: str) -> Dict:
+    try:
+        with open(os.path.join(path, BUILD_INFO_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def store_size(vector_store) -> int:
+    if hasattr(vector_store, "index") and hasattr(vector_store.index, "ntotal"):
+        return vector_store.index.ntotal
+    return len(vector_store)
+
+
+# ------------------------
+# Versioned index handle
+# ------------------------
+# Anything derived from the store (name index, BM25, ...) is registered here
+# and built per handle, so it can never go stale relative to the vectors.
+_derived_factories: Dict[str, Callable] = {}
+_versions = itertools.count(1)
+
+
+def register_derived(key: str, factory: Callable) -> None:
+    """factory(vector_store) -> derived structure, rebuilt for every new index."""
+    _derived_factories[key] = factory
+
+
+class IndexHandle:
+    """
+    Immutable snapshot of one loaded index plus everything derived from it.
+    Readers grab the current handle once per request and use only it, so a
+    reload swapping `_current_handle` never mixes two index versions.
+    """
+
+    def __init__(self, store, build_info: Optional[Dict] = None):
+        self.store = store
+        self.build_info = build_info or {}
+        self.version = f"{next(_versions)}:{self.build_info.get('source_hash', 'adhoc')}"
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    def derived(self, key: str):
+        value = self._derived.get(key)
+        if value is None:
+            with self._lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = _derived_factories[key](self.store)
+                    self._derived[key] = value
+        return value
+
+    def built(self, key: str):
+        """The derived structure if it is already built, else None (never builds)."""
+        return self._derived.get(key)
+
+    def invalidate(self, key: str, expected) -> None:
+        """Drop a derived value so the next derived() rebuilds it — only if it is still `expected`."""
+        with self._lock:
+            if self._derived.get(key) is expected:
+                del self._derived[key]
+
+    def warm(self) -> "IndexHandle":
+        for key in list(_derived_factories):
+            self.derived(key)
+        return self
+
+
+_current_handle: Optional[IndexHandle] = None
+_load_lock = threading.Lock()
+
+
+def _load_store(path: str):
+    if INDEX_BACKEND == "numpy":
+        return load_numpy_store(path)
+    return load_faiss_store(path)
+
+
+def get_index_handle() -> IndexHandle:
+    handle = _current_handle
+    if handle is not None:
+        return handle
+    with _load_lock:
+        if _current_handle is None:
+            path = index_path()
+            _install(IndexHandle(_load_store(path), read_build_info(path)))
+        return _current_handle
+
+
+def _install(handle: IndexHandle) -> None:
+    global _current_handle
+    _current_handle = handle
+
+
+def get_vector_store():
+    return get_index_handle().store
+
+
+def set_vector_store(vector_store) -> None:
+    """Install an already-built store (offline benchmarks, tests)."""
+    _install(IndexHandle(vector_store))
+
+
+def validate_index(store, build_info: Dict) -> None:
+    if not build_info:
+        raise RuntimeError(f"{BUILD_INFO_FILE} missing next to the index")
+    expected = build_info.get("count")
+    actual = store_size(store)
+    if expected is not None and expected != actual:
+        raise RuntimeError(f"index has {actual} vectors but {BUILD_INFO_FILE} says {expected}")
+    if actual == 0:
+        raise RuntimeError("index is empty")
+    if hasattr(store, "index_to_docstore_id") and len(store.index_to_docstore_id) != actual:
+        raise RuntimeError("FAISS docstore mapping does not match the vector count")
+
+
+def reload_index() -> IndexHandle:
+    """
+    Load the on-disk index into a fresh handle, validate it against its
+    _build_info.json, pre-build all derived indexes, then swap it in with a
+    single reference assignment. Raises (and keeps serving the old index)
+    if anything fails.
+    """
+    with _load_lock:
+        path = index_path()
+        build_info = read_build_info(path)
+        store = _load_store(path)
+        validate_index(store, build_info)
+        handle = IndexHandle(store, build_info).warm()
+        _install(handle)
+    print(f"🔄 Index reloaded — version {handle.version}, {store_size(store)} items")
+    return handle
+
+
+_watcher: Optional[threading.Thread] = None
+
+
+def start_index_watcher(interval: float = INDEX_WATCH_INTERVAL) -> None:
+    """Poll the live _build_info.json (and CURRENT_INDEX) and hot-reload when a new build lands."""
+    global _watcher
+    if interval <= 0 or _watcher is not None:
+        return
+
+    def marker():
+        path = index_path()
+        try:
+            return path, os.stat(os.path.join(path, BUILD_INFO_FILE)).st_mtime
+        except OSError:
+            return None
+
+    def loop():
+        seen = marker()
+        while True:
+            time.sleep(interval)
+            current = marker()
+            if current is None or current == seen:
+                continue
+            try:
+                reload_index()
+                seen = current
+            except Exception as e:
+                print(f"⚠️ Index reload failed, keeping version {get_index_handle().version}: {e}")
+                seen = current
+
+    _watcher = threading.Thread(target=loop, name="index-watcher", daemon=True)
+    _watcher.start()
+
+
+def iter_documents(vector_store):
+    """All catalog documents in index row order, whichever backend it is."""
+    documents = getattr(vector_store, "documents", None)
+    if documents is not None:
+        return documents
+    docstore, row_to_id = vector_store.docstore, vector_store.index_to_docstore_id
+    return [docstore.search(row_to_id[row]) for row in range(len(row_to_id))]
+
+
+def search_rows(vector_store, embedding, k: int, rows=None, search_params: Optional[Dict] = None):
+    """
+    Nearest neighbours restricted to `rows` (index row ids); None = all rows.
+    `search_params` ({"nprobe": .., "ef_search": ..}) tune IVF / HNSW FAISS
+    indexes for this call; the NumPy backend has no such knobs and ignores them.
+    """
+    if hasattr(vector_store, "documents"):
+        return vector_store.similarity_search_by_vector(embedding, k=k, rows=rows)
+    if rows is None and not search_params:
+        return vector_store.similarity_search_by_vector(embedding, k=k)
+
+    from src.Indexing.index_types import search
+
+    _, hits = search(vector_store.index, [embedding], k, search_params, rows)
+    docstore, row_to_id = vector_store.docstore, vector_store.index_to_docstore_id
+    return [docstore.search(row_to_id[r]) for r in hits[0] if r != -1]
+
+
+def search_by_vectors(vector_store, vectors, k: int, search_params: Optional[Dict] = None):
+    """
+    Batched nearest-neighbour search: one list of documents per query vector.
+    NumPy backend does a single matmul; FAISS does a single index.search.
+    """
+    if hasattr(vector_store, "similarity_search_batch_by_vectors"):
+        return vector_store.similarity_search_batch_by_vectors(vectors, k)
+
+    from src.Indexing.index_types import search
+
+    if not len(vectors):
+        return []
+    _, rows = search(vector_store.index, vectors, k, search_params)
+    docstore, row_to_id = vector_store.docstore, vector_store.index_to_docstore_id
+    return [[docstore.search(row_to_id[r]) for r in hits if r != -1] for hits in rows]
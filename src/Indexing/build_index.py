@@ -1,14 +1,35 @@
-import os
-import json
-from dotenv import load_dotenv
-from langchain_community.vectorstores import FAISS
-from langchain_mistralai import MistralAIEmbeddings
-from langchain_core.documents import Document
+"""
+Incremental index build.
 
-load_dotenv()
+Streams the catalog record by record: hashes each text_for_embedding,
+reuses the vectors of unchanged items from the current index and sends
+new/changed items to Mistral as they are read (batched, in parallel, with
+retry + backoff). Only what the index stores — text, metadata and a float32
+vector per item — is kept in memory. Deleted ids simply drop out.
+Each build writes both the FAISS and NumPy indexes into its own directory,
+data/index_builds/<version>/{faiss,numpy}, and is published by replacing
+data/CURRENT_INDEX in one os.replace. A running server or watcher never sees
+a half-written index, a missing path, or one backend ahead of the other.
+The last BUILD_KEEP builds stay on disk for workers still loading an older one.
+INDEX_TYPE picks the FAISS index type (see index_types.py) and
+NUMPY_INDEX_DTYPE the NumPy storage (float32 | int8).
+
+    python src/Indexing/build_index.py            # incremental
+    python src/Indexing/build_index.py --full     # re-embed everything
+    python src/Indexing/build_index.py --dry-run  # just print the diff
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
 
-if not os.getenv("MISTRAL_API_KEY"):
-    raise RuntimeError("MISTRAL_API_KEY not set in environment")
+import numpy as np
 
 # --------------------------------------------------
 # Paths — MUST match src/Indexing/Index.py exactly
@@ -16,70 +37,249 @@ if not os.getenv("MISTRAL_API_KEY"):
 PROJECT_ROOT = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "..", "..")
 )
-FAISS_PATH = os.path.join(PROJECT_ROOT, "data", "faiss_index")
-ASSESSMENTS_PATH = os.path.join(
-    PROJECT_ROOT, "src", "Indexing", "final_assessments.json"
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from dotenv import load_dotenv
+
+from src.Indexing.Index import (
+    CURRENT_INDEX_FILE, EMBEDDINGS_BACKEND, INDEX_BUILDS_PATH, _build_embedder, current_build_dir, faiss_path,
 )
+from src.Indexing.index_types import INDEX_TYPE, build_faiss_index, is_exact
+from src.Indexing.numpy_index import NUMPY_INDEX_DTYPE, NumpyVectorStore, catalog_metadata
+from src.Indexing.records_io import ASSESSMENTS_PATH, iter_records
+
+load_dotenv()
+
+BUILD_INFO_FILE = "_build_info.json"
+# float32 copy of the vectors next to a lossy (PQ/SQ/IVF) FAISS index, so the
+# next incremental build reuses exact vectors instead of reconstructions
+SOURCE_VECTORS_FILE = "source_vectors.npy"
+
+EMBED_BATCH_SIZE = int(os.getenv("BUILD_EMBED_BATCH_SIZE", "32"))
+EMBED_WORKERS = int(os.getenv("BUILD_EMBED_WORKERS", "4"))
+MAX_RETRIES = int(os.getenv("BUILD_MAX_RETRIES", "5"))
+# published builds kept in data/index_builds, the live one included
+BUILD_KEEP = max(1, int(os.getenv("BUILD_KEEP", "2")))
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:8]
 
-if not os.path.exists(ASSESSMENTS_PATH):
-    raise FileNotFoundError(f"Input data file not found: {ASSESSMENTS_PATH}")
-
-os.makedirs(os.path.dirname(FAISS_PATH), exist_ok=True)
-
-with open(ASSESSMENTS_PATH, "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-print(f"📄 Loaded {len(data)} assessments")
-
-documents = [
-    Document(
-        page_content=item["text_for_embedding"],
-        metadata={
-            "id": item["id"],
-            "name": item["name"],
-            "url": item["url"],
-            "test_type": item["test_type"],
-            "description": item.get("description", ""),
-            "job_levels": item.get("job_levels", []),
-            "languages": item.get("languages", []),
-            "duration": item.get("duration", ""),
-            "remote_testing": item.get("remote_testing", False),
-            "adaptive_irt": item.get("adaptive_irt", False),
-        },
-    )
-    for item in data
-]
 
 # --------------------------------------------------
-# Create embeddings + build index — key passed explicitly
+# Previous build -> {id: (text_hash, vector)}
 # --------------------------------------------------
-embeddings = MistralAIEmbeddings(
-    model="mistral-embed",
-    mistral_api_key=os.getenv("MISTRAL_API_KEY"),
-)
+def load_previous_vectors(embeddings, path: str = None) -> Dict[str, tuple]:
+    """
+    Vectors of the currently deployed index, keyed by catalog id. Hashes are
+    recomputed from the stored page_content (== text_for_embedding), so this
+    also works for indexes built before per-item hashes were recorded.
+    """
+    path = path or faiss_path()
+    if not os.path.exists(os.path.join(path, "index.faiss")):
+        return {}
+    from langchain_community.vectorstores import FAISS
+
+    store = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+    source_path = os.path.join(path, SOURCE_VECTORS_FILE)
+    if os.path.exists(source_path):
+        vectors = np.load(source_path, mmap_mode="r")
 
-print("⚙️ Building FAISS index...")
-vectorstore = FAISS.from_documents(documents, embeddings)
-vectorstore.save_local(FAISS_PATH)
+        def vector(row):
+            return np.array(vectors[row])
+    elif is_exact(store.index):
+        vector = store.index.reconstruct
+    else:
+        print("⚠️ Previous index is lossy and has no source vectors; re-embedding everything")
+        return {}
+    previous = {}
+    for row, doc_id in store.index_to_docstore_id.items():
+        doc = store.docstore.search(doc_id)
+        previous[doc.metadata["id"]] = (text_hash(doc.page_content), vector(row))
+    return previous
 
-print("✅ FAISS index successfully built and saved")
-print(f"📂 Location: {FAISS_PATH}")
 
 # --------------------------------------------------
-# Write a build marker so staleness is detectable
+# Embedding with retry/backoff
 # --------------------------------------------------
-import hashlib
-import time
+def _embed_with_retry(embeddings, texts: List[str]) -> List[List[float]]:
+    for attempt in range(MAX_RETRIES):
+        try:
+            return embeddings.embed_documents(texts)
+        except Exception as e:
+            if attempt == MAX_RETRIES - 1:
+                raise
+            wait = min(30.0, 2 ** attempt) + random.uniform(0, 0.5)
+            print(f"⚠️ embed batch failed ({e}); retrying in {wait:.1f}s")
+            time.sleep(wait)
+
+
+def embed_texts(embeddings, texts: List[str]) -> List[List[float]]:
+    batches = [texts[i:i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+    if not batches:
+        return []
+    with ThreadPoolExecutor(max_workers=min(EMBED_WORKERS, len(batches))) as pool:
+        results = pool.map(lambda batch: _embed_with_retry(embeddings, batch), batches)
+        return [vec for batch in results for vec in batch]
 
-with open(ASSESSMENTS_PATH, "rb") as f:
-    source_hash = hashlib.md5(f.read()).hexdigest()[:8]
 
-marker_path = os.path.join(FAISS_PATH, "_build_info.json")
-with open(marker_path, "w") as f:
-    json.dump({
+# --------------------------------------------------
+# Publishing a build
+# --------------------------------------------------
+def publish_build(version: str) -> None:
+    """Point CURRENT_INDEX at data/index_builds/<version> with a single atomic replace."""
+    tmp_file = f"{CURRENT_INDEX_FILE}.tmp-{os.getpid()}"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, CURRENT_INDEX_FILE)
+
+
+def prune_builds(keep: int = BUILD_KEEP) -> None:
+    """Remove published builds beyond the newest `keep`; never the live one."""
+    live = os.path.basename(current_build_dir() or "")
+    builds = sorted(
+        (name for name in os.listdir(INDEX_BUILDS_PATH) if not name.startswith(".")),
+        key=lambda name: os.path.getmtime(os.path.join(INDEX_BUILDS_PATH, name)),
+        reverse=True,
+    )
+    for name in builds[keep:]:
+        if name != live:
+            shutil.rmtree(os.path.join(INDEX_BUILDS_PATH, name), ignore_errors=True)
+
+
+def write_faiss(tmp_dir: str, texts: List[str], metadatas: List[Dict], matrix: np.ndarray, embeddings,
+                index_type: str = INDEX_TYPE) -> str:
+    """Build the INDEX_TYPE index and save it as a LangChain FAISS store. -> factory spec"""
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+
+    index, spec = build_faiss_index(matrix, index_type)
+    doc_ids = [str(row) for row in range(len(texts))]
+    store = FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore({
+            doc_id: Document(page_content=text, metadata=meta)
+            for doc_id, text, meta in zip(doc_ids, texts, metadatas)
+        }),
+        index_to_docstore_id=dict(enumerate(doc_ids)),
+    )
+    store.save_local(tmp_dir)
+    if not is_exact(index):
+        np.save(os.path.join(tmp_dir, SOURCE_VECTORS_FILE), matrix)
+    return spec
+
+
+def build(full: bool = False, dry_run: bool = False, source: str = ASSESSMENTS_PATH) -> Dict:
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"Input data file not found: {source}")
+
+    # the bare client: bulk document embeds must not fill the query cache or
+    # trip the serving breaker, and _embed_with_retry owns the backoff
+    embeddings = _build_embedder(resilient=False)
+    previous = {} if full else load_previous_vectors(embeddings)
+
+    hashes: Dict[str, str] = {}
+    texts: List[str] = []
+    metadatas: List[Dict] = []
+    vectors: List = []           # float32 rows; None until a pending embed lands
+    to_embed: List[str] = []
+    pending: List[int] = []      # rows read but not embedded yet
+
+    def embed_pending():
+        fresh = embed_texts(embeddings, [texts[row] for row in pending])
+        for row, vector in zip(pending, fresh):
+            vectors[row] = np.asarray(vector, dtype=np.float32)
+        pending.clear()
+
+    for item in iter_records(source):
+        text = item["text_for_embedding"]
+        hashes[item["id"]] = digest = text_hash(text)
+        texts.append(text)
+        metadatas.append(catalog_metadata(item))
+        old = previous.get(item["id"])
+        if old is not None and old[0] == digest:
+            vectors.append(np.asarray(old[1], dtype=np.float32))
+            continue
+        vectors.append(None)
+        to_embed.append(item["id"])
+        pending.append(len(texts) - 1)
+        # one batch per embed worker, sent while the rest is still being read
+        if not dry_run and len(pending) >= EMBED_BATCH_SIZE * EMBED_WORKERS:
+            embed_pending()
+
+    if not texts:
+        raise ValueError(f"No assessments in {source}")
+    deleted = sorted(set(previous) - set(hashes))
+    print(f"📄 Read {len(texts)} assessments")
+    print(f"🔁 {len(texts) - len(to_embed)} unchanged, {len(to_embed)} new/changed, {len(deleted)} deleted")
+
+    if dry_run:
+        return {"embed": to_embed, "deleted": deleted}
+
+    embed_pending()
+    previous.clear()
+    matrix = np.stack(vectors)
+    del vectors
+
+    build_info = {
         "built_at": time.strftime("%Y-%m-%d %H:%M:%S"),
-        "source_hash": source_hash,
-        "source_file": ASSESSMENTS_PATH,
-    }, f, indent=2)
+        "source_hash": file_hash(source),
+        "source_file": source,
+        "count": len(texts),
+        "embedded": len(to_embed),
+        "deleted": len(deleted),
+        "items": hashes,
+    }
+
+    version = f"{time.strftime('%Y%m%d-%H%M%S')}-{build_info['source_hash']}-{os.getpid()}"
+    build_dir = os.path.join(INDEX_BUILDS_PATH, version)
+    tmp_dir = os.path.join(INDEX_BUILDS_PATH, f".tmp-{version}")
+    os.makedirs(INDEX_BUILDS_PATH, exist_ok=True)
+    try:
+        build_info["index_type"] = write_faiss(os.path.join(tmp_dir, "faiss"), texts, metadatas, matrix, embeddings)
+        build_info["numpy_dtype"] = NUMPY_INDEX_DTYPE
+        NumpyVectorStore.save(os.path.join(tmp_dir, "numpy"), matrix, texts, metadatas)
+        for backend in ("faiss", "numpy"):
+            with open(os.path.join(tmp_dir, backend, BUILD_INFO_FILE), "w") as f:
+                json.dump(build_info, f, indent=2)
+        # complete under its final name before anything points at it
+        os.replace(tmp_dir, build_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    publish_build(version)
+    prune_builds()
+
+    print("✅ FAISS + NumPy indexes successfully built and published")
+    print(f"📂 Location: {build_dir} (live via {CURRENT_INDEX_FILE})")
+    return build_info
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally (re)build the assessment index")
+    parser.add_argument("--full", action="store_true", help="ignore the current index and re-embed everything")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be embedded/deleted")
+    parser.add_argument("--input", default=ASSESSMENTS_PATH, help="cleaned catalog, JSONL or JSON array")
+    args = parser.parse_args(argv)
+
+    if EMBEDDINGS_BACKEND == "mistral" and not os.getenv("MISTRAL_API_KEY"):
+        raise RuntimeError("MISTRAL_API_KEY not set in environment")
+
+    build(full=args.full, dry_run=args.dry_run, source=args.input)
+
 
-print(f"📝 Build marker written: {marker_path}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Read-only catalog records, built once per index handle.
+
+Retrieval used to turn every hit into a fresh 10-key dict (_format_result).
+Then the prompt builders re-derived the same per-assessment strings on every
+turn: test-type codes, duration minutes, language bases, clipped
+descriptions and JSON fragments. A CatalogRecord holds the fields in
+__slots__ with repeated strings interned. It carries those fragments
+precomputed, so a turn only picks records by row id and joins strings.
+
+Records are Mappings (`c["name"]`, `c.get("duration")`, `dict(c)`), so code
+written against the old candidate dicts keeps working, and so do dicts that
+come back from a persisted session. Records are shared between requests:
+treat the list fields as read-only.
+"""
+import json
+import sys
+from collections.abc import Mapping
+from typing import Dict, Iterable, List, Optional
+
+from src.Indexing.numpy_index import METADATA_FIELDS
+from src.LLM.prompt import table_head
+
+_DEFAULTS = {
+    "description": "",
+    "job_levels": [],
+    "languages": [],
+    "duration": "",
+    "remote_testing": False,
+    "adaptive_irt": False,
+}
+# description chars in the PROMPT_FORMAT=json view (token budget)
+JSON_PROMPT_DESCRIPTION_CHARS = 300
+
+
+def _intern(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [sys.intern(v) if isinstance(v, str) else v for v in value]
+    return value
+
+
+class CatalogRecord(Mapping):
+    """One assessment: its metadata fields plus precomputed prompt/response fragments."""
+
+    __slots__ = tuple(METADATA_FIELDS) + ("row", "table_head", "prompt_json", "preview_json", "_clips")
+
+    def __init__(self, metadata: Dict, row: int = -1):
+        setter = object.__setattr__
+        for field in METADATA_FIELDS:
+            setter(self, field, _intern(metadata.get(field, _DEFAULTS.get(field))))
+        setter(self, "row", row)
+        setter(self, "_clips", {})
+        setter(self, "table_head", table_head(self))
+        setter(self, "prompt_json", json.dumps(json_prompt_view(self), ensure_ascii=False))
+        setter(self, "preview_json", json.dumps(preview(self), ensure_ascii=False))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CatalogRecord is read-only")
+
+    # Mapping over the metadata fields only
+    def __getitem__(self, key: str):
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(METADATA_FIELDS)
+
+    def __len__(self) -> int:
+        return len(METADATA_FIELDS)
+
+    def __contains__(self, key) -> bool:
+        return key in _FIELD_SET
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in _FIELD_SET else default
+
+    def __repr__(self):
+        return f"CatalogRecord(row={self.row}, id={self.id!r})"
+
+    def clipped_description(self, chars: int, clip) -> str:
+        """clip(description, chars), memoized per length (prompt budget levels)."""
+        text = self._clips.get(chars)
+        if text is None:
+            text = self._clips[chars] = clip(self.description, chars)
+        return text
+
+
+_FIELD_SET = frozenset(METADATA_FIELDS)
+
+
+def recommendation(c) -> Dict:
+    """The recommendation view of a candidate (record or plain dict)."""
+    if type(c) is CatalogRecord:
+        return {"name": c.name, "url": c.url, "test_type": c.test_type, "duration": c.duration, "languages": c.languages}
+    return {
+        "name": c["name"],
+        "url": c["url"],
+        "test_type": c["test_type"],
+        "duration": c.get("duration"),
+        "languages": c.get("languages"),
+    }
+
+
+def preview(c) -> Dict:
+    """Recommendation view + id, as /chat/stream sends the candidate pool."""
+    return {"id": c["id"], **recommendation(c)}
+
+
+def json_prompt_view(c) -> Dict:
+    """What the PROMPT_FORMAT=json prompt shows the model about a candidate."""
+    return {
+        "id": c["id"],
+        "name": c["name"],
+        "url": c["url"],
+        "test_type": c["test_type"],
+        "duration": c.get("duration"),
+        "languages": c.get("languages"),
+        "description": (c.get("description") or "")[:JSON_PROMPT_DESCRIPTION_CHARS],
+    }
+
+
+def json_list(candidates, attr: str, view) -> str:
+    """
+    json.dumps([view(c) for c in candidates]), joining each record's
+    precomputed `attr` fragment instead of serializing it again.
+    """
+    parts = []
+    for c in candidates:
+        fragment = getattr(c, attr, None)
+        parts.append(fragment if fragment is not None else json.dumps(view(c), ensure_ascii=False))
+    return "[" + ", ".join(parts) + "]"
+
+
+class CatalogStore:
+    """All records of one index, in row order, plus an id lookup."""
+
+    def __init__(self, documents: Iterable):
+        self.records: List[CatalogRecord] = [
+            CatalogRecord(doc.metadata, row) for row, doc in enumerate(documents)
+        ]
+        self.by_id: Dict[str, CatalogRecord] = {r.id: r for r in self.records}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def record(self, doc) -> CatalogRecord:
+        """The record for a retrieved document (row id when the store has one, else catalog id)."""
+        record_id = doc.metadata.get("id")
+        row = getattr(doc, "row", None)
+        if row is not None and 0 <= row < len(self.records) and self.records[row].id == record_id:
+            return self.records[row]
+        record = self.by_id.get(record_id)
+        return record if record is not None else CatalogRecord(doc.metadata)
+
+    def get(self, record_id: str) -> Optional[CatalogRecord]:
+        return self.by_id.get(record_id)
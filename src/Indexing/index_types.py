@@ -0,0 +1,186 @@
+"""
+Selectable FAISS index types for large catalogs.
+
+INDEX_TYPE picks what build_index.py writes to data/faiss_index:
+
+    flat    exact search, float32                     4 KB / 1024-d vector
+    sq8     exact scan over int8 scalar-quantized     1 KB
+    pq      product quantization (INDEX_PQ_M bytes)   64 B at M=64
+    hnsw    HNSW graph over float32 (approximate)     4 KB + graph
+    ivf     inverted lists over float32 (approx.)     4 KB
+    ivfpq   inverted lists over PQ codes (approx.)    INDEX_PQ_M B + list ids
+
+Any other value is used verbatim as a faiss.index_factory string (e.g.
+"IVF256,SQ8" or "HNSW32,PQ64"). The type travels inside index.faiss, so the
+loader needs no setting. Catalogs too small to train the requested type
+(PQ needs 256 vectors, IVF one per list) fall back to flat.
+
+Search-time knobs: INDEX_NPROBE (IVF lists visited) and INDEX_EF_SEARCH
+(HNSW candidate list) are the defaults set on load. Per call they can be
+overridden with retrieve_documents(..., search_params={"nprobe": 32}) or
+{"ef_search": 128}. Flat and PQ scans take no parameters.
+"""
+import math
+import os
+import re
+from typing import Dict, Optional
+
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+INDEX_PQ_M = int(os.getenv("INDEX_PQ_M", "64"))            # sub-quantizers = bytes per PQ code
+INDEX_NLIST = int(os.getenv("INDEX_NLIST", "0"))           # 0 = about 4 * sqrt(n)
+INDEX_HNSW_M = int(os.getenv("INDEX_HNSW_M", "32"))
+INDEX_EF_CONSTRUCTION = int(os.getenv("INDEX_EF_CONSTRUCTION", "64"))
+INDEX_NPROBE = int(os.getenv("INDEX_NPROBE", "16"))
+INDEX_EF_SEARCH = int(os.getenv("INDEX_EF_SEARCH", "64"))
+
+SEARCH_PARAMS = ("nprobe", "ef_search")
+_PQ_TRAIN_MIN = 256   # 2^8 centroids per sub-quantizer
+# rows per index.add call: bounds the encode buffers (one 100k-row PQ add fails with bad_alloc)
+_ADD_BATCH = 16384
+
+
+def default_nlist(n: int) -> int:
+    """About 4 * sqrt(n) lists, with at least 39 training points per list."""
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def _pq_m(dim: int, m: int = INDEX_PQ_M) -> int:
+    """Largest sub-quantizer count <= m that divides dim."""
+    m = max(1, min(m, dim))
+    while dim % m:
+        m -= 1
+    return m
+
+
+def factory_string(index_type: str, n: int, dim: int) -> str:
+    """faiss.index_factory spec for a preset (or a raw spec) at this catalog size."""
+    nlist = INDEX_NLIST or default_nlist(n)
+    presets = {
+        "flat": "Flat",
+        "sq8": "SQ8",
+        # np: skip polysemous training (minutes on large catalogs, unused here)
+        "pq": f"PQ{_pq_m(dim)}np",
+        "hnsw": f"HNSW{INDEX_HNSW_M}",
+        "ivf": f"IVF{nlist},Flat",
+        "ivfpq": f"IVF{nlist},PQ{_pq_m(dim)}np",
+    }
+    spec = presets.get(index_type.lower(), index_type)
+    if "PQ" in spec and n < _PQ_TRAIN_MIN:
+        print(f"⚠️ {n} vectors are too few to train {spec}; building Flat")
+        return "Flat"
+    ivf = re.match(r"IVF(\d+)", spec)
+    if ivf and n < int(ivf.group(1)):
+        print(f"⚠️ {n} vectors are too few for {spec}; building Flat")
+        return "Flat"
+    return spec
+
+
+def build_faiss_index(vectors, index_type: str = INDEX_TYPE):
+    """Train (when the type needs it) and fill an L2 index. -> (index, factory spec)"""
+    import faiss
+    import numpy as np
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    spec = factory_string(index_type, n, dim)
+    index = faiss.index_factory(dim, spec, faiss.METRIC_L2)
+    hnsw = _hnsw(index)
+    if hnsw is not None:
+        hnsw.efConstruction = INDEX_EF_CONSTRUCTION
+    if not index.is_trained:
+        index.train(vectors)
+    for start in range(0, n, _ADD_BATCH):
+        index.add(vectors[start:start + _ADD_BATCH])
+    configure_search(index)
+    return index, spec
+
+
+def _hnsw(index):
+    import faiss
+
+    index = faiss.downcast_index(index)
+    return index.hnsw if isinstance(index, faiss.IndexHNSW) else None
+
+
+def configure_search(index, nprobe: int = INDEX_NPROBE, ef_search: int = INDEX_EF_SEARCH) -> None:
+    """Default search-time parameters, stored on the index itself."""
+    import faiss
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    hnsw = _hnsw(index)
+    if hnsw is not None:
+        hnsw.efSearch = ef_search
+
+
+def search_parameters(index, params: Optional[Dict] = None, selector=None):
+    """
+    faiss.SearchParameters for one call: `params` overrides the index's
+    defaults, `selector` restricts the search to a set of row ids.
+    """
+    import faiss
+
+    params = _checked(params)
+    ivf = faiss.try_extract_index_ivf(index)
+    hnsw = _hnsw(index)
+    if ivf is not None:
+        search = faiss.SearchParametersIVF()
+        search.nprobe = min(int(params.get("nprobe", ivf.nprobe)), ivf.nlist)
+    elif hnsw is not None:
+        search = faiss.SearchParametersHNSW()
+        search.efSearch = int(params.get("ef_search", hnsw.efSearch))
+    else:
+        search = faiss.SearchParameters()
+    if selector is not None:
+        search.sel = selector
+    return search
+
+
+def _checked(params: Optional[Dict]) -> Dict:
+    params = params or {}
+    unknown = set(params) - set(SEARCH_PARAMS)
+    if unknown:
+        raise ValueError(f"unknown search params {sorted(unknown)}; expected {list(SEARCH_PARAMS)}")
+    return params
+
+
+def search(index, queries, k: int, params: Optional[Dict] = None, rows=None):
+    """
+    index.search with per-call `params`, restricted to `rows` (row ids) when
+    given. -> (distances, row ids), -1 for empty slots.
+    """
+    import faiss
+    import numpy as np
+
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    if rows is not None:
+        rows = np.asarray(rows, dtype=np.int64)
+        k = min(k, len(rows))
+    if not _checked(params) and rows is None:
+        return index.search(queries, k)
+    if isinstance(faiss.downcast_index(index), faiss.IndexPQ):
+        # IndexPQ takes no SearchParameters: rank the decoded subset directly
+        return index.search(queries, k) if rows is None else _decoded_search(index, queries, k, rows)
+    selector = faiss.IDSelectorBatch(rows) if rows is not None else None
+    return index.search(queries, k, params=search_parameters(index, params, selector))
+
+
+def _decoded_search(index, queries, k: int, rows):
+    import numpy as np
+
+    decoded = index.reconstruct_batch(rows)
+    distances = (
+        np.einsum("ij,ij->i", queries, queries)[:, None]
+        - 2.0 * queries @ decoded.T
+        + np.einsum("ij,ij->i", decoded, decoded)[None, :]
+    )
+    order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+    return np.take_along_axis(distances, order, axis=1), rows[order]
+
+
+def is_exact(index) -> bool:
+    """True when reconstruct() returns the stored float32 vectors unchanged."""
+    import faiss
+
+    return isinstance(faiss.downcast_index(index), faiss.IndexFlat)
@@ -0,0 +1,45 @@
+import hashlib
+import math
+import re
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic, offline stand-in for MistralAIEmbeddings.
+
+    Feature-hashes word unigrams + bigrams into a fixed-size L2-normalised
+    vector. Quality is bag-of-words level, but it is stable across processes
+    and machines, needs no API key, and has the same dim as mistral-embed —
+    good enough for cache tests, benchmarks and offline batch runs.
+    """
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+
+    def _bucket(self, feature: str):
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.size, 1.0 if (value >> 63) & 1 else -1.0
+
+    def _embed(self, text: str) -> List[float]:
+        tokens = _TOKEN_RE.findall((text or "").lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        vec = [0.0] * self.size
+        for feature in features:
+            idx, sign = self._bucket(feature)
+            vec[idx] += sign
+        norm = math.sqrt(sum(v * v for v in vec))
+        if norm:
+            vec = [v / norm for v in vec]
+        return vec
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
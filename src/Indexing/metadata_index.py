@@ -0,0 +1,131 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Set
+
+import numpy as np
+
+_DURATION_RE = re.compile(r"(\d+)\s*(?:-\s*\d+\s*)?(min|minute|minutes|mins|hour|hours|hr|hrs)\b", re.I)
+# qualifiers that aren't languages in their own right: "Latin American Spanish",
+# "Chinese Simplified", "English International", "English (USA)"
+_LANGUAGE_QUALIFIERS = {"latin", "american", "international", "simplified", "traditional"}
+
+
+def parse_duration_minutes(text: str) -> Optional[int]:
+    """'9 minutes' -> 9, '1 hour' -> 60; '', 'Untimed', 'Variable', 'TBC' -> None."""
+    match = _DURATION_RE.search(text or "")
+    if not match:
+        return None
+    value = int(match.group(1))
+    if match.group(2).lower().startswith("h"):
+        value *= 60
+    return value if value > 0 else None
+
+
+def language_bases(language: str) -> Set[str]:
+    """'Latin American Spanish' -> {'spanish'}, 'French (Canada)' -> {'french'}."""
+    base = re.sub(r"\(.*?\)", " ", language).lower()
+    return {w for w in re.findall(r"[a-z]+", base) if w not in _LANGUAGE_QUALIFIERS}
+
+
+@dataclass
+class Constraints:
+    max_minutes: Optional[int] = None
+    languages: Set[str] = field(default_factory=set)     # language bases, e.g. {"spanish"}
+    job_levels: Set[str] = field(default_factory=set)    # catalog job_levels values
+    remote: Optional[bool] = None
+    adaptive: Optional[bool] = None
+
+    def is_empty(self) -> bool:
+        return (
+            self.max_minutes is None and not self.languages and not self.job_levels
+            and self.remote is None and self.adaptive is None
+        )
+
+
+class MetadataIndex:
+    """
+    Precomputed boolean masks (one bitmap per language base / job level /
+    flag) plus an integer-minutes duration column, all in index row order.
+    Resolving a constraint set is a handful of vectorised ANDs.
+
+    Items whose value is unknown (no duration, empty language or job-level
+    list) are kept rather than filtered out — the catalog is patchy there.
+    """
+
+    def __init__(self, documents: Iterable):
+        docs = list(documents)
+        n = len(docs)
+        self.size = n
+        self.row_of_id: Dict[str, int] = {}
+        self.duration = np.full(n, -1, dtype=np.int32)
+        self.remote = np.zeros(n, dtype=bool)
+        self.adaptive = np.zeros(n, dtype=bool)
+        self.no_language = np.zeros(n, dtype=bool)
+        self.no_job_level = np.zeros(n, dtype=bool)
+        self.language_masks: Dict[str, np.ndarray] = {}
+        self.job_level_masks: Dict[str, np.ndarray] = {}
+
+        for row, doc in enumerate(docs):
+            meta = doc.metadata
+            self.row_of_id[meta.get("id")] = row
+            minutes = parse_duration_minutes(meta.get("duration", ""))
+            if minutes is not None:
+                self.duration[row] = minutes
+            self.remote[row] = bool(meta.get("remote_testing"))
+            self.adaptive[row] = bool(meta.get("adaptive_irt"))
+
+            languages = meta.get("languages") or []
+            self.no_language[row] = not languages
+            for language in languages:
+                for base in language_bases(language):
+                    self._mask(self.language_masks, base)[row] = True
+
+            levels = meta.get("job_levels") or []
+            self.no_job_level[row] = not levels
+            for level in levels:
+                self._mask(self.job_level_masks, level)[row] = True
+
+    def _mask(self, masks: Dict[str, np.ndarray], key: str) -> np.ndarray:
+        mask = masks.get(key)
+        if mask is None:
+            mask = masks[key] = np.zeros(self.size, dtype=bool)
+        return mask
+
+    @property
+    def known_languages(self) -> Set[str]:
+        return set(self.language_masks)
+
+    def mask(self, constraints: Constraints) -> np.ndarray:
+        allowed = np.ones(self.size, dtype=bool)
+        if constraints.max_minutes is not None:
+            allowed &= (self.duration < 0) | (self.duration <= constraints.max_minutes)
+        if constraints.languages:
+            any_language = self.no_language.copy()
+            for base in constraints.languages:
+                if base in self.language_masks:
+                    any_language |= self.language_masks[base]
+            allowed &= any_language
+        if constraints.job_levels:
+            any_level = self.no_job_level.copy()
+            for level in constraints.job_levels:
+                if level in self.job_level_masks:
+                    any_level |= self.job_level_masks[level]
+            allowed &= any_level
+        if constraints.remote:
+            allowed &= self.remote
+        if constraints.adaptive:
+            allowed &= self.adaptive
+        return allowed
+
+    def allowed_rows(self, constraints: Optional[Constraints], min_rows: int = 1) -> Optional[np.ndarray]:
+        """
+        Row ids satisfying the constraints, or None meaning "search everything"
+        (no constraints, or fewer than `min_rows` catalog items survive them —
+        a misread constraint shouldn't shrink the shortlist to a handful).
+        """
+        if constraints is None or constraints.is_empty():
+            return None
+        rows = np.flatnonzero(self.mask(constraints))
+        if len(rows) < max(min_rows, 1) or len(rows) == self.size:
+            return None
+        return rows
@@ -0,0 +1,333 @@
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+NUMPY_INDEX_PATH = os.path.join(PROJECT_ROOT, "data", "numpy_index")
+
+VECTORS_FILE = "vectors.npy"
+METADATA_FILE = "metadata.json"
+# Read-only serving files — memory-mapped, so every worker on the host shares
+# one copy through the page cache instead of holding its own
+NORMS_FILE = "half_sq_norms.npy"
+RECORDS_FILE = "records.bin"
+RECORDS_MAGIC = b"SHLREC01"
+# int8 builds: per-row dequantization scales (vector ~= int8 row * scale)
+SCALES_FILE = "scales.npy"
+
+# float32 | int8 — storage written by save(); int8 is 4x smaller, recall ~unchanged
+NUMPY_INDEX_DTYPE = os.getenv("NUMPY_INDEX_DTYPE", "float32")
+DEQUANT_BLOCK_ROWS = 4096   # int8 rows cast to float32 per matmul block
+
+METADATA_FIELDS = [
+    "id", "name", "url", "test_type", "description", "job_levels",
+    "languages", "duration", "remote_testing", "adaptive_irt",
+]
+
+
+def catalog_metadata(item: Dict) -> Dict:
+    """Metadata kept per document — the same fields build_index.py stores."""
+    return {
+        "id": item["id"],
+        "name": item["name"],
+        "url": item["url"],
+        "test_type": item["test_type"],
+        "description": item.get("description", ""),
+        "job_levels": item.get("job_levels", []),
+        "languages": item.get("languages", []),
+        "duration": item.get("duration", ""),
+        "remote_testing": item.get("remote_testing", False),
+        "adaptive_irt": item.get("adaptive_irt", False),
+    }
+
+
+class IndexedDocument:
+    """Minimal stand-in for a LangChain Document — just what callers read."""
+
+    __slots__ = ("page_content", "metadata", "row")
+
+    def __init__(self, page_content: str, metadata: Dict, row: int):
+        self.page_content = page_content
+        self.metadata = metadata
+        self.row = row
+
+    def __repr__(self):
+        return f"IndexedDocument(row={self.row}, id={self.metadata.get('id')!r})"
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization. -> (int8 matrix, float32 scales)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0 if len(vectors) else np.empty(0, dtype=np.float32)
+    scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    codes = np.rint(vectors / scales[:, None]).clip(-127, 127).astype(np.int8)
+    return codes, scales
+
+
+def write_records(path: str, page_content: Sequence[str], metadatas: Sequence[Dict]) -> None:
+    """
+    records.bin: magic, uint64 count, (count + 1) uint64 offsets, then one
+    UTF-8 JSON object {"page_content", "metadata"} per row.
+    """
+    blobs = [
+        json.dumps({"page_content": text, "metadata": meta}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        for text, meta in zip(page_content, metadatas)
+    ]
+    offsets = np.zeros(len(blobs) + 1, dtype="<u8")
+    np.cumsum([len(b) for b in blobs], out=offsets[1:])
+    with open(os.path.join(path, RECORDS_FILE), "wb") as f:
+        f.write(RECORDS_MAGIC)
+        f.write(struct.pack("<Q", len(blobs)))
+        f.write(offsets.tobytes())
+        for blob in blobs:
+            f.write(blob)
+
+
+class MappedDocuments(Sequence):
+    """
+    Documents backed by a memory-mapped records.bin. A row is decoded the
+    first time it is read and kept, so callers get the same object back
+    (derived structures compare documents by identity).
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, RECORDS_FILE), "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._buf[:len(RECORDS_MAGIC)] != RECORDS_MAGIC:
+            raise ValueError(f"{RECORDS_FILE} in '{path}' has an unknown format")
+        (count,) = struct.unpack_from("<Q", self._buf, len(RECORDS_MAGIC))
+        header = len(RECORDS_MAGIC) + 8
+        self._offsets = np.frombuffer(self._buf, dtype="<u8", count=count + 1, offset=header)
+        self._data_start = header + 8 * (count + 1)
+        self._rows: List[Optional[IndexedDocument]] = [None] * count
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _decode(self, row: int) -> IndexedDocument:
+        start = self._data_start + int(self._offsets[row])
+        end = self._data_start + int(self._offsets[row + 1])
+        record = json.loads(self._buf[start:end])
+        return IndexedDocument(record["page_content"], record["metadata"], row)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[r] for r in range(*row.indices(len(self)))]
+        doc = self._rows[row]
+        if doc is None:
+            doc = self._rows[row] = self._decode(row if row >= 0 else row + len(self))
+        return doc
+
+    def __iter__(self) -> Iterator[IndexedDocument]:
+        for row in range(len(self)):
+            yield self[row]
+
+
+class NumpyVectorStore:
+    """
+    Pickle-free flat index: one contiguous float32 matrix (memory-mapped
+    .npy) + columnar JSON metadata. Search is a single matvec/matmul plus
+    argpartition — for a catalog of a few hundred 1024-d vectors that is
+    faster than FAISS' Python wrapper and needs no langchain_community.
+
+    Scores rank exactly like FAISS IndexFlatL2:  argmin ||q - x||^2  ==
+    argmax (x.q - ||x||^2 / 2), so results match the FAISS backend.
+
+    With `scales` the matrix is int8 (NUMPY_INDEX_DTYPE=int8): rows are cast
+    back to float32 a block at a time, and distances are those to the
+    dequantized vectors.
+    """
+
+    def __init__(self, vectors: np.ndarray, documents: Sequence[IndexedDocument], embeddings=None,
+                 half_sq_norms=None, scales=None):
+        if len(vectors) != len(documents):
+            raise ValueError(f"{len(vectors)} vectors but {len(documents)} documents")
+        if vectors.dtype == np.int8 and (scales is None or len(scales) != len(vectors)):
+            raise ValueError("int8 vectors need one scale per row")
+        self.vectors = vectors
+        self.documents = documents
+        self.embeddings = embeddings
+        self.scales = scales if vectors.dtype == np.int8 else None
+        if half_sq_norms is None or len(half_sq_norms) != len(vectors):
+            if self.scales is None:
+                half_sq_norms = 0.5 * np.einsum("ij,ij->i", vectors, vectors, dtype=np.float32)
+            else:
+                half_sq_norms = 0.5 * self._dequantized_sq_norms(vectors, self.scales)
+        self._half_sq_norms = half_sq_norms
+
+    @staticmethod
+    def _dequantized_sq_norms(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        norms = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), DEQUANT_BLOCK_ROWS):
+            block = codes[start:start + DEQUANT_BLOCK_ROWS].astype(np.float32)
+            norms[start:start + DEQUANT_BLOCK_ROWS] = np.einsum("ij,ij->i", block, block)
+        return norms * scales * scales
+
+    # ---------------- load / save ----------------
+    @classmethod
+    def load(cls, path: str = NUMPY_INDEX_PATH, embeddings=None, mmap: bool = True) -> "NumpyVectorStore":
+        """
+        mmap=True maps vectors, norms and records read-only when the build
+        wrote them (records.bin / half_sq_norms.npy); older builds fall back
+        to parsing metadata.json.
+        """
+        mode = "r" if mmap else None
+        vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode=mode)
+        norms_path = os.path.join(path, NORMS_FILE)
+        half_sq_norms = np.load(norms_path, mmap_mode=mode) if os.path.exists(norms_path) else None
+        scales_path = os.path.join(path, SCALES_FILE)
+        scales = np.load(scales_path) if vectors.dtype == np.int8 else None
+        if mmap and os.path.exists(os.path.join(path, RECORDS_FILE)):
+            return cls(vectors, MappedDocuments(path), embeddings, half_sq_norms, scales)
+
+        with open(os.path.join(path, METADATA_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        columns = meta["columns"]
+        page_content = meta["page_content"]
+        fields = list(columns)
+        documents = [
+            IndexedDocument(page_content[row], {field: columns[field][row] for field in fields}, row)
+            for row in range(meta["count"])
+        ]
+        return cls(vectors, documents, embeddings, half_sq_norms, scales)
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict], embeddings, dtype: str = "float32") -> "NumpyVectorStore":
+        """Embed catalog records (final_assessments.json rows) into an in-memory store."""
+        texts = [item["text_for_embedding"] for item in records]
+        vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32).reshape(len(texts), -1)
+        documents = [IndexedDocument(text, catalog_metadata(item), row) for row, (text, item) in enumerate(zip(texts, records))]
+        if dtype == "int8":
+            codes, scales = quantize_int8(vectors)
+            return cls(codes, documents, embeddings, scales=scales)
+        return cls(vectors, documents, embeddings)
+
+    @staticmethod
+    def save(path: str, vectors: np.ndarray, page_content: Sequence[str], metadatas: Sequence[Dict],
+             dtype: str = NUMPY_INDEX_DTYPE) -> None:
+        if dtype not in ("float32", "int8"):
+            raise ValueError(f"Unknown NUMPY_INDEX_DTYPE '{dtype}' (expected float32 or int8)")
+        os.makedirs(path, exist_ok=True)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        fields = list(METADATA_FIELDS)
+        for meta in metadatas:
+            fields.extend(k for k in meta if k not in fields)
+        columns = {field: [meta.get(field) for meta in metadatas] for field in fields}
+        if dtype == "int8":
+            codes, scales = quantize_int8(vectors)
+            np.save(os.path.join(path, VECTORS_FILE), codes)
+            np.save(os.path.join(path, SCALES_FILE), scales)
+            np.save(os.path.join(path, NORMS_FILE), 0.5 * NumpyVectorStore._dequantized_sq_norms(codes, scales))
+        else:
+            np.save(os.path.join(path, VECTORS_FILE), vectors)
+            np.save(os.path.join(path, NORMS_FILE), 0.5 * np.einsum("ij,ij->i", vectors, vectors, dtype=np.float32))
+        write_records(path, page_content, [{field: meta.get(field) for field in fields} for meta in metadatas])
+        with open(os.path.join(path, METADATA_FILE), "w", encoding="utf-8") as f:
+            json.dump({
+                "count": len(page_content),
+                "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+                "columns": columns,
+                "page_content": list(page_content),
+            }, f, ensure_ascii=False, separators=(",", ":"))
+
+    # ---------------- search ----------------
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _dot(self, queries: np.ndarray, subset=None) -> np.ndarray:
+        """vectors @ queries.T over all rows (or `subset`); int8 rows dequantized blockwise."""
+        vectors = self.vectors if subset is None else self.vectors[subset]
+        if self.scales is None:
+            return vectors @ queries.T
+        scales = self.scales if subset is None else self.scales[subset]
+        out = np.empty((len(vectors),) + queries.shape[:-1], dtype=np.float32)
+        for start in range(0, len(vectors), DEQUANT_BLOCK_ROWS):
+            block = vectors[start:start + DEQUANT_BLOCK_ROWS].astype(np.float32)
+            out[start:start + DEQUANT_BLOCK_ROWS] = block @ queries.T
+        out *= scales[:, None] if queries.ndim == 2 else scales
+        return out
+
+    def _top_rows(self, scores: np.ndarray, k: int) -> np.ndarray:
+        k = min(k, scores.shape[-1])
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        if k < scores.shape[-1]:
+            rows = np.argpartition(-scores, k - 1)[:k]
+        else:
+            rows = np.arange(scores.shape[-1])
+        return rows[np.argsort(-scores[rows], kind="stable")]
+
+    def similarity_search_with_score_by_vector(self, embedding, k: int = 4, rows=None) -> List[Tuple[IndexedDocument, float]]:
+        """`rows` restricts scoring to that subset of row ids (metadata pre-filter)."""
+        query = np.asarray(embedding, dtype=np.float32)
+        if rows is None:
+            subset = None
+            scores = self._dot(query) - self._half_sq_norms
+        else:
+            subset = np.asarray(rows, dtype=np.int64)
+            scores = self._dot(query, subset) - self._half_sq_norms[subset]
+        picked = self._top_rows(scores, k)
+        doc_rows = picked if subset is None else subset[picked]
+        q_sq = float(query @ query)
+        # report FAISS-compatible squared L2 distances
+        return [
+            (self.documents[r], q_sq - 2.0 * float(scores[p]))
+            for r, p in zip(doc_rows.tolist(), picked.tolist())
+        ]
+
+    def similarity_search_batch_by_vectors(self, embeddings, k: int = 4) -> List[List[IndexedDocument]]:
+        """Score many queries in one (Q x D) @ (D x N) matmul."""
+        queries = np.asarray(embeddings, dtype=np.float32)
+        if queries.ndim != 2 or not len(queries):
+            return []
+        if self.scales is None:
+            scores = queries @ self.vectors.T - self._half_sq_norms
+        else:
+            scores = self._dot(queries).T - self._half_sq_norms
+        k = min(k, scores.shape[1])
+        if k < scores.shape[1]:
+            rows = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            rows = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        top = np.take_along_axis(scores, rows, axis=1)
+        order = np.argsort(-top, axis=1, kind="stable")
+        rows = np.take_along_axis(rows, order, axis=1)
+        return [[self.documents[r] for r in row] for row in rows]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, rows=None) -> List[IndexedDocument]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, rows=rows)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[IndexedDocument, float]]:
+        return self.similarity_search_with_score_by_vector(self.embeddings.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4) -> List[IndexedDocument]:
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k)
+
+
+def export_from_faiss(faiss_store, path: str = NUMPY_INDEX_PATH, vectors: Optional[np.ndarray] = None) -> int:
+    """
+    Convert a loaded LangChain FAISS store into the NumPy index format.
+    Pass `vectors` (build_index's source_vectors.npy) for lossy index types,
+    which cannot reconstruct the originals.
+    """
+    index = faiss_store.index
+    if vectors is None:
+        vectors = index.reconstruct_n(0, index.ntotal)
+    docs = [faiss_store.docstore.search(faiss_store.index_to_docstore_id[row]) for row in range(index.ntotal)]
+    NumpyVectorStore.save(path, vectors, [d.page_content for d in docs], [d.metadata for d in docs])
+    return index.ntotal
+
+
+if __name__ == "__main__":
+    # python -m src.Indexing.numpy_index  -> export the live FAISS index next to it as NumPy
+    from src.Indexing.Index import faiss_path, load_faiss_store, numpy_path
+    source_dir, target = faiss_path(), numpy_path()
+    source = os.path.join(source_dir, "source_vectors.npy")
+    count = export_from_faiss(
+        load_faiss_store(source_dir), target, vectors=np.load(source) if os.path.exists(source) else None
+    )
+    print(f"✅ Exported {count} vectors to {target}")
@@ -0,0 +1,115 @@
+"""
+Streaming catalog I/O.
+
+Catalog files are either a JSON array (`[{...}, {...}]`, the scraper's
+Raw_data.json and the legacy final_assessments.json) or JSONL (one object
+per line, what Data_cleaning/clean_data.py writes). iter_records reads both
+one record at a time, so a large vendor catalog never has to fit in memory
+as a whole document. write_lines writes pre-serialized records to a temp
+file and renames it into place, so readers never see a half-written catalog.
+"""
+import json
+import os
+from typing import Dict, Iterable, Iterator
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+_CATALOG_STEM = os.path.join(PROJECT_ROOT, "src", "Indexing", "final_assessments")
+CATALOG_JSONL_PATH = _CATALOG_STEM + ".jsonl"
+
+# The cleaned catalog: ASSESSMENTS_PATH if set, else the JSONL written by
+# clean_data.py, else the legacy JSON array
+ASSESSMENTS_PATH = os.getenv("ASSESSMENTS_PATH") or (
+    CATALOG_JSONL_PATH if os.path.exists(CATALOG_JSONL_PATH) else _CATALOG_STEM + ".json"
+)
+
+READ_CHUNK_CHARS = 1 << 20
+_SEPARATORS = " \t\r\n,"
+
+
+def iter_records(path: str, chunk_chars: int = READ_CHUNK_CHARS) -> Iterator[Dict]:
+    """Yield the objects of a JSON array or JSONL file, reading chunk_chars at a time."""
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(chunk_chars)
+        stripped = head.lstrip()
+        if stripped.startswith("["):
+            yield from _iter_array(f, stripped[1:], chunk_chars, path)
+            return
+        f.seek(0)
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_no}: invalid JSON ({e.msg})") from e
+            yield _check_record(record, path)
+
+
+def _iter_array(f, buf: str, chunk_chars: int, path: str) -> Iterator[Dict]:
+    decoder = json.JSONDecoder()
+    pos = 0
+    eof = False
+    while True:
+        while pos < len(buf) and buf[pos] in _SEPARATORS:
+            pos += 1
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        if pos < len(buf):
+            try:
+                record, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                # most likely an object cut at the chunk boundary: read more
+                if eof:
+                    raise ValueError(f"{path}: invalid JSON ({e.msg})") from e
+            else:
+                yield _check_record(record, path)
+                continue
+        if eof:
+            raise ValueError(f"{path}: unterminated JSON array")
+        chunk = f.read(chunk_chars)
+        eof = not chunk
+        buf = buf[pos:] + chunk
+        pos = 0
+
+
+def _check_record(record, path: str) -> Dict:
+    if not isinstance(record, dict):
+        raise ValueError(f"{path}: expected JSON objects, got {type(record).__name__}")
+    return record
+
+
+def load_records(path: str = ASSESSMENTS_PATH):
+    return list(iter_records(path))
+
+
+def write_lines(path: str, lines: Iterable[str]) -> int:
+    """
+    Write serialized records to path atomically. -> records written
+
+    `.jsonl` gets one record per line. Any other extension gets a JSON array,
+    still with one record per line.
+    """
+    as_array = not path.endswith(".jsonl")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    count = 0
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            if as_array:
+                f.write("[")
+            for line in lines:
+                if as_array:
+                    f.write(",\n" if count else "\n")
+                    f.write(line)
+                else:
+                    f.write(line)
+                    f.write("\n")
+                count += 1
+            if as_array:
+                f.write("\n]\n")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
@@ -1,17 +1,36 @@
-from langchain_mistralai import ChatMistralAI
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-if not os.getenv("MISTRAL_API_KEY"):
-    raise RuntimeError("MISTRAL_API_KEY not set in environment")
+# mistral -> ChatMistralAI (MISTRAL_BASE_URL overrides the API endpoint, e.g.
+#            to point it at `python -m src.LLM.fake_llm`)
+# fake    -> in-process FakeChatModel, latency from FAKE_LLM_* (src/LLM/fake_llm.py)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "mistral")
+MISTRAL_BASE_URL = os.getenv("MISTRAL_BASE_URL", "")
 
 
 def LLm_init(temperature: float = 0.1):
+    if LLM_BACKEND == "fake":
+        from src.LLM.fake_llm import FakeChatModel
+        return FakeChatModel()
+
+    # imported here: langchain_mistralai is the slowest import in the app,
+    # and the server should be able to answer /health before paying for it
+    from langchain_mistralai import ChatMistralAI
+
+    if not os.getenv("MISTRAL_API_KEY"):
+        raise RuntimeError("MISTRAL_API_KEY not set in environment")
+
+    from src.LLM.resilience import LLM_CALL_TIMEOUT_S
+
+    # max_retries is tenacity's stop_after_attempt: 1 = a single attempt, so
+    # the resilience guard owns the retry policy. The client timeout matches
+    # the guard's per-call deadline; it only reclaims abandoned threads.
     return ChatMistralAI(
         model="mistral-small-latest",
         temperature=temperature,
         max_retries=1,
-        timeout=25,
-    )
\ No newline at end of file
+        timeout=int(LLM_CALL_TIMEOUT_S) or 1,
+        **({"endpoint": MISTRAL_BASE_URL} if MISTRAL_BASE_URL else {}),
+    )
@@ -0,0 +1,17 @@
+import asyncio
+import os
+
+# Max in-flight calls to the Mistral API (chat + embeddings) per worker.
+# Everything past this queues on the event loop instead of piling onto
+# the upstream and tripping its rate limits.
+UPSTREAM_CONCURRENCY = int(os.getenv("UPSTREAM_CONCURRENCY", "16"))
+
+_upstream_semaphore = None
+
+
+def upstream_slot() -> asyncio.Semaphore:
+    """Shared semaphore gating upstream API calls — use as `async with upstream_slot():`."""
+    global _upstream_semaphore
+    if _upstream_semaphore is None:
+        _upstream_semaphore = asyncio.Semaphore(UPSTREAM_CONCURRENCY)
+    return _upstream_semaphore
@@ -0,0 +1,231 @@
+"""
+Fake LLM for exercising the resilience layer without an API key.
+
+Two ways to use it:
+
+- In process: LLM_BACKEND=fake makes LLm_init return a FakeChatModel.
+- Over HTTP: a Mistral-compatible server (/v1/chat/completions, streaming
+  or not, and /v1/embeddings). Point the real clients at it with
+  MISTRAL_BASE_URL, so the whole langchain_mistralai/httpx path is covered:
+
+      python -m src.LLM.fake_llm --port 8900 --latency-ms 200-600 --tail-rate 0.1 --tail-ms 8000
+      MISTRAL_BASE_URL=http://127.0.0.1:8900/v1 uvicorn src.main:app
+
+Latency is injectable: a base range per call, a share of calls that land
+in a slow tail, and a failure rate. The server's settings can be changed
+while it runs with POST /fake/latency.
+
+Replies follow the output contract and pick the first three candidate ids
+found in the prompt, so recommendations still resolve.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List
+
+FAKE_LLM_LATENCY_MS = os.getenv("FAKE_LLM_LATENCY_MS", "50")       # "300" or "100-600"
+FAKE_LLM_TAIL_RATE = float(os.getenv("FAKE_LLM_TAIL_RATE", "0"))
+FAKE_LLM_TAIL_MS = float(os.getenv("FAKE_LLM_TAIL_MS", "5000"))
+FAKE_LLM_FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+
+_JSON_IDS_RE = re.compile(r'"id":\s*"([^"]+)"')
+
+
+class FakeUpstreamError(RuntimeError):
+    pass
+
+
+@dataclass
+class FakeLatency:
+    low_ms: float = 50.0
+    high_ms: float = 50.0
+    tail_rate: float = 0.0
+    tail_ms: float = 5000.0
+    failure_rate: float = 0.0
+
+    @classmethod
+    def from_spec(cls, latency_ms: str, tail_rate: float = 0.0, tail_ms: float = 5000.0, failure_rate: float = 0.0):
+        low, _, high = str(latency_ms).partition("-")
+        return cls(float(low), float(high or low), tail_rate, tail_ms, failure_rate)
+
+    def sample(self) -> float:
+        """Seconds this call takes; raises FakeUpstreamError for a failed call."""
+        if random.random() < self.failure_rate:
+            raise FakeUpstreamError("injected upstream failure")
+        if random.random() < self.tail_rate:
+            return self.tail_ms / 1000
+        return random.uniform(self.low_ms, self.high_ms) / 1000
+
+
+def default_latency() -> FakeLatency:
+    return FakeLatency.from_spec(FAKE_LLM_LATENCY_MS, FAKE_LLM_TAIL_RATE, FAKE_LLM_TAIL_MS, FAKE_LLM_FAILURE_RATE)
+
+
+def candidate_ids(prompt: str) -> List[str]:
+    """Candidate ids from either prompt format (compact table or JSON list)."""
+    block = prompt.split("CANDIDATE ASSESSMENTS", 1)[-1].split("\n\nRespond", 1)[0]
+    if "id|name" in block:
+        rows = block.split("id|name", 1)[1].split("\n")[1:]
+        return [row.split("|", 1)[0] for row in rows if "|" in row]
+    return _JSON_IDS_RE.findall(block)
+
+
+def fake_reply(prompt: str) -> str:
+    ids = candidate_ids(prompt)[:3]
+    return json.dumps({
+        "reply": f"Here are {len(ids)} assessments that fit what you described." if ids
+        else "Could you tell me more about the role?",
+        "selected_ids": ids or None,
+        "end_of_conversation": False,
+    })
+
+
+def _prompt_text(messages) -> str:
+    last = messages[-1]
+    return last.get("content", "") if isinstance(last, dict) else getattr(last, "content", "")
+
+
+def _chunks(text: str, size: int = 16) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+# ------------------------
+# In-process model
+# ------------------------
+class FakeMessage:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeChatModel:
+    """invoke / ainvoke / astream with the same shapes ChatMistralAI returns."""
+
+    def __init__(self, latency: FakeLatency = None):
+        self.latency = latency or default_latency()
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        time.sleep(self.latency.sample())
+        return FakeMessage(fake_reply(_prompt_text(messages)))
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample())
+        return FakeMessage(fake_reply(_prompt_text(messages)))
+
+    async def astream(self, messages):
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample())   # time to first token
+        for chunk in _chunks(fake_reply(_prompt_text(messages))):
+            await asyncio.sleep(0)
+            yield FakeMessage(chunk)
+
+
+# ------------------------
+# Mistral-compatible server
+# ------------------------
+def create_app(latency: FakeLatency = None):
+    from fastapi import FastAPI, HTTPException, Request
+    from fastapi.responses import StreamingResponse
+
+    from src.Indexing.local_embeddings import HashingEmbeddings
+
+    app = FastAPI(title="Fake Mistral API")
+    app.state.latency = latency or default_latency()
+    app.state.calls = {"chat": 0, "embeddings": 0, "failed": 0}
+    embedder = HashingEmbeddings()
+
+    async def delay() -> None:
+        try:
+            seconds = app.state.latency.sample()
+        except FakeUpstreamError:
+            app.state.calls["failed"] += 1
+            raise HTTPException(status_code=503, detail="injected upstream failure")
+        await asyncio.sleep(seconds)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.calls["chat"] += 1
+        await delay()
+        reply = fake_reply(_prompt_text(body.get("messages") or [{}]))
+        created = int(time.time())
+        if not body.get("stream"):
+            return {
+                "id": f"fake-{created}", "object": "chat.completion", "created": created,
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+
+        async def events():
+            for i, chunk in enumerate(_chunks(reply)):
+                delta = {"role": "assistant", "content": chunk} if i == 0 else {"content": chunk}
+                yield "data: " + json.dumps({
+                    "id": f"fake-{created}", "object": "chat.completion.chunk", "created": created,
+                    "model": body.get("model", "fake"),
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                }) + "\n\n"
+                await asyncio.sleep(0)
+            yield "data: " + json.dumps({
+                "id": f"fake-{created}", "object": "chat.completion.chunk", "created": created,
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "delta": {"content": ""}, "finish_reason": "stop"}],
+            }) + "\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        app.state.calls["embeddings"] += 1
+        await delay()
+        texts = body.get("input") or []
+        texts = [texts] if isinstance(texts, str) else texts
+        return {
+            "id": "fake-embeddings", "object": "list", "model": body.get("model", "fake"),
+            "data": [{"object": "embedding", "index": i, "embedding": v}
+                     for i, v in enumerate(embedder.embed_documents(texts))],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.post("/fake/latency")
+    async def set_latency(settings: Dict):
+        """Change latency injection on the fly, e.g. {"low_ms": 2000, "high_ms": 4000}."""
+        current = asdict(app.state.latency)
+        current.update({k: float(v) for k, v in settings.items() if k in current})
+        app.state.latency = FakeLatency(**current)
+        return current
+
+    @app.get("/fake/stats")
+    async def stats():
+        return {"calls": app.state.calls, "latency": asdict(app.state.latency)}
+
+    return app
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Mistral-compatible fake LLM server with injectable latency")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", default=FAKE_LLM_LATENCY_MS, help='"300" or a range "100-600"')
+    parser.add_argument("--tail-rate", type=float, default=FAKE_LLM_TAIL_RATE, help="share of calls in the slow tail")
+    parser.add_argument("--tail-ms", type=float, default=FAKE_LLM_TAIL_MS)
+    parser.add_argument("--failure-rate", type=float, default=FAKE_LLM_FAILURE_RATE)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    latency = FakeLatency.from_spec(args.latency_ms, args.tail_rate, args.tail_ms, args.failure_rate)
+    uvicorn.run(create_app(latency), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_REPLY_KEY_RE = re.compile(r'"reply"\s*:\s*"')
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class ReplyStreamer:
+    """
+    Pulls the "reply" string out of the LLM's JSON output while it is still
+    streaming, so the frontend can render text before the object closes.
+
+    feed() takes raw chunks and returns the newly decoded reply text (may be
+    ""). Once the closing quote is seen, `done` is set and later chunks are
+    ignored. Output that never contains a "reply" key yields nothing — the
+    final event still carries the fully parsed reply.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = None        # index of the next undecoded reply char
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        if self.done or not chunk:
+            return ""
+        self.buffer += chunk
+
+        if self.pos is None:
+            match = _REPLY_KEY_RE.search(self.buffer)
+            if not match:
+                return ""
+            self.pos = match.end()
+
+        out = []
+        buf, i = self.buffer, self.pos
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            if i + 1 >= len(buf):
+                break                               # escape split across chunks
+            code = buf[i + 1]
+            if code == "u":
+                if i + 6 > len(buf):
+                    break
+                try:
+                    point = int(buf[i + 2:i + 6], 16)
+                except ValueError:
+                    out.append(buf[i:i + 6])
+                    i += 6
+                    continue
+                if 0xD800 <= point < 0xDC00:               # surrogate pair
+                    if i + 12 > len(buf):
+                        break
+                    try:
+                        low = int(buf[i + 8:i + 12], 16)
+                    except ValueError:
+                        low = 0
+                    if buf[i + 6:i + 8] == "\\u" and 0xDC00 <= low < 0xE000:
+                        out.append(chr(0x10000 + ((point - 0xD800) << 10) + (low - 0xDC00)))
+                        i += 12
+                        continue
+                out.append(chr(point))
+                i += 6
+                continue
+            out.append(_ESCAPES.get(code, code))
+            i += 2
+        self.pos = i
+        return "".join(out)
+
+
+# ------------------------
+# Tolerant parsing of the JSON output contract
+#
+# The model is asked for one bare JSON object. What comes back is sometimes
+# fenced, wrapped in prose, cut off, or slightly off-spec (trailing commas,
+# smart quotes, raw newlines inside strings, Python literals). Throwing the
+# turn away costs a multi-second LLM call, so parse_llm_output repairs what
+# it can and otherwise recovers the selected ids against the candidate pool.
+# ------------------------
+_OBJECT_KEYS = ("reply", "selected_ids")
+_SMART_QUOTES = "\u201c\u201d"
+_QUOTES = '"' + _SMART_QUOTES
+_CLOSE_AFTER_STRING = ",:}]"
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_MAX_OBJECT_STARTS = 8
+_IDS_KEY_RE = re.compile(r'["\u201c\u201d]selected_ids["\u201c\u201d]\s*:\s*')
+_QUOTED_RE = re.compile(r'["\u201c\u201d]([^"\u201c\u201d\n]{1,80})["\u201c\u201d]')
+
+
+@dataclass
+class ParsedOutput:
+    """
+    data:    {"reply", "selected_ids", "end_of_conversation"} or None
+    method:  "json" (valid as sent), "repaired", "ids_fallback" (only the
+             reply text and pool ids could be recovered) or "failed"
+    repairs: repair kinds applied, for the parse_repairs counter
+    """
+    data: Optional[Dict]
+    method: str
+    repairs: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.method in ("json", "repaired")
+
+
+def _balanced_end(text: str, start: int) -> Optional[int]:
+    """Index just past the {...} / [...] opening at text[start], or None if it never closes."""
+    return _balanced_scan(text, start)[0]
+
+
+def _balanced_scan(text: str, i: int, depth: int = 0, in_string: bool = False):
+    """
+    _balanced_end resumable across chunks. -> (end, i, depth, in_string):
+    `end` as for _balanced_end; while it is None, the rest is the state to
+    call again with once more text has been appended.
+    """
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            if ch == "\\":
+                i += 1
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return i + 1, i + 1, depth, in_string
+        i += 1
+    return None, i, depth, in_string
+
+
+def _next_non_space(text: str, i: int) -> str:
+    while i < len(text) and text[i].isspace():
+        i += 1
+    return text[i] if i < len(text) else ""
+
+
+def repair_json(text: str) -> Tuple[str, List[str]]:
+    """
+    One string-aware pass over a near-JSON object. Fixes raw control
+    characters and stray inner quotes in strings, smart-quoted strings,
+    trailing commas, Python literals, and closes a truncated tail.
+    -> (repaired text, repair kinds applied)
+    """
+    out: List[str] = []
+    repairs = set()
+    stack: List[str] = []
+    quote = None          # delimiter of the open string: '"' or a smart quote
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if quote is not None:
+            if ch == "\\" and i + 1 < len(text):
+                out.append(text[i:i + 2])
+                i += 2
+                continue
+            closes = ch in _SMART_QUOTES if quote != '"' else ch == '"'
+            if closes and _next_non_space(text, i + 1) in _CLOSE_AFTER_STRING:
+                out.append('"')
+                quote = None
+            elif ch == '"':
+                out.append('\\"')
+                repairs.add("inner_quotes")
+            elif ch in "\n\r\t":
+                out.append({"\n": "\\n", "\r": "\\r", "\t": "\\t"}[ch])
+                repairs.add("control_chars")
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch in _QUOTES:
+            if ch != '"':
+                repairs.add("smart_quotes")
+            quote = ch
+            out.append('"')
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            if _drop_trailing_comma(out):
+                repairs.add("trailing_commas")
+            if stack:
+                stack.pop()
+            out.append(ch)
+        elif ch.isalpha():
+            j = i
+            while j < len(text) and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            if word in _PY_LITERALS:
+                word = _PY_LITERALS[word]
+                repairs.add("python_literals")
+            out.append(word)
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    if quote is not None or stack:
+        repairs.add("truncated")
+        if quote is not None:
+            out.append('"')
+        tail = "".join(out).rstrip()
+        if tail.endswith(":"):
+            out.append(" null")
+        elif _drop_trailing_comma(out):
+            pass
+        out.extend(reversed(stack))
+    return "".join(out), sorted(repairs)
+
+
+def _drop_trailing_comma(out: List[str]) -> bool:
+    j = len(out) - 1
+    while j >= 0 and out[j].isspace():
+        j -= 1
+    if j >= 0 and out[j] == ",":
+        del out[j]
+        return True
+    return False
+
+
+def _as_output(value) -> Optional[Dict]:
+    """The parsed value as a contract dict, or None when it is not one."""
+    if not isinstance(value, dict) or not any(key in value for key in _OBJECT_KEYS):
+        return None
+    ids = value.get("selected_ids")
+    if isinstance(ids, (str, int)):
+        ids = [ids]
+    if isinstance(ids, list):
+        ids = [str(i) for i in ids if isinstance(i, (str, int))]
+    else:
+        ids = None
+    return {**value, "selected_ids": ids}
+
+
+def _object_starts(text: str) -> Iterable[int]:
+    start = text.find("{")
+    for _ in range(_MAX_OBJECT_STARTS):
+        if start < 0:
+            return
+        yield start
+        start = text.find("{", start + 1)
+
+
+def extract_ids(text: str, pool: Iterable[str]) -> List[str]:
+    """
+    Quoted strings that are candidate ids, in order of appearance. Looks in
+    the selected_ids array first, then anywhere in the text.
+    """
+    pool = set(pool)
+    if not pool:
+        return []
+    key = _IDS_KEY_RE.search(text)
+    regions = [text[key.end():text.find("]", key.end()) + 1 or len(text)]] if key else []
+    regions.append(text)
+    for region in regions:
+        found = list(dict.fromkeys(m.group(1) for m in _QUOTED_RE.finditer(region) if m.group(1) in pool))
+        if found:
+            return found
+    return []
+
+
+def extract_reply(text: str) -> Optional[str]:
+    """The (possibly truncated) "reply" string value, or None without a reply key."""
+    streamer = ReplyStreamer()
+    reply = streamer.feed(text)
+    return reply if streamer.pos is not None else None
+
+
+def parse_llm_output(raw: str, pool: Iterable[str] = ()) -> ParsedOutput:
+    """
+    Best-effort parse of the model's output contract:
+
+    1. the text as-is, then each balanced {...} in it (fences, prose)
+    2. repair_json on the first object-looking span, closed if truncated
+    3. ids_fallback: candidate ids (`pool`) found in the text, plus the
+       reply string when one can be cut out
+    """
+    text = raw.strip()
+    if text.startswith("{"):
+        try:
+            data = _as_output(json.loads(text))
+            if data is not None:
+                return ParsedOutput(data, "json")
+        except ValueError:
+            pass
+
+    spans = []
+    for start in _object_starts(text):
+        end = _balanced_end(text, start)
+        spans.append((start, end))
+        if end is None:
+            continue
+        try:
+            data = _as_output(json.loads(text[start:end]))
+        except ValueError:
+            continue
+        if data is not None:
+            return ParsedOutput(data, "json")
+
+    for start, end in spans:
+        fixed, repairs = repair_json(text[start:end] if end is not None else text[start:])
+        try:
+            data = _as_output(json.loads(fixed))
+        except ValueError:
+            continue
+        if data is not None:
+            return ParsedOutput(data, "repaired", repairs)
+
+    ids = extract_ids(text, pool)
+    if ids:
+        reply = extract_reply(text)
+        return ParsedOutput(
+            {"reply": reply if reply else raw, "selected_ids": ids, "end_of_conversation": False},
+            "ids_fallback",
+            ["ids_fallback"],
+        )
+    return ParsedOutput(None, "failed")
+
+
+# Characters carried over between chunks while looking for the ids key, so a
+# key split across two chunks is still found
+_IDS_KEY_OVERLAP = 64
+
+
+class StreamingOutputParser:
+    """
+    Incremental view of the streamed output: reply text as it arrives (via
+    ReplyStreamer) and selected_ids as soon as that array closes, so the
+    recommendations can go out before the object ends. `text` is everything
+    fed so far, for parse_llm_output at the end.
+
+    Each chunk is scanned once (plus a short overlap for the key), so a long
+    stream costs linear time rather than a rescan of the whole text per chunk.
+    """
+
+    def __init__(self):
+        self._reply = ReplyStreamer()
+        self._chunks: List[str] = []
+        self._key_tail = ""        # end of the text so far, while the key hasn't shown up
+        self._value: Optional[str] = None   # text after the "selected_ids": key
+        self._array = None         # _balanced_scan state over _value once it opens with "["
+        self.ids_ready = False
+        self.selected_ids: Optional[List[str]] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str) -> str:
+        """-> newly decoded reply text"""
+        if not chunk:
+            return ""
+        self._chunks.append(chunk)
+        if not self.ids_ready:
+            self._scan_ids(chunk)
+        return self._reply.feed(chunk)
+
+    def _scan_ids(self, chunk: str) -> None:
+        if self._value is None:
+            window = self._key_tail + chunk
+            key = _IDS_KEY_RE.search(window)
+            if not key:
+                self._key_tail = window[-_IDS_KEY_OVERLAP:]
+                return
+            self._key_tail = ""
+            self._value = window[key.end():]
+        else:
+            self._value += chunk
+
+        if self._array is None:
+            value = self._value.lstrip()
+            if value.startswith("null"):
+                self.ids_ready = True
+                return
+            if not value.startswith("["):
+                # anything but a (partial) null is off-contract: settle it at the end
+                self.ids_ready = bool(value) and not "null".startswith(value[:4])
+                return
+            self._value = value
+            self._array = (0, 0, False)
+        end, *state = _balanced_scan(self._value, *self._array)
+        if end is None:
+            self._array = tuple(state)
+            return
+        self.ids_ready = True
+        value = self._value[:end]
+        try:
+            ids = json.loads(value)
+        except ValueError:
+            try:
+                ids = json.loads(repair_json(value)[0])
+            except ValueError:
+                return      # left to parse_llm_output's fallbacks at the end
+        self.selected_ids = _as_output({"selected_ids": ids})["selected_ids"]
+
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Event frame with a JSON payload."""
+    return sse_frame(event, json.dumps(data, ensure_ascii=False))
+
+
+def sse_frame(event: str, payload: str) -> str:
+    """Same frame around an already-serialized JSON payload."""
+    return f"event: {event}\ndata: {payload}\n\n"
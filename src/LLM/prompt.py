@@ -0,0 +1,186 @@
+"""
+Token-budgeted prompt assembly for the single chat call.
+
+Candidates go out as one compact table row each, keyed by their catalog id
+(already short and stable across turns), with the catalog URL the reply links
+to, test types as SHL's one-letter codes and languages collapsed to base
+names. Rows for assessments the
+assistant already presented earlier in the conversation skip the
+description — the model can read it in the history. The last few messages
+are kept verbatim; older ones are clipped. If the result is still over
+PROMPT_TOKEN_BUDGET, descriptions and old turns are squeezed further, one
+level at a time.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+
+from src.Indexing.metadata_index import language_bases, parse_duration_minutes
+from src.Metrics.metrics import estimate_tokens
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+# Messages at the end of the conversation that are never clipped
+PROMPT_RECENT_MESSAGES = int(os.getenv("PROMPT_RECENT_MESSAGES", "4"))
+
+TEST_TYPE_CODES = {
+    "Ability & Aptitude": "A",
+    "Biodata & Situational Judgment": "B",
+    "Competencies": "C",
+    "Development & 360": "D",
+    "Assessment Exercises": "E",
+    "Knowledge & Skills": "K",
+    "Personality & Behavior": "P",
+    "Simulations": "S",
+}
+TEST_TYPE_LEGEND = ", ".join(f"{code}={name}" for name, code in TEST_TYPE_CODES.items())
+
+# (description chars, chars kept of an older user message, of an older
+# assistant message) — tried in order until the prompt fits the budget
+_LEVELS = (
+    (200, 400, 160),
+    (120, 240, 80),
+    (60, 160, 0),
+    (0, 100, 0),
+)
+
+
+@dataclass
+class Prompt:
+    messages: list
+    tokens: int
+    sections: Dict[str, int] = field(default_factory=dict)
+    level: int = 0
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join((text or "").split())
+    if len(text) <= limit:
+        return text
+    cut = text[:limit].rsplit(" ", 1)[0]
+    return cut + "…"
+
+
+def _cell(text: str) -> str:
+    return str(text).replace("|", "/")
+
+
+def _test_types(value) -> str:
+    types = value if isinstance(value, list) else [value] if value else []
+    return "".join(TEST_TYPE_CODES.get(t, "?") for t in types)
+
+
+def _duration(value: str) -> str:
+    minutes = parse_duration_minutes(value)
+    if minutes is not None:
+        return str(minutes)
+    return _cell(value) if value else "-"
+
+
+def _languages(languages: Sequence[str]) -> str:
+    seen = []
+    for lang in languages or []:
+        for base in sorted(language_bases(lang)):
+            if base not in seen:
+                seen.append(base)
+    return ",".join(b.capitalize() for b in seen) or "-"
+
+
+def table_head(c) -> str:
+    """A candidate's table row up to the description: id|name|url|types|minutes|languages"""
+    return "|".join((
+        _cell(c["id"]),
+        _cell(c.get("name", "")),
+        _cell(c.get("url", "")),
+        _test_types(c.get("test_type")),
+        _duration(c.get("duration", "")),
+        _languages(c.get("languages")),
+    ))
+
+
+def _clip_cell(text: str, limit: int) -> str:
+    return _cell(_clip(text, limit))
+
+
+def candidate_table(candidates: List[Dict], shown_names: Sequence[str] = (), desc_chars: int = 200) -> str:
+    """
+    One header + one row per candidate:
+        id|name|url|types|minutes|languages|description
+    Rows whose name already appears in an assistant message get "(shown)"
+    in place of the description. CatalogRecords bring their row head and
+    clipped descriptions precomputed; plain dicts are formatted here.
+    """
+    shown = {n.lower() for n in shown_names}
+    lines = ["id|name|url|types|minutes|languages|description"]
+    for c in candidates:
+        head = getattr(c, "table_head", None) or table_head(c)
+        clipped = getattr(c, "clipped_description", None)
+        if shown and c.get("name", "").lower() in shown:
+            description = "(shown)"
+        elif not desc_chars:
+            description = ""
+        elif clipped is not None:
+            description = clipped(desc_chars, _clip_cell)
+        else:
+            description = _clip_cell(c.get("description", ""), desc_chars)
+        lines.append(f"{head}|{description}")
+    return "\n".join(lines)
+
+
+def conversation_text(history, user_chars: int, assistant_chars: int, recent: int = PROMPT_RECENT_MESSAGES) -> str:
+    """Last `recent` messages verbatim, older ones clipped (dropped at 0 chars)."""
+    lines = []
+    cutoff = len(history) - recent
+    for i, m in enumerate(history):
+        content = m.content
+        if i < cutoff:
+            limit = user_chars if m.role == "user" else assistant_chars
+            if not limit:
+                continue
+            content = _clip(content, limit)
+        lines.append(f"{m.role.upper()}: {content}")
+    return "\n".join(lines)
+
+
+def _shown_names(history, candidates: List[Dict]) -> List[str]:
+    assistant_text = " ".join(m.content for m in history if m.role == "assistant").lower()
+    if not assistant_text:
+        return []
+    return [c["name"] for c in candidates if c.get("name") and c["name"].lower() in assistant_text]
+
+
+def assemble_prompt(system_prompt: str, history, candidates: List[Dict], budget: int = PROMPT_TOKEN_BUDGET) -> Prompt:
+    """
+    Build [SystemMessage, HumanMessage] for one chat turn within `budget`
+    estimated tokens (see metrics.estimate_tokens). The latest messages and
+    the candidate ids/names/URLs are never dropped, so a very long job
+    description can still push the prompt over budget — `tokens` reports
+    what was actually produced.
+    """
+    from langchain.messages import HumanMessage, SystemMessage
+
+    system_tokens = estimate_tokens(system_prompt)
+    shown = _shown_names(history, candidates)
+
+    for level, (desc_chars, user_chars, assistant_chars) in enumerate(_LEVELS):
+        conversation = conversation_text(history, user_chars, assistant_chars)
+        table = candidate_table(candidates, shown, desc_chars)
+        prompt = (
+            f"CONVERSATION SO FAR:\n{conversation}\n\n"
+            f"CANDIDATE ASSESSMENTS (from search, for the latest message; "
+            f"types: {TEST_TYPE_LEGEND}):\n{table}\n\n"
+            f"Respond now with the JSON object per the output contract."
+        )
+        tokens = system_tokens + estimate_tokens(prompt)
+        if tokens <= budget:
+            break
+
+    return Prompt(
+        messages=[SystemMessage(content=system_prompt), HumanMessage(content=prompt)],
+        tokens=tokens,
+        sections={
+            "system": system_tokens,
+            "conversation": estimate_tokens(conversation),
+            "candidates": estimate_tokens(table),
+        },
+        level=level,
+    )
@@ -0,0 +1,372 @@
+"""
+Resilience wrappers for the upstream chat model and embeddings.
+
+- Request budget: each /chat request gets REQUEST_BUDGET_S seconds
+  (`with request_budget():`). Every upstream call inside it runs under a
+  deadline of min(its own timeout, the time left in the budget), so a slow
+  Mistral call can no longer hold a request for timeout x retries. Sync
+  calls (run_chat, batch jobs) get the same deadline: they run on a small
+  bounded executor and the caller stops waiting when it passes.
+- Hedging (opt-in, HEDGE=1): if the first attempt has not answered after
+  the recent p95 latency of that call, one duplicate is sent and whichever
+  finishes first wins. The hedge does not wait for an upstream slot — it
+  only fires when the primary is already slow — but it is a second billed
+  call, up to ~5% more LLM spend at the p95 trigger.
+- Circuit breaker: after BREAKER_FAILURES consecutive failures, calls fail
+  fast with CircuitOpenError for BREAKER_COOLDOWN_S, then a single probe
+  decides whether to close again. Callers turn UpstreamError into a
+  degraded, retrieval-only answer instead of queueing on a dead upstream.
+
+Every path is counted: upstream_calls{target, path=primary|hedge} for the
+attempt that answered, upstream_hedges{target}, and
+upstream_failures{target, reason=timeout|error|circuit_open}.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from src.Metrics import metrics
+
+REQUEST_BUDGET_S = float(os.getenv("REQUEST_BUDGET_S", "20"))
+LLM_CALL_TIMEOUT_S = float(os.getenv("LLM_CALL_TIMEOUT_S", "15"))
+EMBED_CALL_TIMEOUT_S = float(os.getenv("EMBED_CALL_TIMEOUT_S", "5"))
+
+# Duplicate calls cost money: off unless asked for
+HEDGE = os.getenv("HEDGE", "0") == "1"
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+# Floor for the hedge delay, and the delay used until HEDGE_MIN_SAMPLES
+# latencies have been seen
+HEDGE_MIN_DELAY_S = float(os.getenv("HEDGE_MIN_DELAY_S", "0.25"))
+HEDGE_INITIAL_DELAY_S = float(os.getenv("HEDGE_INITIAL_DELAY_S", "4"))
+HEDGE_MIN_SAMPLES = 20
+
+# Consecutive failures that open the breaker; 0 disables it
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_S = float(os.getenv("BREAKER_COOLDOWN_S", "30"))
+
+# Threads for sync calls. A call abandoned at its deadline keeps its thread
+# until the client's own timeout ends it, so this also caps how many such
+# stragglers can pile up.
+UPSTREAM_SYNC_WORKERS = int(os.getenv("UPSTREAM_SYNC_WORKERS", "8"))
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("upstream_deadline", default=None)
+
+
+class UpstreamError(RuntimeError):
+    """An upstream call failed, timed out, or was refused by the breaker."""
+
+
+class DeadlineExceeded(UpstreamError):
+    pass
+
+
+class CircuitOpenError(UpstreamError):
+    pass
+
+
+# ------------------------
+# Request budget
+# ------------------------
+@contextmanager
+def request_budget(seconds: float = REQUEST_BUDGET_S):
+    """Upstream calls made inside share one deadline, `seconds` from now."""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request budget; None outside one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def call_deadline(timeout: float) -> float:
+    """Timeout for one upstream call: its own cap, or what the request has left."""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("request budget exhausted")
+    return min(timeout, left)
+
+
+# ------------------------
+# Latency tracking + breaker
+# ------------------------
+class LatencyWindow:
+    """Recent successful call latencies, for the hedge delay."""
+
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN_S):
+        self.threshold = failures
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a call may go out (in half-open: only the single probe)."""
+        if not self.threshold:
+            return True
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            # a probe that never reported back (cancelled) is replaced after
+            # another cooldown, so the breaker can't stick half-open
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.state = self.CLOSED
+
+    def record_failure(self) -> None:
+        if not self.threshold:
+            return
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self.state != self.OPEN:
+                    print(f"⚠️ Circuit opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+# ------------------------
+# Guarded calls
+# ------------------------
+class UpstreamGuard:
+    """Deadline + hedging + breaker for one upstream target ("chat", "embed")."""
+
+    def __init__(self, target: str, timeout: float, hedge: bool = HEDGE):
+        self.target = target
+        self.timeout = timeout
+        self.hedge = hedge
+        self.latencies = LatencyWindow()
+        self.breaker = CircuitBreaker()
+
+    def hedge_delay(self) -> float:
+        p = self.latencies.quantile(HEDGE_QUANTILE)
+        return max(HEDGE_MIN_DELAY_S, p if p is not None else HEDGE_INITIAL_DELAY_S)
+
+    def _refuse(self) -> None:
+        metrics.inc("upstream_failures", target=self.target, reason="circuit_open")
+        raise CircuitOpenError(f"{self.target} circuit open")
+
+    def _fail(self, reason: str, error: Exception) -> UpstreamError:
+        self.breaker.record_failure()
+        metrics.inc("upstream_failures", target=self.target, reason=reason)
+        if isinstance(error, UpstreamError):
+            return error
+        if reason == "timeout":
+            return DeadlineExceeded(f"{self.target} call exceeded its deadline")
+        return UpstreamError(f"{self.target} call failed: {error}")
+
+    def _succeed(self, path: str, started: float) -> None:
+        self.latencies.add(time.monotonic() - started)
+        self.breaker.record_success()
+        metrics.inc("upstream_calls", target=self.target, path=path)
+
+    async def acall(self, attempt: Callable[[], Awaitable]):
+        """Run attempt() under the deadline, hedging once if it is slow."""
+        if not self.breaker.allow():
+            self._refuse()
+        try:
+            deadline = call_deadline(self.timeout)
+        except DeadlineExceeded as e:
+            raise self._fail("timeout", e)
+
+        started = time.monotonic()
+        tasks = {asyncio.ensure_future(attempt()): "primary"}
+        try:
+            delay = self.hedge_delay()
+            if self.hedge and delay < deadline:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    metrics.inc("upstream_hedges", target=self.target)
+                    tasks[asyncio.ensure_future(attempt())] = "hedge"
+            left = deadline - (time.monotonic() - started)
+            last_error = None
+            while tasks and left > 0:
+                done, _ = await asyncio.wait(tasks, timeout=left, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    path = tasks.pop(task)
+                    if task.exception() is None:
+                        self._succeed(path, started)
+                        return task.result()
+                    last_error = task.exception()
+                left = deadline - (time.monotonic() - started)
+            if tasks:
+                raise self._fail("timeout", TimeoutError())
+            raise self._fail("error", last_error)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Sync path: same breaker and deadline as acall(), no hedging."""
+        if not self.breaker.allow():
+            self._refuse()
+        try:
+            deadline = call_deadline(self.timeout)
+        except DeadlineExceeded as e:
+            raise self._fail("timeout", e)
+
+        started = time.monotonic()
+        context = contextvars.copy_context()
+        future = _sync_executor().submit(context.run, fn, *args, **kwargs)
+        done, _ = wait([future], timeout=deadline)
+        if not done:
+            future.cancel()   # still queued -> never runs; running -> abandoned
+            raise self._fail("timeout", TimeoutError())
+        try:
+            result = future.result()
+        except Exception as e:
+            raise self._fail("error", e) from e
+        self._succeed("primary", started)
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        p = self.latencies.quantile(HEDGE_QUANTILE)
+        return {
+            f"circuit_open_{self.target}": float(self.breaker.state != CircuitBreaker.CLOSED),
+            f"hedge_delay_seconds_{self.target}": round(p if p is not None else HEDGE_INITIAL_DELAY_S, 3),
+        }
+
+
+class ResilientChatModel:
+    """Wraps a LangChain chat model: invoke / ainvoke / astream under an UpstreamGuard."""
+
+    def __init__(self, inner, guard: UpstreamGuard = None):
+        self.inner = inner
+        self.guard = guard or guard_for("chat", LLM_CALL_TIMEOUT_S)
+
+    def invoke(self, messages):
+        return self.guard.call(self.inner.invoke, messages)
+
+    async def ainvoke(self, messages):
+        return await self.guard.acall(lambda: self.inner.ainvoke(messages))
+
+    async def astream(self, messages):
+        """
+        Streams are never hedged (chunks can't be merged), but the first
+        chunk has to arrive within the call deadline and the rest within
+        the request budget.
+        """
+        guard = self.guard
+        if not guard.breaker.allow():
+            guard._refuse()
+        try:
+            timeout = call_deadline(guard.timeout)
+        except DeadlineExceeded as e:
+            raise guard._fail("timeout", e)
+        started = time.monotonic()
+        stream = self.inner.astream(messages).__aiter__()
+        first = True
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout)
+                except StopAsyncIteration:
+                    if first:
+                        guard._succeed("primary", started)
+                    break
+                except asyncio.TimeoutError as e:
+                    raise guard._fail("timeout", e) from e
+                except UpstreamError:
+                    raise
+                except Exception as e:
+                    raise guard._fail("error", e) from e
+                if first:
+                    guard._succeed("primary", started)
+                    first = False
+                yield chunk
+                left = remaining()
+                timeout = max(left, 0.001) if left is not None else guard.timeout
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+
+class ResilientEmbeddings(Embeddings):
+    """Same guard around an embeddings client (sits under CachedEmbeddings)."""
+
+    def __init__(self, inner, guard: UpstreamGuard = None):
+        self.inner = inner
+        self.guard = guard or guard_for("embed", EMBED_CALL_TIMEOUT_S)
+
+    def embed_query(self, text):
+        return self.guard.call(self.inner.embed_query, text)
+
+    def embed_documents(self, texts):
+        return self.guard.call(self.inner.embed_documents, texts)
+
+    async def aembed_query(self, text):
+        return await self.guard.acall(lambda: self.inner.aembed_query(text))
+
+    async def aembed_documents(self, texts):
+        return await self.guard.acall(lambda: self.inner.aembed_documents(texts))
+
+
+_guards: Dict[str, UpstreamGuard] = {}
+_sync_pool: Optional[ThreadPoolExecutor] = None
+_sync_pool_lock = threading.Lock()
+
+
+def _sync_executor() -> ThreadPoolExecutor:
+    global _sync_pool
+    if _sync_pool is None:
+        with _sync_pool_lock:
+            if _sync_pool is None:
+                _sync_pool = ThreadPoolExecutor(max_workers=UPSTREAM_SYNC_WORKERS, thread_name_prefix="upstream")
+    return _sync_pool
+
+
+def guard_for(target: str, timeout: float) -> UpstreamGuard:
+    """One guard per target per process, shared by every wrapper around it."""
+    guard = _guards.get(target)
+    if guard is None:
+        guard = _guards.setdefault(target, UpstreamGuard(target, timeout))
+    return guard
+
+
+def resilience_metrics() -> Dict[str, float]:
+    stats: Dict[str, float] = {}
+    for guard in list(_guards.values()):
+        stats.update(guard.stats())
+    return stats
+
+
+metrics.add_collector(resilience_metrics)
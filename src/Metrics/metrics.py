@@ -0,0 +1,200 @@
+import asyncio
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Off -> span()/timed() hand back a shared no-op / the undecorated function,
+# so the hot path pays nothing.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Always emit Server-Timing; otherwise only when the client sends
+# `X-Server-Timing: 1`.
+SERVER_TIMING_ALWAYS = os.getenv("SERVER_TIMING", "0") == "1"
+
+PREFIX = "shl"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_NOOP = nullcontext()
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.total += value
+            self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms: Dict[Tuple[str, Tuple], Histogram] = {}
+        self.counters: Dict[Tuple[str, Tuple], float] = {}
+        self.collectors: List[Callable[[], Dict[str, float]]] = []
+
+    def histogram(self, name: str, labels: Tuple = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        key = (name, labels)
+        hist = self.histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(key, Histogram(buckets))
+        return hist
+
+    def inc(self, name: str, amount: float = 1, labels: Tuple = ()) -> None:
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def add_collector(self, fn: Callable[[], Dict[str, float]]) -> None:
+        """fn() -> {metric_name: value}, sampled as gauges at scrape time."""
+        self.collectors.append(fn)
+
+
+REGISTRY = Registry()
+
+
+def _labels(pairs: Tuple) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+# ------------------------
+# Recording API
+# ------------------------
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        REGISTRY.histogram("stage_duration_seconds", (("stage", self.name),)).observe(elapsed)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((self.name, elapsed))
+        return False
+
+
+def span(name: str):
+    """`with span("llm"):` — times a pipeline stage into the stage histogram."""
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _Span(name)
+
+
+def timed(name: str):
+    """Decorator form of span(); returns fn untouched when metrics are off."""
+    def decorate(fn):
+        if not METRICS_ENABLED:
+            return fn
+        if asyncio.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _Span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def observe(name: str, value: float, buckets=SIZE_BUCKETS, **labels) -> None:
+    if METRICS_ENABLED:
+        REGISTRY.histogram(name, tuple(sorted(labels.items())), buckets).observe(value)
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    if METRICS_ENABLED:
+        REGISTRY.inc(name, amount, tuple(sorted(labels.items())))
+
+
+def add_collector(fn: Callable[[], Dict[str, float]]) -> None:
+    REGISTRY.add_collector(fn)
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 chars/token — close enough for budgeting and trend lines."""
+    return (len(text) + 3) // 4
+
+
+# ------------------------
+# Per-request Server-Timing
+# ------------------------
+def start_request_timing() -> List[Tuple[str, float]]:
+    spans: List[Tuple[str, float]] = []
+    _request_spans.set(spans)
+    return spans
+
+
+def server_timing_header(spans: List[Tuple[str, float]]) -> str:
+    totals: Dict[str, float] = {}
+    for name, elapsed in spans:
+        totals[name] = totals.get(name, 0.0) + elapsed
+    return ", ".join(f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in totals.items())
+
+
+# ------------------------
+# Prometheus exposition
+# ------------------------
+def render_prometheus() -> str:
+    lines = []
+    seen_types = set()
+
+    for (name, labels), hist in sorted(REGISTRY.histograms.items()):
+        metric = f"{PREFIX}_{name}"
+        if metric not in seen_types:
+            lines.append(f"# TYPE {metric} histogram")
+            seen_types.add(metric)
+        cumulative = 0
+        for bound, count in zip(hist.buckets, hist.counts):
+            cumulative += count
+            lines.append(f"{metric}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+        lines.append(f"{metric}_bucket{_labels(labels + (('le', '+Inf'),))} {hist.count}")
+        lines.append(f"{metric}_sum{_labels(labels)} {hist.total}")
+        lines.append(f"{metric}_count{_labels(labels)} {hist.count}")
+
+    for (name, labels), value in sorted(REGISTRY.counters.items()):
+        metric = f"{PREFIX}_{name}_total"
+        if metric not in seen_types:
+            lines.append(f"# TYPE {metric} counter")
+            seen_types.add(metric)
+        lines.append(f"{metric}{_labels(labels)} {value}")
+
+    for collect in REGISTRY.collectors:
+        try:
+            values = collect()
+        except Exception:
+            continue
+        for name, value in sorted(values.items()):
+            metric = f"{PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,106 @@
+import re
+from typing import Iterable
+
+from src.Indexing.metadata_index import Constraints
+
+_NUM = r"(\d+)\s*(?:-\s*)?(min|mins|minute|minutes|hr|hrs|hour|hours)\b"
+_MAX_DURATION_RE = re.compile(
+    r"(?:under|less than|below|within|no (?:more|longer) than|not (?:more|longer) than|"
+    r"max(?:imum)?(?: of)?|at most|up to|shorter than|<=?)\s*" + _NUM,
+    re.I,
+)
+_TRAILING_MAX_RE = re.compile(_NUM + r"\s*(?:or less|or under|max(?:imum)?|tops)", re.I)
+_WORD_DURATIONS = [
+    (re.compile(r"(?:under|less than|within|no more than|at most|up to)\s+(?:half an hour|30 min)", re.I), 30),
+    (re.compile(r"(?:under|less than|within|no more than|at most|up to)\s+(?:an|one|1)\s+hour", re.I), 60),
+]
+
+# Manager / supervisor / director / executive are also the tail of job titles
+# ("sales manager", "account executive") that say nothing about seniority, so
+# the bare word only counts as the candidates' level right after a lead-in
+# ("for managers", "a director", "our supervisors") — not after a function
+# word, and not about the speaker ("I'm a manager", "as a manager").
+_LEVEL_LEAD = (
+    r"(?:\b(?:for|our|new|senior|experienced|all|of|to)\s+"
+    r"|(?<!\bi'm )(?<!\bi am )(?<!\bas )\b(?:a|an)\s+)"
+)
+
+# phrase -> catalog job_levels values
+_JOB_LEVEL_PATTERNS = [
+    (r"\bentry[\s-]?level\b|\bjunior\b|\bfreshers?\b", {"Entry-Level"}),
+    (r"\bgraduates?\b|\bcampus\b|\bnew grads?\b", {"Graduate"}),
+    (r"\bmid[\s-]?(?:level|professional|career|senior)\b", {"Mid-Professional"}),
+    (r"\bindividual contributors?\b", {"Professional Individual Contributor"}),
+    (r"\bfront[\s-]?line (?:managers?|supervisors?)\b|\bteam leads?\b", {"Front Line Manager"}),
+    (r"\bsupervisory\b|\bsupervisor[\s-]level\b|" + _LEVEL_LEAD + r"supervisors?\b", {"Supervisor"}),
+    (r"\bmanagerial\b|\bmanage(?:r|ment)[\s-]level\b|\bpeople managers?\b|" + _LEVEL_LEAD + r"managers?\b",
+     {"Manager"}),
+    (r"\bdirector[\s-]level\b|" + _LEVEL_LEAD + r"directors?\b", {"Director"}),
+    (r"\bexecutive[\s-]level\b|\bcxos?\b|\bc-suite\b|\bsenior leadership\b|" + _LEVEL_LEAD + r"executives?\b",
+     {"Executive"}),
+]
+_JOB_LEVEL_RES = [(re.compile(p, re.I), levels) for p, levels in _JOB_LEVEL_PATTERNS]
+
+# "remote" alone is usually about the job ("remote team", "remote role"), so
+# it needs testing context: "remote testing", "can be taken remotely"
+_REMOTE_RE = re.compile(
+    r"\bremote(?:ly)?[\s-](?:test\w*|assess\w*|proctor\w*|administ\w*|deliver\w*|complet\w*|taken)"
+    r"|\b(?:test\w*|assess\w*|take[ns]?|taking|complete[sd]?|sit|administered|delivered|done)\s+(?:\w+\s+){0,2}?remotely\b"
+    r"|\bonline proctor|\bunproctored\b",
+    re.I,
+)
+_ADAPTIVE_RE = re.compile(r"\badaptive\b|\birt\b", re.I)
+
+
+def _to_minutes(value: str, unit: str) -> int:
+    minutes = int(value)
+    return minutes * 60 if unit.lower().startswith("h") else minutes
+
+
+def extract_constraints(messages: Iterable[str], known_languages: Iterable[str] = ()) -> Constraints:
+    """
+    Structured filters from the user's side of the conversation. Constraints
+    accumulate across turns (a REFINE adds to what was said before); for the
+    duration cap the latest mention wins.
+
+    `known_languages` are the catalog's language bases (MetadataIndex
+    .known_languages). A language only counts when it is asked for as the
+    test language — "in Spanish", "Spanish-language", "Spanish-speaking
+    candidates", "English fluent", or a bare "English." answering the agent's
+    question — so "an English comprehension test" doesn't become a filter.
+    """
+    constraints = Constraints()
+    language_re = None
+    known = sorted(set(known_languages))
+    if known:
+        names = "(" + "|".join(re.escape(k.capitalize()) for k in known) + ")"
+        language_re = re.compile(
+            r"\b(?:in|into|language:?)\s+" + names + r"\b"
+            r"|\b" + names + r"[\s-](?:language|version|speak(?:ing|ers?)|fluent)\b"
+            r"|^\W*" + names + r"\W*$"
+        )
+
+    for text in messages:
+        match = _MAX_DURATION_RE.search(text) or _TRAILING_MAX_RE.search(text)
+        if match:
+            constraints.max_minutes = _to_minutes(match.group(1), match.group(2))
+        else:
+            for pattern, minutes in _WORD_DURATIONS:
+                if pattern.search(text):
+                    constraints.max_minutes = minutes
+                    break
+
+        if language_re is not None:
+            for match in language_re.finditer(text):
+                constraints.languages.add(next(g for g in match.groups() if g).lower())
+
+        for pattern, levels in _JOB_LEVEL_RES:
+            if pattern.search(text):
+                constraints.job_levels.update(levels)
+
+        if _REMOTE_RE.search(text):
+            constraints.remote = True
+        if _ADAPTIVE_RE.search(text):
+            constraints.adaptive = True
+
+    return constraints
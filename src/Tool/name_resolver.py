@@ -0,0 +1,172 @@
+"""
+Catalog name resolution for compare/justify turns.
+
+Every product name is indexed under a few aliases — the normalized name,
+the name without parentheticals, a parenthetical acronym ("DSI"), and the
+letter stem of a versioned code ("OPQ32r" -> "OPQ", "HTML5" -> "HTML").
+A phrase resolves by exact alias first, then fuzzily: trigram overlap picks
+a handful of candidate aliases, which are scored by edit distance and by
+token containment ("Safety & Dependability 8.0" inside "Manufac. & Indust.
+- Safety & Dependability 8.0").
+
+Phrases with no catalog vocabulary at all ("Feels", "Is", "Thanks") are
+flagged as junk, so callers can skip the embedding fallback for them.
+"""
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Set
+
+NAME_MATCH_THRESHOLD = float(os.getenv("NAME_MATCH_THRESHOLD", "0.75"))
+# a phrase is junk (never embedded) unless its best trigram overlap reaches
+# this and one of its words (give or take a typo) occurs in a candidate name
+NAME_JUNK_DICE = 0.3
+# two different products scoring within this of each other -> ambiguous
+NAME_AMBIGUITY_MARGIN = 0.02
+_CANDIDATES = 8
+
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "for", "to", "in", "on", "with", "is", "are", "do", "we",
+    "i", "it", "this", "that", "what", "which", "why", "how", "test", "tests", "assessment", "assessments",
+}
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]")
+_CODE_RE = re.compile(r"^([a-z]{2,})\d+[a-z]*$")
+_ACRONYM_RE = re.compile(r"\(([A-Z][A-Z0-9]{1,7})\)")
+
+
+def normalize_name(text: str) -> str:
+    text = re.sub(r"\(new\)", " ", (text or "").lower())
+    text = text.replace("&", " and ")
+    return " ".join(_TOKEN_RE.findall(text))
+
+
+def _strip_phrase(norm: str) -> str:
+    """'the java 8 test' -> 'java 8'"""
+    tokens = norm.split()
+    while tokens and tokens[0] in ("the", "a", "an"):
+        tokens.pop(0)
+    while tokens and tokens[-1] in ("test", "tests", "assessment", "assessments"):
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def _informative(tokens: Iterable[str]) -> Set[str]:
+    return {t for t in tokens if t not in _STOPWORDS}
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, giving up (returning limit + 1) once it must exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _token_in(token: str, tokens: Set[str]) -> bool:
+    if token in tokens:
+        return True
+    if len(token) < 5:
+        return False
+    return any(abs(len(token) - len(t)) <= 1 and edit_distance(token, t, 1) <= 1 for t in tokens)
+
+
+@dataclass
+class NameMatch:
+    doc: object = None          # None -> nothing above the threshold (or ambiguous)
+    score: float = 0.0
+    alias: str = ""
+    plausible: bool = False     # shares vocabulary with the catalog; worth an embedding lookup
+
+
+class NameResolver:
+    def __init__(self, documents: Iterable, threshold: float = NAME_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.aliases: List[str] = []
+        self.alias_docs: List[object] = []
+        self.alias_tokens: List[Set[str]] = []
+        self.alias_grams: List[Set[str]] = []
+        self.exact: Dict[str, List[int]] = {}
+        self.postings: Dict[str, List[int]] = {}
+
+        for doc in documents:
+            for alias in self._aliases_for(doc.metadata.get("name", "")):
+                self._add(alias, doc)
+
+    @staticmethod
+    def _aliases_for(name: str) -> Set[str]:
+        aliases = {normalize_name(name), normalize_name(re.sub(r"\(.*?\)", " ", name))}
+        aliases.update(normalize_name(a) for a in _ACRONYM_RE.findall(name))
+        for token in normalize_name(name).split():
+            code = _CODE_RE.match(token)
+            if code:
+                aliases.add(token)
+                aliases.add(code.group(1))
+        aliases.discard("")
+        return aliases
+
+    def _add(self, alias: str, doc) -> None:
+        idx = len(self.aliases)
+        self.aliases.append(alias)
+        self.alias_docs.append(doc)
+        self.alias_tokens.append(_informative(alias.split()))
+        grams = trigrams(alias)
+        self.alias_grams.append(grams)
+        self.exact.setdefault(alias, []).append(idx)
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(idx)
+
+    def _score(self, phrase: str, tokens: Set[str], idx: int) -> float:
+        alias = self.aliases[idx]
+        longest = max(len(phrase), len(alias))
+        limit = int(longest * (1 - self.threshold))
+        score = 1 - edit_distance(phrase, alias, limit) / longest
+        alias_tokens = self.alias_tokens[idx]
+        if tokens and alias_tokens and all(_token_in(t, alias_tokens) for t in tokens):
+            score = max(score, 0.6 + 0.4 * len(tokens) / len(alias_tokens))
+        return score
+
+    def resolve(self, phrase: str) -> NameMatch:
+        norm = _strip_phrase(normalize_name(phrase))
+        tokens = _informative(norm.split())
+        if not tokens:
+            return NameMatch()
+
+        exact = self.exact.get(norm)
+        if exact and len({id(self.alias_docs[i]) for i in exact}) == 1:
+            return NameMatch(self.alias_docs[exact[0]], 1.0, norm, True)
+
+        grams = trigrams(norm)
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for idx in self.postings.get(gram, ()):
+                shared[idx] = shared.get(idx, 0) + 1
+        if not shared:
+            return NameMatch()
+        dice = {idx: 2 * n / (len(grams) + len(self.alias_grams[idx])) for idx, n in shared.items()}
+        candidates = sorted(dice, key=dice.get, reverse=True)[:_CANDIDATES]
+        if dice[candidates[0]] < NAME_JUNK_DICE or not any(
+            _token_in(t, self.alias_tokens[idx]) for idx in candidates for t in tokens
+        ):
+            return NameMatch()
+
+        scored = sorted(
+            ((self._score(norm, tokens, idx), -len(self.aliases[idx]), idx) for idx in candidates),
+            reverse=True,
+        )
+        best_score, _, best = scored[0]
+        runner_up = next((s for s, _, idx in scored[1:] if self.alias_docs[idx] is not self.alias_docs[best]), 0.0)
+        if best_score < self.threshold or best_score - runner_up < NAME_AMBIGUITY_MARGIN:
+            return NameMatch(None, best_score, self.aliases[best], True)
+        return NameMatch(self.alias_docs[best], best_score, self.aliases[best], True)
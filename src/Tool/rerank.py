@@ -0,0 +1,140 @@
+"""
+Optional cross-encoder reranking of the retrieved candidates.
+
+Torch does not fit next to the app in 512MB, so the reranker is an ONNX
+export of a small cross-encoder (e.g. ms-marco-MiniLM-L-6-v2, int8
+quantized: ~23MB on disk, ~60MB RSS with onnxruntime) run on the CPU
+with the `tokenizers` package. All RETRIEVE_K (query, document) pairs go
+through one batched forward pass.
+
+The pass runs on its own thread with a per-request cap (RERANK_TIMEOUT_MS).
+If the cap is exceeded, the run is terminated and the candidates keep their
+retrieval order, so a slow box degrades to the old ranking, never to a slow
+/chat.
+
+    RERANKER_MODEL_PATH=models/ms-marco-MiniLM-L-6-v2-int8   # model.onnx + tokenizer.json
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from src.Metrics.metrics import inc, observe, span
+
+# Directory holding model.onnx (or model_quantized.onnx) and tokenizer.json;
+# empty = no reranking
+RERANKER_MODEL_PATH = os.getenv("RERANKER_MODEL_PATH", "")
+RERANK_TIMEOUT_MS = float(os.getenv("RERANK_TIMEOUT_MS", "150"))
+# Tokens per (query, document) pair; the longer side is cut first
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "256"))
+RERANK_THREADS = int(os.getenv("RERANK_THREADS", "1"))
+
+_MODEL_FILES = ("model_quantized.onnx", "model.onnx")
+
+
+class OnnxReranker:
+    def __init__(self, path: str, max_length: int = RERANK_MAX_LENGTH, threads: int = RERANK_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_file = next((os.path.join(path, f) for f in _MODEL_FILES if os.path.exists(os.path.join(path, f))), None)
+        if model_file is None:
+            raise RuntimeError(f"No {' or '.join(_MODEL_FILES)} in '{path}'")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.enable_cpu_mem_arena = False   # keep RSS flat between requests
+        self._ort = ort
+        self.session = ort.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length, strategy="longest_first")
+        self.tokenizer.enable_padding()
+        # one pass at a time; a pass past its cap is terminated, so it can't hold up the next
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self.timeouts = 0
+        self.errors = 0
+
+    def scores(self, query: str, texts: Sequence[str], run_options=None) -> np.ndarray:
+        """One relevance logit per text, from a single batched forward pass."""
+        encodings = self.tokenizer.encode_batch([(query, text) for text in texts])
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+        }
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        logits = self.session.run(None, feeds, run_options)[0]
+        return np.asarray(logits, dtype=np.float32).reshape(len(texts), -1)[:, -1]
+
+    def rerank(self, query: str, docs: List, timeout_ms: float = RERANK_TIMEOUT_MS) -> List:
+        """docs sorted by cross-encoder score; unchanged on timeout or error."""
+        if len(docs) < 2:
+            return docs
+        run_options = self._ort.RunOptions()
+        future = self._executor.submit(self.scores, query, [_doc_text(d) for d in docs], run_options)
+        try:
+            scores = future.result(timeout=timeout_ms / 1000)
+        except FutureTimeout:
+            run_options.terminate = True   # stop the pass, free the thread for the next request
+            self.timeouts += 1
+            inc("rerank", outcome="timeout")
+            return docs
+        except Exception as e:
+            self.errors += 1
+            inc("rerank", outcome="error")
+            print(f"⚠️ Rerank failed, keeping retrieval order: {e}")
+            return docs
+        observe("rerank_pairs", len(docs))
+        inc("rerank", outcome="ok")
+        order = np.argsort(-scores, kind="stable")
+        return [docs[i] for i in order]
+
+
+def _doc_text(doc) -> str:
+    meta = doc.metadata
+    return f"{meta.get('name', '')}. {meta.get('description', '') or doc.page_content}"
+
+
+_reranker: Optional[OnnxReranker] = None
+_reranker_lock = threading.Lock()
+_reranker_ready = False
+
+
+def get_reranker() -> Optional[OnnxReranker]:
+    """The configured reranker, or None (no RERANKER_MODEL_PATH, or it failed to load)."""
+    global _reranker, _reranker_ready
+    if not _reranker_ready:
+        with _reranker_lock:
+            if not _reranker_ready:
+                if RERANKER_MODEL_PATH:
+                    try:
+                        _reranker = OnnxReranker(RERANKER_MODEL_PATH)
+                        print(f"✅ Reranker loaded from {RERANKER_MODEL_PATH}")
+                    except Exception as e:
+                        # onnxruntime is optional — serve in vector order without it
+                        print(f"⚠️ Reranker disabled: {e}")
+                _reranker_ready = True
+    return _reranker
+
+
+def set_reranker(reranker) -> None:
+    """Install a reranker (anything with rerank(query, docs)), or None to disable."""
+    global _reranker, _reranker_ready
+    with _reranker_lock:
+        _reranker = reranker
+        _reranker_ready = True
+
+
+def rerank(query: str, docs: List) -> List:
+    """Rerank with the configured model; a no-op when there is none."""
+    reranker = get_reranker()
+    if reranker is None:
+        return docs
+    with span("rerank"):
+        return reranker.rerank(query, docs)
@@ -1,74 +1,264 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import List, Dict
-from src.Indexing.Index import get_vector_store
+from src.Indexing.Index import (
+    IndexHandle, get_index_handle, iter_documents, register_derived, search_by_vectors, search_rows,
+)
+from src.Indexing.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+from src.Indexing.catalog_store import CatalogRecord, CatalogStore
+from src.Indexing.metadata_index import Constraints, MetadataIndex
+from src.LLM.concurrency import upstream_slot
+from src.Metrics.metrics import inc, span, timed
+from src.Tool.name_resolver import NameResolver
+from src.Tool.rerank import rerank
 
 RETRIEVE_K = 30
 TOP_K = 10
 
+# vector  -> embedding similarity only (original behaviour)
+# lexical -> BM25 over names + text_for_embedding, no embed call at all
+# hybrid  -> BM25 + vector fused with reciprocal rank fusion; a confident
+#            lexical hit on a short query skips the remote embed entirely
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+RRF_K = 60
+HYBRID_SHORTCIRCUIT_RATIO = float(os.getenv("HYBRID_SHORTCIRCUIT_RATIO", "2.0"))
+HYBRID_SHORTCIRCUIT_MAX_TOKENS = int(os.getenv("HYBRID_SHORTCIRCUIT_MAX_TOKENS", "6"))
 
+# Metadata filters narrowing the catalog below this many items are dropped
+# and the turn searches everything instead
+METADATA_FILTER_MIN_ROWS = int(os.getenv("METADATA_FILTER_MIN_ROWS", str(TOP_K)))
 
-def retrieve_documents(query: str, retrieve_k: int = RETRIEVE_K, top_k: int = TOP_K) -> List:
+# FAISS search is CPU-bound and releases the GIL — run it off the event loop
+# on a small dedicated pool so it can't starve the default executor.
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "4"))
+_search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="vector-search")
+
+# Batch retrieval: queries are embedded EMBED_BATCH_SIZE at a time, with at
+# most EMBED_PARALLELISM embed_documents requests in flight.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_PARALLELISM = int(os.getenv("EMBED_PARALLELISM", "4"))
+
+
+async def run_in_search_executor(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # carry contextvars over so timing spans still land on the current request
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_search_executor, partial(ctx.run, fn, *args, **kwargs))
+
+
+def get_lexical_index(handle: IndexHandle = None) -> BM25Index:
+    return (handle or get_index_handle()).derived("bm25")
+
+
+def get_metadata_index(handle: IndexHandle = None) -> MetadataIndex:
+    return (handle or get_index_handle()).derived("metadata_index")
+
+
+def _lexical_shortcut(query: str, lexical_hits) -> bool:
+    """
+    High-confidence lexical match: a short query whose best BM25 hit clearly
+    beats the runner-up (e.g. "OPQ32r", "Java 8") — vector search won't add
+    anything, so skip the embed round-trip.
     """
-    Shared retrieval path. Cross-encoder rerank removed — Render free tier's
-    512MB memory limit can't fit embeddings + cross-encoder + torch overhead
-    simultaneously. Falls back to plain FAISS similarity ranking.
+    if not lexical_hits:
+        return False
+    n_terms = len([t for t in tokenize(query) if " " not in t])
+    if n_terms > HYBRID_SHORTCIRCUIT_MAX_TOKENS:
+        return False
+    top = lexical_hits[0][1]
+    runner_up = lexical_hits[1][1] if len(lexical_hits) > 1 else 0.0
+    return top >= HYBRID_SHORTCIRCUIT_RATIO * runner_up
+
+
+@timed("retrieve_documents")
+def retrieve_documents(
+    query: str,
+    retrieve_k: int = RETRIEVE_K,
+    top_k: int = TOP_K,
+    mode: str = None,
+    handle: IndexHandle = None,
+    constraints: Constraints = None,
+    query_vector: List[float] = None,
+    search_params: Dict = None,
+) -> List:
     """
-    vector_store = get_vector_store()
-    docs = vector_store.similarity_search(query.strip(), k=retrieve_k)
-    return docs[:top_k]
+    Shared retrieval path. The top `retrieve_k` candidates are reranked by
+    the optional ONNX cross-encoder (src/Tool/rerank.py, RERANKER_MODEL_PATH)
+    before cutting to `top_k`; without one — or past its latency cap — they
+    keep their retrieval order.
 
+    The query embedding goes through the store's CachedEmbeddings (see
+    Index.get_embeddings), so repeated/near-identical queries skip the
+    remote embed call.
 
-def _format_result(doc) -> Dict:
-    meta = doc.metadata
-    return {
-        "id": meta.get("id"),
-        "name": meta.get("name"),
-        "url": meta.get("url"),
-        "test_type": meta.get("test_type"),
-        "description": meta.get("description", ""),
-        "duration": meta.get("duration", ""),
-        "languages": meta.get("languages", []),
-        "job_levels": meta.get("job_levels", []),
-        "remote_testing": meta.get("remote_testing", False),
-        "adaptive_irt": meta.get("adaptive_irt", False),
-    }
+    `mode` overrides RETRIEVAL_MODE ("vector" | "lexical" | "hybrid").
+    `handle` pins the index snapshot (defaults to the current one).
+    `constraints` (duration / language / job level / remote / adaptive)
+    restrict both vector and lexical search to the matching catalog rows.
+    `query_vector` replaces the embed of `query` for the vector side (the
+    session store passes a context embedding built from earlier turns);
+    lexical search still runs on `query`.
+    `search_params` ({"nprobe": n} for IVF, {"ef_search": n} for HNSW)
+    override the index's INDEX_NPROBE / INDEX_EF_SEARCH for this call.
+    """
+    mode = mode or RETRIEVAL_MODE
+    handle = handle or get_index_handle()
+    query = query.strip()
+    rows = _allowed_rows(handle, constraints)
+    if mode == "vector":
+        docs = _vector_search(handle.store, query, retrieve_k, rows, query_vector, search_params)
+        return rerank(query, docs)[:top_k]
 
+    lexical_hits = _lexical_search(handle, query, retrieve_k, rows)
+    lexical_docs = [doc for doc, _ in lexical_hits]
+    if mode == "lexical" or _lexical_shortcut(query, lexical_hits):
+        return rerank(query, lexical_docs)[:top_k]
 
-def _build_name_index(vector_store) -> Dict[str, object]:
-    index = {}
-    docstore = vector_store.docstore._dict
-    for doc in docstore.values():
-        name = doc.metadata.get("name", "")
-        if name:
-            index[name.lower()] = doc
-    return index
+    vector_docs = _vector_search(handle.store, query, retrieve_k, rows, query_vector, search_params)
+    docs = reciprocal_rank_fusion([vector_docs, lexical_docs], k=RRF_K)[:retrieve_k]
+    return rerank(query, docs)[:top_k]
 
 
-_name_index_cache = None
+def _allowed_rows(handle: IndexHandle, constraints: Constraints):
+    if constraints is None:
+        return None
+    with span("filter"):
+        rows = get_metadata_index(handle).allowed_rows(constraints, min_rows=METADATA_FILTER_MIN_ROWS)
+    if rows is None and not constraints.is_empty():
+        inc("metadata_filter_fallbacks")
+    return rows
 
 
-def compare_assessments_lookup(names: List[str]) -> List[Dict]:
-    global _name_index_cache
-    vector_store = get_vector_store()
+def _lexical_search(handle: IndexHandle, query: str, k: int, rows):
+    with span("lexical"):
+        return get_lexical_index(handle).search(query, k=k, rows=rows)
 
-    if _name_index_cache is None:
-        _name_index_cache = _build_name_index(vector_store)
 
-    results = []
-    for name in names:
-        name_lower = name.lower()
-        doc = _name_index_cache.get(name_lower)
+def _vector_search(vector_store, query: str, k: int, rows=None, embedding=None, search_params: Dict = None) -> List:
+    if embedding is None:
+        with span("embed"):
+            embedding = vector_store.embeddings.embed_query(query)
+    with span("search"):
+        return search_rows(vector_store, embedding, k, rows, search_params)
+
+
+def retrieve_documents_batch(queries: List[str], top_k: int = TOP_K, search_params: Dict = None) -> List[List]:
+    """
+    Batch twin of retrieve_documents — one result list per query, same order.
+    Embeds in chunked embed_documents calls (bounded parallelism, cache-aware)
+    and scores every query against the index in a single matrix operation.
+    """
+    if not queries:
+        return []
+    vector_store = get_index_handle().store
+    embeddings = vector_store.embeddings
+    texts = [q.strip() for q in queries]
+    chunks = [texts[i:i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+
+    if len(chunks) == 1:
+        vectors = embeddings.embed_documents(chunks[0])
+    else:
+        with ThreadPoolExecutor(max_workers=min(EMBED_PARALLELISM, len(chunks))) as pool:
+            vectors = [v for chunk in pool.map(embeddings.embed_documents, chunks) for v in chunk]
+
+    return search_by_vectors(vector_store, vectors, top_k, search_params)
 
-        if doc is None:
-            candidates = [
-                d for n, d in _name_index_cache.items() if name_lower in n or n in name_lower
-            ]
-            doc = candidates[0] if candidates else None
 
-        if doc is None:
-            hits = vector_store.similarity_search(name, k=1)
+@timed("retrieve_documents")
+async def aretrieve_documents(
+    query: str,
+    retrieve_k: int = RETRIEVE_K,
+    top_k: int = TOP_K,
+    mode: str = None,
+    handle: IndexHandle = None,
+    constraints: Constraints = None,
+    query_vector: List[float] = None,
+    search_params: Dict = None,
+) -> List:
+    """
+    Async twin of retrieve_documents: non-blocking embed (aembed_query behind
+    the upstream semaphore), then the FAISS search and rerank on the search
+    executor.
+    """
+    mode = mode or RETRIEVAL_MODE
+    handle = handle or get_index_handle()
+    query = query.strip()
+    rows = _allowed_rows(handle, constraints)
+    lexical_docs = None
+    if mode != "vector":
+        lexical_hits = _lexical_search(handle, query, retrieve_k, rows)
+        lexical_docs = [doc for doc, _ in lexical_hits]
+        if mode == "lexical" or _lexical_shortcut(query, lexical_hits):
+            return (await run_in_search_executor(rerank, query, lexical_docs))[:top_k]
+
+    vector_store = handle.store
+    embedding = query_vector
+    if embedding is None:
+        with span("embed"):
+            async with upstream_slot():
+                embedding = await vector_store.embeddings.aembed_query(query)
+    with span("search"):
+        docs = await run_in_search_executor(search_rows, vector_store, embedding, retrieve_k, rows, search_params)
+    if lexical_docs is not None:
+        docs = reciprocal_rank_fusion([docs, lexical_docs], k=RRF_K)[:retrieve_k]
+    return (await run_in_search_executor(rerank, query, docs))[:top_k]
+
+
+def cached_query_vector(handle: IndexHandle, query: str):
+    """
+    The embedding retrieval just computed for `query`, if the embedding cache
+    still holds it; None otherwise (lexical hit, cache disabled, ...).
+    """
+    peek = getattr(handle.store.embeddings, "peek_query", None)
+    return peek(query.strip()) if peek is not None else None
+
+
+def get_catalog(handle: IndexHandle = None) -> CatalogStore:
+    return (handle or get_index_handle()).derived("catalog")
+
+
+def _format_result(doc, handle: IndexHandle = None) -> CatalogRecord:
+    """The shared, read-only catalog record of a hit (see src/Indexing/catalog_store.py)."""
+    return get_catalog(handle).record(doc)
+
+
+# Derived indexes live on the IndexHandle, so a hot reload swaps them
+# together with the vectors they were built from.
+register_derived("catalog", lambda vector_store: CatalogStore(iter_documents(vector_store)))
+register_derived("name_resolver", lambda vector_store: NameResolver(iter_documents(vector_store)))
+register_derived("bm25", lambda vector_store: BM25Index(iter_documents(vector_store)))
+register_derived("metadata_index", lambda vector_store: MetadataIndex(iter_documents(vector_store)))
+
+
+@timed("compare_lookup")
+def compare_assessments_lookup(names: List[str], handle: IndexHandle = None) -> List[CatalogRecord]:
+    """
+    Resolve product-name phrases to catalog entries via the name resolver.
+    Only phrases that look like catalog vocabulary but don't resolve
+    confidently fall back to a similarity_search (one embed call each);
+    junk phrases are dropped without touching the network.
+    """
+    handle = handle or get_index_handle()
+    resolver = handle.derived("name_resolver")
+
+    results = {}
+    for name in names:
+        match = resolver.resolve(name)
+        doc = match.doc
+        if doc is not None:
+            inc("name_lookups", outcome="exact" if match.score == 1.0 else "fuzzy")
+        elif match.plausible:
+            inc("name_lookups", outcome="embedding")
+            hits = handle.store.similarity_search(name, k=1)
             doc = hits[0] if hits else None
+        else:
+            inc("name_lookups", outcome="junk")
 
         if doc:
-            results.append(_format_result(doc))
+            result = _format_result(doc, handle)
+            results.setdefault(result.id, result)
 
-    return results
\ No newline at end of file
+    return list(results.values())
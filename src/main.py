@@ -1,16 +1,93 @@
-from fastapi import FastAPI, HTTPException
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import os
+import threading
+from array import array
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Header, HTTPException, Request, Response
 from pydantic import BaseModel
 from typing import List, Dict, Any, Literal, Optional
-import json
 
 from fastapi.middleware.cors import CORSMiddleware
-from langchain.messages import SystemMessage, HumanMessage
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
 from src.LLM.LLM_init import LLm_init
-from src.Tool.tool import retrieve_documents, compare_assessments_lookup, _format_result
-from src.Indexing.Index import get_vector_store
+from src.Tool.tool import (
+    retrieve_documents, aretrieve_documents, compare_assessments_lookup,
+    _format_result, run_in_search_executor, get_metadata_index, cached_query_vector, RETRIEVAL_MODE,
+)
+from src.Indexing.catalog_store import json_list, json_prompt_view, preview, recommendation
+from src.Tool.filters import extract_constraints
+from src.Tool.rerank import get_reranker
+from src.Indexing.Index import (
+    get_embedding_cache, get_index_handle, reload_index, start_index_watcher,
+)
+from src.Cache.response_cache import get_response_cache, response_key
+from src.Cache.session_store import SessionState, combine_vectors, get_session_store, session_key
+from src.LLM.concurrency import upstream_slot
+from src.LLM.output_parser import StreamingOutputParser, parse_llm_output, sse_event, sse_frame
+from src.LLM.prompt import assemble_prompt
+from src.LLM.resilience import ResilientChatModel, UpstreamError, request_budget
+from src.LLM.router import LLM, aroute_turn, fast_response, route_turn
+from src.Metrics import metrics
+from src.Metrics.metrics import span, timed
+
+# ------------------------
+# Startup — /health answers as soon as the module is imported; the index,
+# derived structures and chat model load in a warmup task, and /ready
+# reports when that is done.
+#
+# background -> warm up in a thread after the server starts listening
+# blocking   -> warm up before the server accepts requests
+# off        -> load everything lazily on first use
+# ------------------------
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "background")
+
+_startup: Dict[str, Any] = {"state": "cold", "import_seconds": None, "warmup_seconds": None, "error": None}
 
-app = FastAPI(title="SHL Assessment Recommendation API", version="3.0.0")
+
+def warmup() -> None:
+    """Load the index, build every derived structure, load the reranker (if any) and construct the chat model."""
+    _startup["state"] = "warming"
+    started = time.perf_counter()
+    try:
+        handle = get_index_handle()
+        try:
+            handle.warm()
+        except Exception as e:
+            # derived structures rebuild lazily on first use; serving can go on
+            print(f"⚠️ Warmup of derived index structures failed: {e}")
+        get_reranker()
+        get_model()
+        start_index_watcher()    # hot-reload on new builds when INDEX_WATCH_INTERVAL > 0
+    except Exception as e:
+        _startup.update(state="error", error=str(e))
+        print(f"❌ Warmup failed: {e}")
+        return
+    finally:
+        _startup["warmup_seconds"] = round(time.perf_counter() - started, 3)
+    _startup["state"] = "ready"
+    print(f"✅ Warm in {_startup['warmup_seconds']}s (import {_startup['import_seconds']}s)")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if STARTUP_WARMUP == "blocking":
+        await asyncio.to_thread(warmup)
+    elif STARTUP_WARMUP == "background":
+        threading.Thread(target=warmup, name="warmup", daemon=True).start()
+    elif STARTUP_WARMUP == "off":
+        _startup["state"] = "lazy"
+    else:
+        raise ValueError(f"Unknown STARTUP_WARMUP: {STARTUP_WARMUP}")
+    yield
+
+
+app = FastAPI(title="SHL Assessment Recommendation API", version="3.0.0", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -22,9 +99,84 @@ app.add_middleware(
 # ------------------------
 # Init — no tool-binding needed anymore, single plain LLM
 # ------------------------
-model = LLm_init()
+model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """
+    The chat model, constructed (and langchain_mistralai imported) on first
+    use, behind the deadline / hedging / circuit-breaker wrapper.
+    """
+    global model
+    if model is None:
+        with _model_lock:
+            if model is None:
+                model = ResilientChatModel(LLm_init())
+    return model
+
+
+# Pre-filter retrieval by duration / language / job level / remote / adaptive
+# constraints parsed from the user's messages
+METADATA_FILTERS = os.getenv("METADATA_FILTERS", "1") == "1"
+
+# compact -> token-budgeted table prompt (src/LLM/prompt.py)
+# json    -> original full-history + JSON candidate prompt
+PROMPT_FORMAT = os.getenv("PROMPT_FORMAT", "compact")
+
+# Shared secret for /admin endpoints; unset = admin endpoints disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def _embedding_cache_metrics() -> Dict[str, float]:
+    cache = get_embedding_cache()
+    if cache is None:
+        return {}
+    return {f"embedding_cache_{k}": float(v) for k, v in cache.stats().items()}
+
+
+def _response_cache_metrics() -> Dict[str, float]:
+    cache = get_response_cache()
+    if cache is None:
+        return {}
+    return {f"response_cache_{k}": float(v) for k, v in cache.stats().items()}
+
+
+def _session_store_metrics() -> Dict[str, float]:
+    store = get_session_store()
+    if store is None:
+        return {}
+    return {f"session_store_{k}": float(v) for k, v in store.stats().items()}
+
+
+metrics.add_collector(_embedding_cache_metrics)
+metrics.add_collector(_session_store_metrics)
+metrics.add_collector(_response_cache_metrics)
+
+
+def _startup_metrics() -> Dict[str, float]:
+    stats = {"startup_ready": float(_startup["state"] == "ready")}
+    for key in ("import_seconds", "warmup_seconds"):
+        if _startup[key] is not None:
+            stats[f"startup_{key}"] = float(_startup[key])
+    return stats
+
+
+metrics.add_collector(_startup_metrics)
 
-get_vector_store()       # preload FAISS at startup   # preload cross-encoder at startup
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Per-request Server-Timing (SERVER_TIMING=1, or opt in with `X-Server-Timing: 1`)."""
+    if not metrics.METRICS_ENABLED or not (
+        metrics.SERVER_TIMING_ALWAYS or request.headers.get("x-server-timing") == "1"
+    ):
+        return await call_next(request)
+    spans = metrics.start_request_timing()
+    response = await call_next(request)
+    if spans:
+        response.headers["Server-Timing"] = metrics.server_timing_header(spans)
+    return response
 
 MAX_TURNS = 8
 
@@ -115,6 +267,21 @@ class ChatResponse(BaseModel):
     end_of_conversation: bool = False
 
 
+FALLBACK_REPLY = "I'm having trouble processing that right now — could you rephrase or try again?"
+
+# Retrieval-only answer when the chat model is unreachable (breaker open,
+# deadline hit, upstream errors)
+DEGRADED_REPLY = (
+    "I can't reach the recommendation model right now, so these are the closest catalog matches "
+    "for what you've described so far, ranked by search alone. Ask again in a moment for a tailored shortlist."
+)
+DEGRADED_TOP_K = 5
+
+# Set on degraded results (unparseable model output) so the response cache
+# skips them; stripped before the response goes out.
+UNCACHEABLE = "_uncacheable"
+
+
 # ------------------------
 # Helpers
 # ------------------------
@@ -146,62 +313,179 @@ def build_conversation_text(history: List[ChatMessage]) -> str:
     return "\n".join(lines)
 
 
+def _latest_user_message(history: List[ChatMessage]) -> str:
+    return next((m.content for m in reversed(history) if m.role == "user"), "")
+
+
+def _user_turns(history: List[ChatMessage]) -> List[str]:
+    return [m.content for m in history if m.role == "user"]
+
+
+def _full_context_query(history: List[ChatMessage]) -> str:
+    # Build a query from the full conversation for context-aware retrieval,
+    # weighted toward the latest message.
+    return " ".join(m.content for m in history if m.role == "user")
+
+
+def _constraints(history: List[ChatMessage], handle):
+    if not METADATA_FILTERS:
+        return None
+    return extract_constraints(
+        (m.content for m in history if m.role == "user"),
+        get_metadata_index(handle).known_languages,
+    )
+
+
+def _possible_names(latest_user_msg: str) -> List[str]:
+    """
+    If this looks like a compare/justify question, pull exact-name candidates:
+    crude name extraction — capitalized multi-word phrases / known
+    product-style tokens in the message — best-effort, not perfect.
+    """
+    if not looks_like_compare(latest_user_msg):
+        return []
+    import re
+    return re.findall(r"[A-Z][A-Za-z0-9\-\.+]*(?:\s+(?:[&\-]\s+)?[A-Z0-9][A-Za-z0-9\-\.+]*)*", latest_user_msg)
+
+
+# ------------------------
+# Conversation sessions (SESSION_STORE) — a follow-up turn embeds only the
+# new user message, folds it into the previous context embedding, and keeps
+# the current shortlist in the candidate pool
+# ------------------------
+def _previous_session(history: List[ChatMessage], handle) -> Optional[SessionState]:
+    store = get_session_store()
+    turns = _user_turns(history)
+    if store is None or len(turns) < 2:
+        return None
+    state = store.get(session_key(turns[:-1]))
+    if state is None or state.version != handle.version:
+        metrics.inc("session_lookups", outcome="miss")
+        return None
+    metrics.inc("session_lookups", outcome="hit")
+    return state
+
+
+def _wants_delta_vector(previous: Optional[SessionState]) -> bool:
+    return previous is not None and previous.query_vector is not None and RETRIEVAL_MODE != "lexical"
+
+
+def _finish_candidates(history, handle, candidates: Dict, previous, query: str, query_vector) -> List[Dict]:
+    if previous is not None:
+        carried = {c["id"]: c for c in previous.candidates}
+        for cid in previous.shortlist_ids:
+            if cid not in candidates and cid in carried:
+                candidates[cid] = carried[cid]
+
+    store = get_session_store()
+    if store is not None:
+        if query_vector is None:
+            query_vector = cached_query_vector(handle, query)
+        store.set(session_key(_user_turns(history)), SessionState(
+            version=handle.version,
+            candidates=list(candidates.values()),
+            shortlist_ids=list(previous.shortlist_ids) if previous else [],
+            query_vector=array("f", query_vector) if query_vector is not None else None,
+        ))
+
+    metrics.observe("candidates", len(candidates))
+    return list(candidates.values())
+
+
+def _remember_shortlist(history: List[ChatMessage], candidates: List[Dict], result: Dict) -> None:
+    """Record which candidates this turn showed, for the next turn's session."""
+    store = get_session_store()
+    if store is None or not result.get("recommendations"):
+        return
+    key = session_key(_user_turns(history))
+    state = store.get(key)
+    if state is None:
+        return
+    id_by_url = {c["url"]: c["id"] for c in candidates}
+    state.shortlist_ids = [id_by_url[r["url"]] for r in result["recommendations"] if r["url"] in id_by_url]
+    store.set(key, state)
+
+
+@timed("gather_candidates")
 def gather_candidates(history: List[ChatMessage]) -> List[Dict]:
     """
     Run retrieval BEFORE calling the LLM — this costs zero API quota
     (FAISS + cross-encoder are local compute), and gives the single LLM
     call everything it needs to decide + respond in one shot.
     """
-    latest_user_msg = next(
-        (m.content for m in reversed(history) if m.role == "user"), ""
-    )
-
-    # Build a query from the full conversation for context-aware retrieval,
-    # weighted toward the latest message.
-    full_context_query = " ".join(m.content for m in history if m.role == "user")
-
+    handle = get_index_handle()   # one index snapshot for the whole turn
     candidates = {}
+    query = _full_context_query(history)
+    previous = _previous_session(history, handle)
 
-    # Standard retrieval path
-    for doc in retrieve_documents(full_context_query):
-        result = _format_result(doc)
-        candidates[result["id"]] = result
-
-    # If this looks like a compare/justify question, also pull exact-name matches
-    if looks_like_compare(latest_user_msg):
-        # crude name extraction: look for capitalized multi-word phrases / known
-        # product-style tokens in the message — best-effort, not perfect
-        import re
-        possible_names = re.findall(r"[A-Z][A-Za-z0-9\-\.]*(?:\s+[A-Z0-9][A-Za-z0-9\-\.]*)*", latest_user_msg)
-        if possible_names:
-            try:
-                compare_results = compare_assessments_lookup(possible_names)
-                for r in compare_results:
-                    candidates[r["id"]] = r
-            except Exception:
-                pass
+    query_vector = None
+    if _wants_delta_vector(previous):
+        with span("embed"):
+            delta = handle.store.embeddings.embed_query(_latest_user_message(history))
+        query_vector = combine_vectors(previous.query_vector, delta)
 
-    return list(candidates.values())
+    # Standard retrieval path
+    for doc in retrieve_documents(
+        query, handle=handle, constraints=_constraints(history, handle), query_vector=query_vector
+    ):
+        result = _format_result(doc, handle)
+        candidates[result.id] = result
+
+    possible_names = _possible_names(_latest_user_message(history))
+    if possible_names:
+        try:
+            compare_results = compare_assessments_lookup(possible_names, handle=handle)
+            for r in compare_results:
+                candidates[r.id] = r
+        except Exception:
+            pass
+
+    return _finish_candidates(history, handle, candidates, previous, query, query_vector)
+
+
+@timed("gather_candidates")
+async def agather_candidates(history: List[ChatMessage]) -> List[Dict]:
+    """Async gather_candidates — same result, never blocks the event loop."""
+    handle = get_index_handle()
+    candidates = {}
+    query = _full_context_query(history)
+    previous = _previous_session(history, handle)
+
+    query_vector = None
+    if _wants_delta_vector(previous):
+        with span("embed"):
+            async with upstream_slot():
+                delta = await handle.store.embeddings.aembed_query(_latest_user_message(history))
+        query_vector = combine_vectors(previous.query_vector, delta)
+
+    for doc in await aretrieve_documents(
+        query, handle=handle, constraints=_constraints(history, handle), query_vector=query_vector
+    ):
+        result = _format_result(doc, handle)
+        candidates[result.id] = result
+
+    possible_names = _possible_names(_latest_user_message(history))
+    if possible_names:
+        try:
+            # name lookup may fall back to a blocking similarity_search
+            compare_results = await run_in_search_executor(
+                compare_assessments_lookup, possible_names, handle=handle
+            )
+            for r in compare_results:
+                candidates[r.id] = r
+        except Exception:
+            pass
+
+    return _finish_candidates(history, handle, candidates, previous, query, query_vector)
 
 
 # ------------------------
 # Core logic — ONE LLM call per turn
 # ------------------------
-def run_chat(history: List[ChatMessage]) -> Dict[str, Any]:
-    candidates = gather_candidates(history)
-
-    candidate_context = json.dumps([
-        {
-            "id": c["id"],
-            "name": c["name"],
-            "url": c["url"],
-            "test_type": c["test_type"],
-            "duration": c.get("duration"),
-            "languages": c.get("languages"),
-            "description": c.get("description", "")[:300],  # trim for token budget
-        }
-        for c in candidates
-    ], ensure_ascii=False)
+def build_json_llm_messages(history: List[ChatMessage], candidates: List[Dict]) -> list:
+    """Original prompt: full history + candidates as JSON (PROMPT_FORMAT=json)."""
+    # description trimmed to 300 chars for the token budget (json_prompt_view)
+    candidate_context = json_list(candidates, "prompt_json", json_prompt_view)
 
     conversation_text = build_conversation_text(history)
 
@@ -210,51 +494,125 @@ def run_chat(history: List[ChatMessage]) -> Dict[str, Any]:
         f"CANDIDATE ASSESSMENTS (from search, for the latest message):\n{candidate_context}\n\n"
         f"Respond now with the JSON object per the output contract."
     )
+    from langchain.messages import HumanMessage, SystemMessage   # lazy, see get_model
+    return [SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=prompt)]
 
-    messages = [SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=prompt)]
 
-    response = model.invoke(messages)
-    raw = extract_text(response.content)
+def build_llm_messages(history: List[ChatMessage], candidates: List[Dict]) -> list:
+    if PROMPT_FORMAT == "json":
+        messages = build_json_llm_messages(history, candidates)
+        tokens = sum(metrics.estimate_tokens(m.content) for m in messages)
+    else:
+        prompt = assemble_prompt(SYSTEM_PROMPT, history, candidates)
+        messages, tokens = prompt.messages, prompt.tokens
+        if prompt.level:
+            metrics.inc("prompt_budget_squeezes", level=prompt.level)
+    metrics.observe("prompt_tokens", tokens)
+    return messages
 
-    try:
-        cleaned = (
-            raw.strip()
-            .removeprefix("```json")
-            .removeprefix("```")
-            .removesuffix("```")
-            .strip()
-        )
-        parsed = json.loads(cleaned)
-    except Exception:
-        parsed = {"reply": raw, "selected_ids": None, "end_of_conversation": False}
+
+def resolve_recommendations(selected_ids, candidates: List[Dict]) -> Optional[List[Dict]]:
+    """
+    Build recommendations deterministically from selected_ids against the
+    candidate pool — the LLM never fabricates URLs/fields, only picks IDs.
+    """
+    if not selected_ids:
+        return None
+    candidate_by_id = {c["id"]: c for c in candidates}
+    recs = [recommendation(candidate_by_id[cid]) for cid in selected_ids if cid in candidate_by_id]
+    return recs or None
+
+
+@timed("parse")
+def finalize_response(raw: str, candidates: List[Dict]) -> Dict[str, Any]:
+    """
+    Parse the model output (tolerantly, see output_parser.parse_llm_output)
+    and resolve its selected_ids. Anything short of a clean or repaired
+    object counts as a parse failure and is marked UNCACHEABLE, even when
+    the ids could still be recovered from the text.
+    """
+    output = parse_llm_output(raw, (c["id"] for c in candidates))
+    for kind in output.repairs:
+        metrics.inc("parse_repairs", kind=kind)
+    if output.ok:
+        parsed = output.data
+        if "truncated" in output.repairs:
+            parsed[UNCACHEABLE] = True     # usable, but don't cache a cut-off reply
+    else:
+        metrics.inc("parse_failures")
+        parsed = output.data or {"reply": raw, "selected_ids": None}
+        parsed.update({"end_of_conversation": False, UNCACHEABLE: True})
 
     parsed.setdefault("end_of_conversation", False)
     if not isinstance(parsed.get("reply"), str):
         parsed["reply"] = extract_text(parsed.get("reply", ""))
 
-    # Build recommendations deterministically from selected_ids against the
-    # candidate pool — the LLM never fabricates URLs/fields, only picks IDs.
-    selected_ids = parsed.get("selected_ids")
-    candidate_by_id = {c["id"]: c for c in candidates}
+    parsed["recommendations"] = resolve_recommendations(parsed.pop("selected_ids", None), candidates)
+    return parsed
 
-    if selected_ids:
-        recs = []
-        for cid in selected_ids:
-            c = candidate_by_id.get(cid)
-            if c:
-                recs.append({
-                    "name": c["name"],
-                    "url": c["url"],
-                    "test_type": c["test_type"],
-                    "duration": c.get("duration"),
-                    "languages": c.get("languages"),
-                })
-        parsed["recommendations"] = recs if recs else None
-    else:
-        parsed["recommendations"] = None
 
-    parsed.pop("selected_ids", None)
-    return parsed
+def lexical_candidates(history: List[ChatMessage]) -> List[Dict]:
+    """Candidates without any upstream call — BM25 only, for when embeddings are down."""
+    handle = get_index_handle()
+    docs = retrieve_documents(
+        _full_context_query(history), mode="lexical", handle=handle, constraints=_constraints(history, handle)
+    )
+    return [_format_result(doc, handle) for doc in docs]
+
+
+def degraded_response(candidates: List[Dict], error: Exception) -> Dict[str, Any]:
+    """Retrieval-only answer: the top candidates in search order, never cached."""
+    metrics.inc("degraded_responses", stage="llm")
+    print(f"⚠️ Degraded answer: {error}")
+    recs = [recommendation(c) for c in candidates[:DEGRADED_TOP_K]]
+    return {"reply": DEGRADED_REPLY, "recommendations": recs or None, "end_of_conversation": False, UNCACHEABLE: True}
+
+
+def _retrieval_failed(error: Exception) -> None:
+    metrics.inc("degraded_responses", stage="retrieval")
+    print(f"⚠️ Embeddings unavailable, falling back to lexical retrieval: {error}")
+
+
+def run_chat(history: List[ChatMessage]) -> Dict[str, Any]:
+    route = route_turn(history)
+    if route.intent != LLM:
+        return fast_response(route)
+    try:
+        candidates = gather_candidates(history)
+    except UpstreamError as e:
+        _retrieval_failed(e)
+        candidates = lexical_candidates(history)
+    messages = build_llm_messages(history, candidates)
+    try:
+        with span("llm"):
+            response = get_model().invoke(messages)
+    except UpstreamError as e:
+        return degraded_response(candidates, e)
+    result = finalize_response(extract_text(response.content), candidates)
+    _remember_shortlist(history, candidates, result)
+    return result
+
+
+async def arun_chat(history: List[ChatMessage]) -> Dict[str, Any]:
+    """Async run_chat — ainvoke behind the shared upstream semaphore."""
+    route = await aroute_turn(history)
+    if route.intent != LLM:
+        return fast_response(route)
+    try:
+        candidates = await agather_candidates(history)
+    except UpstreamError as e:
+        _retrieval_failed(e)
+        candidates = await run_in_search_executor(lexical_candidates, history)
+    messages = build_llm_messages(history, candidates)
+    try:
+        with span("llm"):
+            async with upstream_slot():
+                response = await get_model().ainvoke(messages)
+    except UpstreamError as e:
+        return degraded_response(candidates, e)
+    result = finalize_response(extract_text(response.content), candidates)
+    _remember_shortlist(history, candidates, result)
+    return result
 
 
 # ------------------------
@@ -262,27 +620,171 @@ def run_chat(history: List[ChatMessage]) -> Dict[str, Any]:
 # ------------------------
 @app.get("/health")
 def health_check():
+    """Liveness — never touches the index or the model."""
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def readiness_check(response: Response):
+    """Readiness — 200 once warmup has loaded the index and the chat model."""
+    body = {k: v for k, v in _startup.items() if v is not None}
+    if _startup["state"] == "ready":
+        body["index_version"] = get_index_handle().version
+    elif _startup["state"] != "lazy":    # STARTUP_WARMUP=off: first request pays for loading
+        response.status_code = 503
+    return body
+
+
+@app.post("/admin/reload-index")
+async def admin_reload_index(x_admin_token: str = Header(default="")):
+    """Load + validate the on-disk index in a worker thread, then swap it in."""
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="forbidden")
+    previous = get_index_handle().version
+    try:
+        handle = await asyncio.to_thread(reload_index)
+    except Exception as e:
+        raise HTTPException(status_code=409, detail=f"reload rejected, still serving {previous}: {e}")
+    return {"previous_version": previous, "version": handle.version, "build_info": {
+        k: v for k, v in handle.build_info.items() if k != "items"
+    }}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
+async def chat(req: ChatRequest, response: Response, cache_control: str = Header(default="")):
+    """
+    Identical conversations (after whitespace/case normalization) against the
+    same index version are answered from the response cache. Clients opt out
+    with `Cache-Control: no-cache` (always recompute) or `no-store` (bypass
+    the cache completely).
+    """
     if not req.messages:
         raise HTTPException(status_code=400, detail="messages cannot be empty")
 
-    try:
+    async def compute() -> Dict[str, Any]:
+        with request_budget():
+            result = await arun_chat(req.messages)
         if len(req.messages) >= MAX_TURNS:
-            result = run_chat(req.messages)
             result["end_of_conversation"] = True
-            return result
+        return result
 
-        result = run_chat(req.messages)
+    cache = get_response_cache()
+    directives = cache_control.lower()
+    try:
+        if cache is None or "no-store" in directives:
+            result, status = await compute(), "BYPASS"
+        else:
+            key = response_key(((m.role, m.content) for m in req.messages), get_index_handle().version)
+            result, status = await cache.get_or_compute(
+                key, compute,
+                cacheable=lambda r: not r.get(UNCACHEABLE),
+                use_cached="no-cache" not in directives,
+            )
+        result.pop(UNCACHEABLE, None)
+        response.headers["X-Cache"] = status
+        metrics.inc("chat_requests", endpoint="chat", outcome="ok")
         return result
 
     except Exception as e:
+        metrics.inc("chat_requests", endpoint="chat", outcome="error")
         print(f"ERROR in /chat: {e}")
         return ChatResponse(
-            reply="I'm having trouble processing that right now — could you rephrase or try again?",
+            reply=FALLBACK_REPLY,
             recommendations=None,
             end_of_conversation=False,
-        )
\ No newline at end of file
+        )
+
+
+def candidates_event(candidates) -> str:
+    """SSE frame for the candidate pool, joined from the records' preview fragments."""
+    return sse_frame("candidates", json_list(candidates, "preview_json", preview))
+
+
+async def stream_chat_events(history: List[ChatMessage]):
+    """
+    SSE event sequence for /chat/stream:
+      candidates      -> retrieved pool, right after gather_candidates
+      token           -> incremental reply text as the LLM streams it
+      recommendations -> resolved shortlist, as soon as selected_ids closes
+      final           -> the same ChatResponse payload /chat would return
+    """
+    try:
+        route = await aroute_turn(history)
+        if route.intent != LLM:
+            # templated turn: the route's items stand in for the retrieved pool
+            yield candidates_event(route.items)
+            result = fast_response(route)
+            yield sse_event("token", {"text": result["reply"]})
+            if len(history) >= MAX_TURNS:
+                result["end_of_conversation"] = True
+            metrics.inc("chat_requests", endpoint="chat_stream", outcome="ok")
+            yield sse_event("final", ChatResponse(**result).model_dump())
+            return
+
+        with request_budget():
+            try:
+                candidates = await agather_candidates(history)
+            except UpstreamError as e:
+                _retrieval_failed(e)
+                candidates = await run_in_search_executor(lexical_candidates, history)
+            yield candidates_event(candidates)
+
+            messages = build_llm_messages(history, candidates)
+            parser = StreamingOutputParser()
+            early_recs = False
+            try:
+                with span("llm"):
+                    async with upstream_slot():
+                        async for chunk in get_model().astream(messages):
+                            text = extract_text(chunk.content)
+                            if not text:
+                                continue
+                            delta = parser.feed(text)
+                            if delta:
+                                yield sse_event("token", {"text": delta})
+                            if parser.ids_ready and not early_recs:
+                                early_recs = True
+                                recs = resolve_recommendations(parser.selected_ids, candidates)
+                                if recs:
+                                    yield sse_event("recommendations", {"recommendations": recs})
+            except UpstreamError as e:
+                if parser.text:
+                    raise   # part of a reply is already out; nothing sensible to degrade to
+                result = degraded_response(candidates, e)
+                yield sse_event("token", {"text": result["reply"]})
+            else:
+                # selected_ids are still resolved against the candidate pool here
+                result = finalize_response(parser.text, candidates)
+                _remember_shortlist(history, candidates, result)
+        result.pop(UNCACHEABLE, None)
+        if len(history) >= MAX_TURNS:
+            result["end_of_conversation"] = True
+        final = ChatResponse(**result)
+        metrics.inc("chat_requests", endpoint="chat_stream", outcome="ok")
+
+    except Exception as e:
+        metrics.inc("chat_requests", endpoint="chat_stream", outcome="error")
+        print(f"ERROR in /chat/stream: {e}")
+        final = ChatResponse(reply=FALLBACK_REPLY, recommendations=None, end_of_conversation=False)
+
+    yield sse_event("final", final.model_dump())
+
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    if not req.messages:
+        raise HTTPException(status_code=400, detail="messages cannot be empty")
+
+    return StreamingResponse(
+        stream_chat_events(req.messages),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+_startup["import_seconds"] = round(time.perf_counter() - _IMPORT_STARTED, 3)
@@ -0,0 +1,78 @@
+"""
+Multi-worker launcher.
+
+    python -m src.serve --workers 4 --port 10000
+
+Runs `uvicorn src.main:app` with N worker processes on the NumPy index
+(INDEX_BACKEND defaults to numpy here). Its vectors, norms and records are
+memory-mapped read-only, so the workers share one copy of the index through
+the page cache instead of each unpickling the FAISS docstore into its own
+heap. The files are read once before the workers start, so the first
+request of every worker finds them already cached.
+
+Every worker still builds its own derived structures (BM25, metadata index,
+router centroids) during warmup. /admin/reload-index only reaches the worker
+that served the call — with several workers, set INDEX_WATCH_INTERVAL so
+each of them picks up new builds on its own.
+"""
+import argparse
+import os
+import sys
+
+from src.Indexing.Index import numpy_path
+from src.Indexing.numpy_index import NORMS_FILE, RECORDS_FILE, VECTORS_FILE
+
+# One BLAS thread per worker: N workers x N cores of threads only thrash
+_BLAS_THREAD_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def prefetch(path: str = None) -> int:
+    """Read the mapped index files once so they sit in the page cache. -> bytes read"""
+    path = path or numpy_path()
+    total = 0
+    for name in (VECTORS_FILE, NORMS_FILE, RECORDS_FILE):
+        file_path = os.path.join(path, name)
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, "rb") as f:
+            while True:
+                chunk = f.read(1 << 20)
+                if not chunk:
+                    break
+                total += len(chunk)
+    return total
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the API with several workers sharing one mapped index")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "10000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("INDEX_BACKEND", "numpy")
+    if os.environ["INDEX_BACKEND"] == "numpy":
+        path = numpy_path()
+        if not os.path.exists(os.path.join(path, RECORDS_FILE)):
+            print(
+                f"❌ {RECORDS_FILE} missing in '{path}'. Rebuild with "
+                f"`python src/Indexing/build_index.py` or export with `python -m src.Indexing.numpy_index`."
+            )
+            return 1
+        print(f"✅ Prefetched {prefetch(path) / 1e6:.1f} MB of index into the page cache")
+    else:
+        print(f"⚠️ INDEX_BACKEND={os.environ['INDEX_BACKEND']}: every worker loads a private copy of the index")
+
+    if args.workers > 1:
+        for var in _BLAS_THREAD_VARS:
+            os.environ.setdefault(var, "1")
+
+    import uvicorn
+
+    uvicorn.run("src.main:app", host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
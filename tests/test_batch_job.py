@@ -0,0 +1,65 @@
+"""
+Batch retrieve mode on the local embedder: a rerun re-emits nothing, and a
+run resumed after a crash neither loses nor duplicates rows.
+
+    PYTHONPATH=. python -m pytest -q tests
+"""
+import json
+import os
+
+os.environ.setdefault("EMBEDDINGS_BACKEND", "local")
+os.environ.setdefault("INDEX_BACKEND", "numpy")
+os.environ.setdefault("MISTRAL_API_KEY", "x")
+
+from src.Batch.batch_job import run_job
+
+QUERIES = [
+    "Java developer with Spring experience",
+    "entry-level sales representative",
+    "numerical reasoning for graduate analysts",
+    "customer service agent for a contact centre",
+    "senior leadership personality assessment",
+    "Python data engineer",
+    "bank teller",
+]
+
+
+def _write_input(path, queries):
+    with open(path, "w", encoding="utf-8") as f:
+        for i, query in enumerate(queries):
+            f.write(json.dumps({"id": f"q{i}", "query": query}) + "\n")
+
+
+def _output_ids(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["id"] for line in f]
+
+
+def _run(input_path, output_path):
+    return run_job(str(input_path), str(output_path), batch_size=3, checkpoint_every=2)
+
+
+def test_rerun_emits_nothing(tmp_path):
+    input_path, output_path = tmp_path / "jobs.jsonl", tmp_path / "recs.jsonl"
+    _write_input(input_path, QUERIES)
+
+    first = _run(input_path, output_path)
+    assert (first["written"], first["failed"]) == (len(QUERIES), 0)
+    output = output_path.read_bytes()
+
+    second = _run(input_path, output_path)
+    assert (second["written"], second["skipped"]) == (0, len(QUERIES))
+    assert output_path.read_bytes() == output
+
+
+def test_resume_after_crash_neither_loses_nor_duplicates(tmp_path):
+    input_path, output_path = tmp_path / "jobs.jsonl", tmp_path / "recs.jsonl"
+    _write_input(input_path, QUERIES[:4])
+    _run(input_path, output_path)
+    with open(output_path, "a", encoding="utf-8") as f:
+        f.write('{"id": "q4", "recommend')          # torn row past the last checkpoint
+
+    _write_input(input_path, QUERIES)
+    report = _run(input_path, output_path)
+    assert (report["written"], report["skipped"]) == (3, 4)
+    assert _output_ids(output_path) == [f"q{i}" for i in range(len(QUERIES))]
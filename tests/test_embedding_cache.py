@@ -0,0 +1,91 @@
+"""
+CachedEmbeddings over the offline HashingEmbeddings: memory hits and
+misses, TTL expiry, LRU eviction and the SQLite tier across a restart.
+
+    PYTHONPATH=. python -m pytest -q tests
+"""
+import sqlite3
+import time
+
+import pytest
+
+from src.Cache.embedding_cache import CachedEmbeddings
+from src.Indexing.local_embeddings import HashingEmbeddings
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    def __init__(self):
+        super().__init__(size=64)
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.texts.append(text)
+        return super().embed_query(text)
+
+
+@pytest.fixture
+def provider():
+    return CountingEmbeddings()
+
+
+def _rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+def test_hit_and_miss(provider):
+    cache = CachedEmbeddings(provider, maxsize=8)
+    first = cache.embed_query("Java developer test")
+    assert cache.embed_query("  java   DEVELOPER test ") == first   # same normalised key
+    assert cache.embed_documents(["Java developer test", "sales manager"])[0] == first
+    assert provider.texts == ["Java developer test", "sales manager"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["provider_calls"]) == (2, 2, 2)
+
+
+def test_ttl_expiry(provider):
+    cache = CachedEmbeddings(provider, maxsize=8, ttl=0.05)
+    cache.embed_query("numerical reasoning")
+    time.sleep(0.1)
+    cache.embed_query("numerical reasoning")
+    assert provider.texts == ["numerical reasoning"] * 2
+
+
+def test_lru_eviction(provider):
+    cache = CachedEmbeddings(provider, maxsize=2)
+    cache.embed_query("a")
+    cache.embed_query("b")
+    cache.embed_query("a")          # refresh a, b is now least recent
+    cache.embed_query("c")          # evicts b
+    cache.embed_query("a")
+    cache.embed_query("b")
+    assert provider.texts == ["a", "b", "c", "b"]
+    assert cache.stats()["evictions"] == 2
+
+
+def test_disk_tier_round_trip(provider, tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    vector = CachedEmbeddings(provider, disk_path=path).embed_query("OPQ32r personality")
+
+    restarted = CachedEmbeddings(provider, disk_path=path)
+    assert restarted.embed_query("OPQ32r personality") == pytest.approx(vector, abs=1e-6)
+    assert provider.texts == ["OPQ32r personality"]
+    stats = restarted.stats()
+    assert (stats["hits"], stats["misses"], stats["disk_hits"]) == (1, 0, 1)
+
+
+def test_disk_tier_deletes_expired_rows(provider, tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = CachedEmbeddings(provider, disk_path=path, ttl=0.05)
+    cache.embed_documents(["first", "second"])
+    assert _rows(path) == 2
+    time.sleep(0.1)
+
+    restarted = CachedEmbeddings(provider, disk_path=path, ttl=0.05)
+    assert _rows(path) == 0         # swept on open
+    restarted.embed_query("first")
+    assert provider.texts == ["first", "second", "first"]
@@ -0,0 +1,51 @@
+"""
+Metadata filters are hard filters on retrieval, so words that only look like
+a constraint ("remote team", "sales manager", "English comprehension") must
+not turn into one.
+
+    PYTHONPATH=. python -m pytest -q tests
+"""
+import numpy as np
+import pytest
+
+from src.Indexing.metadata_index import Constraints, MetadataIndex
+from src.Tool.filters import extract_constraints
+
+LANGUAGES = {"english", "spanish", "french"}
+
+
+@pytest.mark.parametrize("text", [
+    "hiring a sales manager for a remote team",
+    "remote role, account executive",
+    "I'm a manager looking for a Java test",
+    "an English comprehension test for call centre staff",
+    "hiring managers want something quick",
+])
+def test_incidental_mentions_are_not_constraints(text):
+    assert extract_constraints([text], LANGUAGES).is_empty()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("tests that can be taken remotely", Constraints(remote=True)),
+    ("needs remote testing", Constraints(remote=True)),
+    ("assessment for managers", Constraints(job_levels={"Manager"})),
+    ("something for senior leadership", Constraints(job_levels={"Executive"})),
+    ("need it in Spanish", Constraints(languages={"spanish"})),
+    ("English.", Constraints(languages={"english"})),
+    ("French-speaking graduates", Constraints(languages={"french"}, job_levels={"Graduate"})),
+])
+def test_explicit_constraints_are_kept(text, expected):
+    assert extract_constraints([text], LANGUAGES) == expected
+
+
+class _Doc:
+    def __init__(self, **metadata):
+        self.metadata = metadata
+
+
+def test_small_filtered_set_falls_back_to_everything():
+    docs = [_Doc(id=str(i), remote_testing=i < 3) for i in range(20)]
+    index = MetadataIndex(docs)
+    remote = Constraints(remote=True)
+    assert np.array_equal(index.allowed_rows(remote), [0, 1, 2])
+    assert index.allowed_rows(remote, min_rows=10) is None
@@ -0,0 +1,58 @@
+"""
+StreamingOutputParser finds selected_ids however the stream is chunked, and
+scans a long stream in linear time.
+
+    PYTHONPATH=. python -m pytest -q tests
+"""
+import json
+import time
+
+import pytest
+
+from src.LLM.output_parser import StreamingOutputParser
+
+OUTPUT = json.dumps({
+    "reply": 'Here are three that fit — "OPQ32r" among them.\nAll run in English.',
+    "selected_ids": ["opq32r", "verify-numerical", "java-8-new"],
+    "end_of_conversation": False,
+})
+
+
+def _feed(text, size):
+    parser = StreamingOutputParser()
+    ready_at = None
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+        if parser.ids_ready and ready_at is None:
+            ready_at = i + size
+    return parser, ready_at
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 16, len(OUTPUT)])
+def test_ids_found_for_any_chunking(size):
+    parser, ready_at = _feed(OUTPUT, size)
+    assert parser.selected_ids == ["opq32r", "verify-numerical", "java-8-new"]
+    assert ready_at < len(OUTPUT) or size == len(OUTPUT)    # before the object closes
+    assert parser.text == OUTPUT
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ('{"reply": "none fit", "selected_ids": null, "end_of_conversation": false}', None),
+    ('{"reply": "x", "selected_ids" :  ["a\\"]", "b"]}', ['a"]', "b"]),
+])
+def test_null_and_escaped_ids(raw, expected):
+    parser, _ = _feed(raw, 2)
+    assert parser.ids_ready
+    assert parser.selected_ids == expected
+
+
+def test_long_stream_is_linear():
+    def seconds(n):
+        text = json.dumps({"reply": "x" * n, "selected_ids": ["a"]})
+        started = time.perf_counter()
+        _feed(text, 4)
+        return time.perf_counter() - started
+
+    seconds(1000)
+    small, large = seconds(20_000), seconds(80_000)
+    assert large < small * 8     # 4x the text; a rescan per chunk would be ~16x
@@ -0,0 +1,150 @@
+"""
+UpstreamGuard against the in-process fake LLM: per-call deadlines (async and
+sync), hedging (the hedge winning cancels the primary; a fast primary sends
+no hedge) and the breaker's closed -> open -> half-open -> closed cycle.
+
+    PYTHONPATH=. python -m pytest -q tests
+"""
+import asyncio
+import time
+
+import pytest
+
+from src.LLM.fake_llm import FakeChatModel, FakeLatency
+from src.LLM.resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, ResilientChatModel, UpstreamError, UpstreamGuard,
+    request_budget,
+)
+
+MESSAGES = [{"role": "user", "content": "Need a Java test"}]
+
+
+class ScriptedLatency(FakeLatency):
+    """Per-call latencies in seconds, in call order; the last one repeats."""
+
+    def __init__(self, *seconds, failure_rate: float = 0.0):
+        super().__init__(failure_rate=failure_rate)
+        self.script = list(seconds)
+
+    def sample(self) -> float:
+        if self.failure_rate:
+            return super().sample()
+        return self.script.pop(0) if len(self.script) > 1 else self.script[0]
+
+
+class TrackingModel(FakeChatModel):
+    """Records which calls were cancelled before they answered."""
+
+    def __init__(self, latency):
+        super().__init__(latency)
+        self.cancelled = 0
+
+    async def ainvoke(self, messages):
+        try:
+            return await super().ainvoke(messages)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+def _model(*seconds, hedge=False, timeout=1.0):
+    inner = TrackingModel(ScriptedLatency(*seconds))
+    return inner, ResilientChatModel(inner, UpstreamGuard("chat-test", timeout=timeout, hedge=hedge))
+
+
+# ------------------------
+# Deadlines
+# ------------------------
+def test_async_call_times_out_at_its_deadline():
+    inner, model = _model(2.0, timeout=0.1)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(model.ainvoke(MESSAGES))
+    assert time.monotonic() - started < 0.5
+    assert inner.cancelled == 1
+
+
+def test_sync_call_times_out_at_its_deadline():
+    _, model = _model(1.0, timeout=0.1)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        model.invoke(MESSAGES)
+    assert time.monotonic() - started < 0.5
+
+
+def test_request_budget_caps_the_call_deadline():
+    _, model = _model(1.0, timeout=5.0)
+    started = time.monotonic()
+    with request_budget(0.1), pytest.raises(DeadlineExceeded):
+        model.invoke(MESSAGES)
+    assert time.monotonic() - started < 0.5
+
+
+# ------------------------
+# Hedging
+# ------------------------
+def test_hedge_wins_and_cancels_the_primary(monkeypatch):
+    inner, model = _model(2.0, 0.01, hedge=True, timeout=3.0)
+    monkeypatch.setattr(model.guard, "hedge_delay", lambda: 0.05)
+    started = time.monotonic()
+    reply = asyncio.run(model.ainvoke(MESSAGES))
+    assert reply.content
+    assert time.monotonic() - started < 1.0
+    assert inner.calls == 2
+    assert inner.cancelled == 1
+
+
+def test_fast_primary_sends_no_hedge(monkeypatch):
+    inner, model = _model(0.01, hedge=True)
+    monkeypatch.setattr(model.guard, "hedge_delay", lambda: 0.2)
+    asyncio.run(model.ainvoke(MESSAGES))
+    assert inner.calls == 1
+
+
+def test_hedging_is_off_by_default(monkeypatch):
+    inner = FakeChatModel(ScriptedLatency(0.3, 0.01))
+    model = ResilientChatModel(inner, UpstreamGuard("chat-test", timeout=1.0))
+    monkeypatch.setattr(model.guard, "hedge_delay", lambda: 0.05)
+    asyncio.run(model.ainvoke(MESSAGES))
+    assert inner.calls == 1
+
+
+# ------------------------
+# Circuit breaker
+# ------------------------
+def test_breaker_opens_probes_and_closes():
+    latency = ScriptedLatency(0.0, failure_rate=1.0)
+    inner = FakeChatModel(latency)
+    guard = UpstreamGuard("chat-test", timeout=1.0, hedge=False)
+    guard.breaker = CircuitBreaker(failures=2, cooldown=0.1)
+    model = ResilientChatModel(inner, guard)
+
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            model.invoke(MESSAGES)
+    assert guard.breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        model.invoke(MESSAGES)
+    assert inner.calls == 2                       # refused without calling upstream
+
+    time.sleep(0.15)
+    with pytest.raises(UpstreamError):            # the half-open probe fails: open again
+        model.invoke(MESSAGES)
+    assert guard.breaker.state == CircuitBreaker.OPEN
+    assert inner.calls == 3
+
+    time.sleep(0.15)
+    latency.failure_rate = 0.0
+    assert model.invoke(MESSAGES).content         # the probe succeeds: closed
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = CircuitBreaker(failures=1, cooldown=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
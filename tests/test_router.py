@@ -0,0 +1,51 @@
+"""
+Centroid routing must not answer a specific first message with the canned
+clarify reply, however confident the centroid match is.
+
+    PYTHONPATH=. python -m pytest -q tests
+"""
+import os
+
+os.environ.setdefault("EMBEDDINGS_BACKEND", "local")
+os.environ.setdefault("INDEX_BACKEND", "numpy")
+os.environ.setdefault("MISTRAL_API_KEY", "x")
+
+import pytest
+
+from src.Indexing.Index import get_index_handle
+from src.LLM import router
+from src.main import ChatMessage
+
+
+class AlwaysClarify:
+    def nearest(self, vector):
+        return router.CLARIFY, 0.99, 0.5
+
+
+@pytest.fixture
+def handle():
+    handle = get_index_handle()
+    handle.derived("bm25")
+    original = handle.built("intent_centroids")
+    handle._derived["intent_centroids"] = AlwaysClarify()
+    yield handle
+    if original is None:
+        handle._derived.pop("intent_centroids", None)
+    else:
+        handle._derived["intent_centroids"] = original
+
+
+@pytest.mark.parametrize("text", ["I need an assessment", "hi, I need help", "we need to screen candidates"])
+def test_vague_first_message_is_clarified(handle, text):
+    route = router.route_by_centroid([ChatMessage(role="user", content=text)], handle, [1.0])
+    assert route.intent == router.CLARIFY
+
+
+@pytest.mark.parametrize("text", [
+    "I need a Python test for devs",
+    "We need a solution for senior leadership.",
+    "need something for sales managers",
+])
+def test_specific_first_message_goes_to_the_llm(handle, text):
+    route = router.route_by_centroid([ChatMessage(role="user", content=text)], handle, [1.0])
+    assert route.intent == router.LLM
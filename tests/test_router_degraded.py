@@ -0,0 +1,87 @@
+"""
+Short messages while the embeddings API is down must still reach the
+lexical fallback instead of the generic error reply.
+
+    PYTHONPATH=. python -m pytest -q tests
+"""
+import json
+import os
+
+os.environ.setdefault("EMBEDDINGS_BACKEND", "local")
+os.environ.setdefault("INDEX_BACKEND", "numpy")
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("STARTUP_WARMUP", "off")
+os.environ.setdefault("MISTRAL_API_KEY", "x")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.Indexing.Index import get_index_handle, set_vector_store
+from src.LLM.resilience import ResilientEmbeddings, UpstreamGuard
+from src.LLM import router
+from src.LLM.router import CentroidsUnavailable
+from src.main import FALLBACK_REPLY, app
+
+SHORT_MESSAGE = "Need a Java test for mid-level backend developers"   # under ROUTER_MAX_WORDS
+
+
+class FailingEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    def _fail(self, *args):
+        self.calls += 1
+        raise ConnectionError("embeddings API unreachable")
+
+    embed_query = embed_documents = _fail
+
+    async def aembed_query(self, text):
+        self._fail()
+
+    async def aembed_documents(self, texts):
+        self._fail()
+
+
+@pytest.fixture
+def failing_embeddings(monkeypatch):
+    monkeypatch.setattr(router, "ROUTER_CENTROIDS", True)
+    store = get_index_handle().store
+    original = store.embeddings
+    inner = FailingEmbeddings()
+    store.embeddings = ResilientEmbeddings(inner, UpstreamGuard("embed-test", timeout=1.0))
+    set_vector_store(store)   # fresh handle, so no centroids built with the working client
+    yield inner
+    store.embeddings = original
+    set_vector_store(store)
+
+
+@pytest.mark.parametrize("path", ["/chat", "/chat/stream"])
+def test_short_message_falls_back_to_lexical(failing_embeddings, path):
+    client = TestClient(app)
+    body = {"messages": [{"role": "user", "content": SHORT_MESSAGE}]}
+    response = client.post(path, json=body, headers={"Cache-Control": "no-store"})
+    assert response.status_code == 200
+    if path == "/chat":
+        result = response.json()
+    else:
+        final = response.text.split("event: final\ndata: ", 1)[1]
+        result = json.loads(final.split("\n\n", 1)[0])
+    assert result["reply"] != FALLBACK_REPLY
+    assert result["recommendations"]
+
+
+def test_failed_centroid_build_retries_after_cooldown(failing_embeddings):
+    client = TestClient(app)
+    body = {"messages": [{"role": "user", "content": SHORT_MESSAGE}]}
+    client.post("/chat", json=body, headers={"Cache-Control": "no-store"})
+    marker = get_index_handle().built("intent_centroids")
+    assert isinstance(marker, CentroidsUnavailable)
+
+    # within the cooldown: no second exemplar build
+    client.post("/chat", json=body, headers={"Cache-Control": "no-store"})
+    assert get_index_handle().built("intent_centroids") is marker
+
+    # after it: rebuilt (and, with embeddings still down, a fresh marker)
+    marker.retry_at = 0
+    client.post("/chat", json=body, headers={"Cache-Control": "no-store"})
+    assert get_index_handle().built("intent_centroids") is not marker